@@ -45,17 +45,52 @@ case "$1" in
         ;;
 
     index)
-        echo "📊 Building vector index..."
+        echo "📊 Updating vector index..."
         python3 src/vector-store.py
         echo "✅ Index built successfully!"
         ;;
 
+    index-rebuild)
+        echo "📊 Rebuilding vector index from scratch..."
+        python3 src/vector-store.py rebuild
+        echo "✅ Index rebuilt successfully!"
+        ;;
+
+    index-compact)
+        echo "🗜️ Compacting vector index segments..."
+        python3 src/vector-store.py compact
+        ;;
+
     search)
         shift
         echo "🔍 Searching: $*"
         python3 src/vector-store.py search "$@"
         ;;
 
+    bench)
+        shift
+        echo "⏱️ Benchmarking the retrieval engine..."
+        python3 src/benchmarks/retrieval-bench.py "$@"
+        ;;
+
+    mock-llm)
+        shift
+        echo "🤖 Starting mock LLM API on http://127.0.0.1:9000/v1 ..."
+        python3 src/benchmarks/mock-llm.py "$@"
+        ;;
+
+    load-test)
+        shift
+        echo "📈 Load-testing the API server..."
+        python3 src/benchmarks/load-test.py "$@"
+        ;;
+
+    batch)
+        shift
+        echo "💬 Answering questions in batch..."
+        python3 src/api/batch.py "$@"
+        ;;
+
     serve)
         echo "🚀 Starting API server..."
         echo "   API: http://localhost:8000"
@@ -88,8 +123,14 @@ case "$1" in
         echo "  scrape-main    - Scrape main site only"
         echo "  scrape-services - Scrape public services portal only"
         echo "  scrape-debug   - Debug scraper with visible browser"
-        echo "  index          - Build vector search index"
+        echo "  index          - Build/update vector search index (incremental)"
+        echo "  index-rebuild  - Rebuild vector search index from scratch"
+        echo "  index-compact  - Merge index segments and drop deleted pages"
         echo "  search <query> - Test search functionality"
+        echo "  bench [opts]   - Benchmark the retrieval engine on synthetic corpora (JSON)"
+        echo "  batch <file>   - Answer a file of questions (JSON lines on stdout)"
+        echo "  mock-llm [opts] - Run a local mock of the LLM API (no tokens spent)"
+        echo "  load-test [opts] - Replay questions against the API at a target rate (JSON)"
         echo "  serve          - Start API server"
         echo "  widget         - Open chat widget in browser"
         echo "  all            - Run scrape + index (full pipeline)"
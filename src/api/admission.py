@@ -0,0 +1,129 @@
+"""
+Admission control for upstream LLM calls and per-client rate limits.
+
+LLMAdmission caps the number of LLM calls in flight. Calls beyond the cap
+wait in a bounded queue for at most a deadline; when the queue is full or
+the deadline passes, the call is refused at once with a Retry-After
+estimate instead of piling up until upstream timeouts cascade. Admitted
+calls therefore see a predictable wait during spikes.
+
+RateLimiter is a token bucket per client, refilled at a steady rate with
+room for a burst, so one client cannot take the whole queue.
+"""
+
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+
+class Overloaded(Exception):
+    """Request refused; `status` is 429 (rate limit) or 503 (saturated)."""
+
+    def __init__(self, status: int, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class LLMAdmission:
+    """Concurrency limit with a bounded, deadline-limited wait queue."""
+
+    def __init__(self, max_concurrent: int = 32, max_queue: int = 64, queue_timeout: float = 10.0):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = {"queue_full": 0, "queue_timeout": 0}
+        self._hold_seconds = 1.0  # Moving average of how long a call keeps its slot
+
+    def retry_after(self) -> float:
+        """Rough time until a new call would get a slot."""
+        return self._hold_seconds * (self.waiting + 1) / self.max_concurrent
+
+    @property
+    def saturated(self) -> bool:
+        return self._semaphore.locked() and self.waiting >= self.max_queue
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one LLM slot, or raise Overloaded(503) when none frees up in time."""
+        if self.saturated:
+            self.rejected["queue_full"] += 1
+            raise Overloaded(503, "Server busy, please retry", self.retry_after())
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected["queue_timeout"] += 1
+            raise Overloaded(503, "Server busy, please retry", self.retry_after()) from None
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        self.admitted += 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+            self._hold_seconds = 0.9 * self._hold_seconds + 0.1 * (time.monotonic() - start)
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+        }
+
+
+class RateLimiter:
+    """Token bucket per client key; at most `max_clients` buckets are kept."""
+
+    def __init__(self, per_minute: float = 20.0, burst: int = 10, max_clients: int = 100000):
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()  # key -> (tokens, updated)
+        self._lock = threading.Lock()
+        self.limited = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def check(self, key: str, cost: float = 1.0) -> None:
+        """
+        Take `cost` tokens from the client's bucket, or raise Overloaded(429).
+
+        A cost above the burst (a large batch) needs a full bucket and leaves
+        it in debt, so the client waits as long as if it had sent the
+        requests one by one.
+        """
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        needed = min(cost, self.burst)
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (float(self.burst), now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            allowed = tokens >= needed
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)  # Idle longest; a new bucket starts full anyway
+        if not allowed:
+            self.limited += 1
+            raise Overloaded(429, "Too many requests, please slow down", (needed - tokens) / self.rate)
@@ -0,0 +1,143 @@
+"""
+Persistent cache of LLM answers.
+
+Citizens keep asking the same questions about the same few procedures, and
+most of the LLM spend goes to answering them again. An answer is reused when
+the normalised question, the retrieved evidence, the model and the prompt
+version all match. The evidence is fingerprinted by passage id, offsets and
+content, so a re-index that changes the passages behind a question misses
+the cache without any explicit invalidation.
+
+Entries live in a SQLite file (WAL mode), so they survive restarts and are
+shared by all workers on the host. Entries expire after a TTL and the least
+recently used ones are evicted beyond a maximum count.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from retrieval.query_cache import normalize_query
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    key TEXT PRIMARY KEY,
+    answer TEXT NOT NULL,
+    model TEXT NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS answers_accessed ON answers (accessed);
+CREATE INDEX IF NOT EXISTS answers_created ON answers (created);
+"""
+
+
+def evidence_fingerprint(results: list[dict]) -> list[str]:
+    """One id per retrieved passage that changes whenever the passage does."""
+    return [
+        f"{r['parent_id']}:{r['start']}-{r['end']}:"
+        + hashlib.md5(r["content"].encode("utf-8")).hexdigest()
+        for r in results
+    ]
+
+
+def answer_key(question: str, results: list[dict], model: str, prompt_version: str) -> str:
+    payload = json.dumps(
+        [normalize_query(question), evidence_fingerprint(results), model, prompt_version],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """SQLite-backed answer cache with a TTL and LRU eviction."""
+
+    def __init__(self, path: str, max_entries: int = 10000, ttl: float = 86400.0):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if self.enabled:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(self.path), timeout=5.0, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(SCHEMA)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, key: str) -> Optional[str]:
+        """Cached answer for `key`, or None on a miss (blocking)."""
+        if self._db is None:
+            return None
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT answer FROM answers WHERE key = ? AND created > ?", (key, now - self.ttl)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE answers SET accessed = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, answer: str, model: str) -> None:
+        """Store an answer, then drop expired and least recently used entries (blocking)."""
+        if self._db is None or not answer:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO answers (key, answer, model, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, answer, model, now, now)
+            )
+            self._db.execute("DELETE FROM answers WHERE created <= ?", (now - self.ttl,))
+            (count,) = self._db.execute("SELECT COUNT(*) FROM answers").fetchone()
+            if count > self.max_entries:
+                self._db.execute(
+                    "DELETE FROM answers WHERE key IN (SELECT key FROM answers ORDER BY accessed LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+                self.evictions += count - self.max_entries
+            self._db.commit()
+
+    def clear(self) -> None:
+        if self._db is None:
+            return
+        with self._lock:
+            self._db.execute("DELETE FROM answers")
+            self._db.commit()
+
+    def stats(self) -> dict:
+        """Counters of this worker; `entries` is shared by all workers."""
+        entries = 0
+        if self._db is not None:
+            with self._lock:
+                (entries,) = self._db.execute("SELECT COUNT(*) FROM answers").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+        }
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
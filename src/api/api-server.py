@@ -1,17 +1,40 @@
 """
 FastAPI backend for Diên Sanh chatbot.
 Provides RAG-powered chat endpoint using api.ai4u.now.
+
+The chat path is fully async: the LLM is called through one pooled client
+shared by all requests (see llm.py), and CPU-bound retrieval runs in the
+thread pool, so a single worker serves many conversations at once.
+/chat/stream sends the same answer token by token as Server-Sent Events.
+Answers are reused from a persistent cache when the question and the
+retrieved passages match an earlier request (see answer_cache.py), and
+identical questions that arrive together share one computation (see
+singleflight.py). Follow-up questions are answered with the recent turns
+of their conversation (see conversations.py). A rebuilt index is picked up
+without a restart (see hot_reload.py). /search returns ranked passages,
+filtered by metadata, without an LLM call.
+
+Startup warms the worker in the background: the index is loaded, a few
+typical questions are run through retrieval, and LLM connections are opened.
+/health answers as soon as the process is up (liveness); /ready returns 503
+until warmup has finished (readiness). /metrics exposes per-stage latency
+histograms and cache counters in the Prometheus text format (see metrics.py).
 """
 
+import asyncio
+import json
 import os
+import secrets
 import sys
+import time
+from contextlib import aclosing, asynccontextmanager
 from pathlib import Path
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
-from openai import OpenAI
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 
 # Determine base directory
@@ -21,18 +44,107 @@ BASE_DIR = Path(__file__).parent.parent.parent if '__file__' in dir() else Path.
 sys.path.insert(0, str(BASE_DIR / "src"))
 
 from config import settings
+from api.admission import LLMAdmission, Overloaded, RateLimiter
+from api.answer_cache import AnswerCache, answer_key
+from api.batch import answer_batch
+from api.conversations import Conversation, load_conversation, open_conversation_store
+from api.hot_reload import IndexHolder, watch
+from api.llm import DeadlineExceeded, LLMClient
+from api.metrics import (
+    CONTENT_TYPE, CONTEXT_TOKENS, LLM_ERRORS, LLM_FIRST_TOKEN_SECONDS, LLM_SECONDS, REGISTRY,
+    RETRIEVAL_SECONDS, Callback, track_request
+)
+from api.prompts import PROMPT_VERSION, build_messages, context_budget
+from api.rag import Retrieval, retrieve
+from api.singleflight import Channel, SingleFlight
+from api.tokens import estimate_tokens
+from retrieval.query_cache import normalize_query
+from vector_store_module import load_vector_store_module
+
+
+def load_vector_store():
+    """Open the index (blocking)."""
+    # Module imported once; a reload only reopens the index
+    return load_vector_store_module().VectorStore(persist_dir=str(BASE_DIR / "data" / "vector_store"))
+
+
+# Vector store (loaded lazily, swapped in place when the index is rebuilt)
+index = IndexHolder(load_vector_store, BASE_DIR / "data" / "vector_store")
+
+# Shared LLM client, answer cache and conversation store, created at startup
+llm_client: LLMClient | None = None
+answer_cache: AnswerCache | None = None
+conversations = None
 
-# Import vector store (will be loaded lazily)
-vector_store = None
+# LLM concurrency limit and per-client rate limits, created at startup
+admission: LLMAdmission | None = None
+rate_limiter: RateLimiter | None = None
+
+# Set once the startup warmup has finished
+ready = False
+
+# Typical questions run once at startup to fault in the index and fill caches
+WARMUP_QUERIES = [
+    "thủ tục đăng ký khai sinh cần giấy tờ gì",
+    "lệ phí đăng ký kết hôn",
+    "đăng ký thường trú ở đâu",
+    "thời hạn cấp giấy phép xây dựng",
+    "chứng thực bản sao từ bản chính",
+]
+
+# Identical questions in flight at the same time share one retrieval and LLM call
+chat_flights = SingleFlight()
+stream_flights = SingleFlight()
 
 # Load environment variables
 load_dotenv()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create the pooled LLM client and the caches once per worker and warm up; close them on shutdown."""
+    global llm_client, answer_cache, conversations, ready, admission, rate_limiter
+    api_key = settings.ai4u_api_key or os.getenv("AI4U_API_KEY")
+    if api_key:
+        llm_client = LLMClient(api_key=api_key)
+    answer_cache = AnswerCache(
+        settings.answer_cache_path or str(BASE_DIR / "data" / "answer_cache.db"),
+        max_entries=settings.answer_cache_size,
+        ttl=settings.answer_cache_ttl
+    )
+    conversations = open_conversation_store(
+        settings.conversation_db_path,
+        max_entries=settings.conversation_max,
+        ttl=settings.conversation_ttl
+    )
+    admission = LLMAdmission(
+        max_concurrent=settings.llm_max_concurrency,
+        max_queue=settings.llm_max_queue,
+        queue_timeout=settings.llm_queue_timeout
+    )
+    rate_limiter = RateLimiter(per_minute=settings.rate_limit_per_minute, burst=settings.rate_limit_burst)
+    watcher = asyncio.create_task(watch(index, settings.index_watch_interval)) if settings.index_watch_interval > 0 else None
+    warmup = asyncio.create_task(warm_up()) if settings.warmup else None
+    ready = not settings.warmup
+    yield
+    for task in (watcher, warmup):
+        if task is not None:
+            task.cancel()
+    if llm_client is not None:
+        await llm_client.close()
+        llm_client = None
+    answer_cache.close()
+    answer_cache = None
+    conversations.close()
+    conversations = None
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Diên Sanh Chatbot API",
     description="RAG-powered chatbot for Diên Sanh commune public services",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS configuration for widget embedding
@@ -46,32 +158,95 @@ app.add_middleware(
 
 
 def get_vector_store():
-    """Lazy-load vector store."""
-    global vector_store
-    if vector_store is None:
-        # Import from parent directory
-        import importlib.util
-        vs_path = BASE_DIR / "src" / "vector-store.py"
-        spec = importlib.util.spec_from_file_location("vector_store", vs_path)
-        vs_module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(vs_module)
-        vector_store = vs_module.VectorStore(persist_dir=str(BASE_DIR / "data" / "vector_store"))
-    return vector_store
-
-
-def get_llm_client() -> OpenAI:
-    """Get OpenAI-compatible client for api.ai4u.now."""
-    api_key = settings.ai4u_api_key or os.getenv("AI4U_API_KEY")
-    if not api_key:
+    """
+    Current vector store (blocking; call from the thread pool).
+
+    Call once per request and keep the result: a reload swaps in a new store
+    while the request finishes on this one.
+    """
+    return index.get()
+
+
+def _query_cache_counts() -> dict:
+    stats = index.store.cache_stats()
+    return {("hit",): stats["hits"], ("miss",): stats["misses"]}
+
+
+# Read from their owners at scrape time
+REGISTRY.register(Callback(
+    "diensanh_index_documents", "Passages in the loaded index", lambda: {(): index.store.count()}
+))
+REGISTRY.register(Callback(
+    "diensanh_index_generation", "Generation of the loaded index", lambda: {(): index.store.index.generation}
+))
+REGISTRY.register(Callback(
+    "diensanh_index_reloads_total", "Hot reloads of the index", lambda: {(): index.reloads}, kind="counter"
+))
+REGISTRY.register(Callback(
+    "diensanh_query_cache_requests_total", "Search result cache lookups of the loaded index",
+    _query_cache_counts, kind="counter", labels=("result",)
+))
+REGISTRY.register(Callback(
+    "diensanh_answer_cache_requests_total", "Answer cache lookups",
+    lambda: {("hit",): answer_cache.hits, ("miss",): answer_cache.misses}, kind="counter", labels=("result",)
+))
+REGISTRY.register(Callback(
+    "diensanh_coalesced_requests_total", "Chat requests that started a computation or joined one in flight",
+    lambda: {
+        (endpoint, role): flights.stats()[role]
+        for endpoint, flights in (("chat", chat_flights), ("chat_stream", stream_flights))
+        for role in ("started", "joined")
+    },
+    kind="counter", labels=("endpoint", "role")
+))
+
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    """429/503 with Retry-After, so clients back off instead of retrying at once."""
+    return JSONResponse(
+        status_code=exc.status,
+        content={"detail": exc.detail},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
+def client_key(request: Request) -> str:
+    """Rate-limit key of the caller: its address, or the first X-Forwarded-For hop behind a trusted proxy."""
+    if settings.trust_forwarded_for:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+REGISTRY.register(Callback(
+    "diensanh_llm_hedge_delay_seconds", "Completion time after which a second request is sent",
+    lambda: {(): llm_client.hedge_delay() if settings.llm_hedge else None}
+))
+REGISTRY.register(Callback(
+    "diensanh_llm_slots", "LLM calls holding a slot or waiting for one",
+    lambda: {("active",): admission.active, ("waiting",): admission.waiting}, labels=("state",)
+))
+REGISTRY.register(Callback(
+    "diensanh_rejected_requests_total", "Requests refused by admission control or rate limits",
+    lambda: {
+        ("queue_full",): admission.rejected["queue_full"],
+        ("queue_timeout",): admission.rejected["queue_timeout"],
+        ("rate_limited",): rate_limiter.limited,
+    },
+    kind="counter", labels=("reason",)
+))
+
+
+def get_llm_client() -> LLMClient:
+    """Get the shared client for api.ai4u.now."""
+    if llm_client is None:
         raise HTTPException(
             status_code=500,
             detail="AI4U API key not configured. Set AI4U_API_KEY environment variable."
         )
-
-    return OpenAI(
-        base_url=settings.ai4u_base_url,
-        api_key=api_key
-    )
+    return llm_client
 
 
 # Request/Response models
@@ -85,138 +260,468 @@ class ChatResponse(BaseModel):
     response: str
     sources: list[dict] | None = None
     conversation_id: str | None = None
+    cached: bool = False
 
 
-class HealthResponse(BaseModel):
-    status: str
-    documents_indexed: int
-    model: str
+class BatchRequest(BaseModel):
+    questions: list[str]
+    include_sources: bool = True
+
+
+class BatchItem(BaseModel):
+    question: str
+    response: str | None = None
+    sources: list[dict] | None = None
+    cached: bool = False
+    error: str | None = None
+    retrieval_ms: float
+    llm_ms: float | None = None
+
+
+class BatchResponse(BaseModel):
+    results: list[BatchItem]
+    failed: int
+    total_ms: float
+
 
+class SearchResult(BaseModel):
+    title: str
+    url: str
+    section: str | None = None
+    snippet: str
+    score: float
+    source: str | None = None
+    procedure_type: str | None = None
+    page_name: str | None = None
+    field: str | None = None
 
-# System prompt for the chatbot
-SYSTEM_PROMPT = """Bạn là trợ lý ảo của UBND xã Diên Sanh, tỉnh Quảng Trị.
-Nhiệm vụ của bạn là hỗ trợ người dân tìm hiểu thông tin về:
-- Các thủ tục hành chính công (đăng ký khai sinh, kết hôn, cấp giấy tờ, v.v.)
-- Thông tin về UBND xã và các cơ quan liên quan
-- Hướng dẫn quy trình, hồ sơ cần thiết, thời gian xử lý, phí/lệ phí
 
-Quy tắc trả lời:
-1. Trả lời bằng tiếng Việt, ngắn gọn, dễ hiểu
-2. Chỉ trả lời dựa trên thông tin được cung cấp trong ngữ cảnh
-3. Nếu không có thông tin, nói rõ và hướng dẫn liên hệ UBND xã
-4. Cung cấp thông tin liên hệ khi cần: Điện thoại, địa chỉ, email (nếu có trong ngữ cảnh)
-5. Nếu thủ tục có bước thực hiện, liệt kê rõ ràng từng bước
+class SearchResponse(BaseModel):
+    query: str
+    page: int
+    page_size: int
+    has_more: bool
+    results: list[SearchResult]
+    took_ms: float
 
-Luôn thân thiện và sẵn sàng hỗ trợ người dân."""
+
+class HealthResponse(BaseModel):
+    status: str
+    ready: bool = False
+    documents_indexed: int
+    model: str
+    query_cache: dict | None = None
+    answer_cache: dict | None = None
+    coalescing: dict | None = None
+    admission: dict | None = None
+    index: dict | None = None
 
 
-def build_context(query: str, n_results: int = 5) -> str:
-    """Retrieve relevant context from vector store."""
+def retrieve_context(query: str, n_results: int = 8) -> Retrieval:
+    """The single retrieval pass of a chat request (blocking; call from the thread pool)."""
     try:
         store = get_vector_store()
-        results = store.search(query, n_results=n_results)
+    except Exception as e:
+        print(f"Error loading vector store: {e}")
+        return Retrieval(query, [], 0.0, error=str(e))
+    retrieval = retrieve(store, query, n_results=n_results)
+    if retrieval.error is None:
+        RETRIEVAL_SECONDS.observe(retrieval.seconds)
+    return retrieval
+
+
+def cache_key(retrieval: Retrieval, model: str) -> str | None:
+    """Answer cache key for a request, or None when its answer must not be cached."""
+    if answer_cache is None or not answer_cache.enabled or retrieval.error is not None:
+        return None  # Without evidence the answer says nothing reusable
+    return answer_key(retrieval.query, retrieval.results, model, PROMPT_VERSION)
+
+
+def prompt_messages(message: str, retrieval: Retrieval, conversation: Conversation, model: str) -> list[dict]:
+    """The LLM prompt for a question, with its context packed to the model's budget."""
+    messages = build_messages(message, retrieval.context(context_budget(model)), conversation.history())
+    packing = retrieval.packing
+    if packing:
+        CONTEXT_TOKENS.observe(packing["context_tokens"])
+        print(
+            f"Prompt: ~{sum(estimate_tokens(m['content']) for m in messages)} tokens, "
+            f"context {packing['context_tokens']}/{packing['budget_tokens']} tokens "
+            f"from {packing['passages']} passages ({packing['duplicates']} duplicates dropped)"
+        )
+    return messages
+
 
-        if not results:
-            return "Không tìm thấy thông tin liên quan trong cơ sở dữ liệu."
+def flight_key(message: str, conversation: Conversation):
+    """Coalescing key: a question opening a conversation can share an answer, a follow-up can't."""
+    return normalize_query(message) if conversation.empty else object()
 
-        context_parts = []
-        for i, r in enumerate(results, 1):
-            title = r["metadata"].get("title", "Không có tiêu đề")
-            source = r["metadata"].get("source", "unknown")
-            content = r["content"][:1500]  # Limit content length
 
-            context_parts.append(f"[{i}] {title}\n(Nguồn: {source})\n{content}")
+def remember(conversation: Conversation, message: str, answer: str) -> None:
+    """Add the turn to the conversation and store it (blocking; call from the thread pool)."""
+    conversation.add_turn(message, answer, settings.history_tokens, settings.summary_tokens)
+    conversations.put(conversation)
 
-        return "\n\n---\n\n".join(context_parts)
 
+async def warm_up() -> None:
+    """Load the index, run typical questions through retrieval and open LLM connections."""
+    global ready
+    start = time.perf_counter()
+    try:
+        store = await run_in_threadpool(get_vector_store)
+        await run_in_threadpool(store.facet_counts)  # Builds the facet bitmaps for /search
+        for query in WARMUP_QUERIES:
+            retrieval = await run_in_threadpool(retrieve_context, query)
+            retrieval.context(context_budget(llm_client.model if llm_client else settings.chat_model))
+        if llm_client is not None:
+            await llm_client.warm_up(settings.llm_warm_connections)
     except Exception as e:
-        print(f"Error retrieving context: {e}")
-        return ""
+        print(f"Error warming up: {e}")  # Serve anyway; the first requests pay instead
+    ready = True
+    print(f"Warmup finished in {time.perf_counter() - start:.2f}s")
+
+
+def sse(event: str, data) -> str:
+    """One Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
 
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
-    """Health check endpoint."""
-    try:
-        store = get_vector_store()
-        doc_count = store.count()
-    except:
-        doc_count = 0
+    """Liveness: answers without waiting for the index (see /ready)."""
+    store = index.store
+    doc_count = store.count() if store is not None else 0
+    cache_stats = store.cache_stats() if store is not None else None
 
     return HealthResponse(
         status="healthy",
+        ready=ready,
         documents_indexed=doc_count,
-        model=settings.chat_model
+        model=settings.chat_model,
+        query_cache=cache_stats,
+        answer_cache=await run_in_threadpool(answer_cache.stats) if answer_cache else None,
+        coalescing={"chat": chat_flights.stats(), "stream": stream_flights.stats()},
+        admission=admission.stats() if admission else None,
+        index=index.stats()
     )
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics of this worker."""
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+@app.get("/ready")
+async def readiness():
+    """Readiness: 503 until the startup warmup has finished."""
+    if not ready:
+        raise HTTPException(status_code=503, detail="Warming up")
+    return {"ready": True, "documents_indexed": index.store.count() if index.store is not None else 0}
+
+
+def require_admin(token: str) -> None:
+    """403 unless ADMIN_TOKEN is configured and `token` matches it."""
+    if not settings.admin_token or not secrets.compare_digest(token, settings.admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+@app.post("/admin/reload")
+async def reload_index(x_admin_token: str = Header(default="")):
+    """Reopen the index now; requests in flight finish on the old one."""
+    require_admin(x_admin_token)
+    try:
+        await run_in_threadpool(index.reload)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Reload failed: {str(e)}")
+    return {"documents_indexed": index.store.count(), **index.stats()}
+
+
+async def answer_question(
+    message: str,
+    client: LLMClient,
+    conversation: Conversation
+) -> tuple[Retrieval, str, bool]:
+    """Retrieval, answer and whether it came from the answer cache."""
+    # Retrieve once (CPU-bound, off the event loop); context and sources share the result
+    retrieval = await run_in_threadpool(retrieve_context, conversation.retrieval_query(message))
+
+    # Answers that depend on earlier turns are not reusable
+    key = cache_key(retrieval, client.model) if conversation.empty else None
+    if key is not None:
+        answer = await run_in_threadpool(answer_cache.get, key)
+        if answer is not None:
+            return retrieval, answer, True
+
+    # Build messages for LLM
+    messages = prompt_messages(message, retrieval, conversation, client.model)
+
+    # Call LLM (waits for a slot, or fails fast with 503 when saturated)
+    async with admission.slot():
+        start = time.perf_counter()
+        try:
+            answer = await client.complete(
+                messages,
+                temperature=0.3,  # Lower for more factual responses
+                max_tokens=1024
+            )
+
+        except DeadlineExceeded as e:
+            LLM_ERRORS.inc("complete")
+            raise HTTPException(status_code=504, detail=f"LLM error: {str(e)}")
+        except Exception as e:
+            LLM_ERRORS.inc("complete")
+            raise HTTPException(status_code=500, detail=f"LLM error: {str(e)}")
+        else:
+            LLM_SECONDS.observe(time.perf_counter() - start, "complete")
+
+    if key is not None:
+        await run_in_threadpool(answer_cache.put, key, answer, client.model)
+    return retrieval, answer, False
+
+
+async def stream_answer(message: str, client: LLMClient, conversation: Conversation, channel: Channel) -> None:
+    """Publish ("retrieval", Retrieval), then ("cached", answer) or one ("token", delta) per delta."""
+    retrieval = await run_in_threadpool(retrieve_context, conversation.retrieval_query(message))
+    channel.publish(("retrieval", retrieval))
+
+    key = cache_key(retrieval, client.model) if conversation.empty else None
+    answer = await run_in_threadpool(answer_cache.get, key) if key is not None else None
+    if answer is not None:
+        channel.publish(("cached", answer))
+        return
+
+    parts = []
+    messages = prompt_messages(message, retrieval, conversation, client.model)
+    async with admission.slot():
+        start = time.perf_counter()
+        try:
+            async with aclosing(client.stream(messages)) as deltas:
+                async for delta in deltas:
+                    if not parts:
+                        LLM_FIRST_TOKEN_SECONDS.observe(time.perf_counter() - start)
+                    parts.append(delta)
+                    channel.publish(("token", delta))
+        except Exception:
+            LLM_ERRORS.inc("stream")
+            raise
+        LLM_SECONDS.observe(time.perf_counter() - start, "stream")
+    if key is not None:
+        await run_in_threadpool(answer_cache.put, key, "".join(parts), client.model)
+
+
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request):
     """
     Main chat endpoint.
     Uses RAG to retrieve relevant context and generate response.
+    Concurrent requests with the same question share one answer.
+    Turns are remembered under conversation_id (a new id is returned when
+    none is given), and follow-ups are answered in that context.
+    Returns 429 past the client's rate limit and 503 when the LLM queue is
+    full, both with Retry-After.
     """
     if not request.message.strip():
         raise HTTPException(status_code=400, detail="Message cannot be empty")
+    client = get_llm_client()
+    rate_limiter.check(client_key(http_request))
+    with track_request("chat"):
+        conversation = await run_in_threadpool(load_conversation, conversations, request.conversation_id)
+
+        retrieval, answer, cached = await chat_flights.do(
+            flight_key(request.message, conversation),
+            lambda: answer_question(request.message, client, conversation)
+        )
+        await run_in_threadpool(remember, conversation, request.message, answer)
+
+    return ChatResponse(
+        response=answer,
+        sources=retrieval.sources() if request.include_sources else None,
+        conversation_id=conversation.id,
+        cached=cached
+    )
 
-    # Retrieve relevant context
-    context = build_context(request.message)
 
-    # Build messages for LLM
-    messages = [
-        {"role": "system", "content": SYSTEM_PROMPT},
-        {
-            "role": "user",
-            "content": f"""Ngữ cảnh (thông tin từ cơ sở dữ liệu):
----
-{context}
----
-
-Câu hỏi của người dân: {request.message}
-
-Hãy trả lời câu hỏi dựa trên ngữ cảnh trên."""
-        }
-    ]
-
-    # Call LLM
-    try:
-        client = get_llm_client()
-        response = client.chat.completions.create(
-            model=settings.chat_model,
-            messages=messages,
-            temperature=0.3,  # Lower for more factual responses
-            max_tokens=1024
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest, http_request: Request):
+    """
+    Streaming chat endpoint (Server-Sent Events).
+
+    Events, in order: `sources` (list, empty unless include_sources), one
+    `token` per text delta ({"content": ...}), then `done`
+    ({"conversation_id": ..., "cached": ...}) or `error` ({"detail": ...}).
+    A cached answer arrives as a single token. Concurrent requests with the
+    same question share one upstream stream; when every one of them has
+    disconnected, the upstream completion is cancelled and nothing is cached.
+    A turn is remembered under conversation_id only once it has streamed in full.
+    Over the rate limit or with the LLM queue full the request is refused
+    up front (429/503 with Retry-After); if no LLM slot frees up in time
+    after the stream has started, it ends with an `error` event carrying
+    `retry_after`.
+    """
+    if not request.message.strip():
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
+    client = get_llm_client()
+    rate_limiter.check(client_key(http_request))
+    if admission.saturated:
+        raise Overloaded(503, "Server busy, please retry", admission.retry_after())
+    conversation = await run_in_threadpool(load_conversation, conversations, request.conversation_id)
+
+    async def events():
+        with track_request("chat_stream"):
+            # Headers are already out; retrieval happens while the client waits for the first event
+            cached, parts = False, []
+            items = stream_flights.subscribe(
+                flight_key(request.message, conversation),
+                lambda channel: stream_answer(request.message, client, conversation, channel)
+            )
+            try:
+                async with aclosing(items):
+                    async for kind, value in items:
+                        if kind == "retrieval":
+                            yield sse("sources", value.sources() if request.include_sources else [])
+                        else:
+                            cached = kind == "cached"
+                            parts.append(value)
+                            yield sse("token", {"content": value})
+            except Overloaded as e:
+                yield sse("error", {"detail": e.detail, "retry_after": e.retry_after})
+                return
+            except Exception as e:
+                yield sse("error", {"detail": f"LLM error: {str(e)}"})
+                return
+            await run_in_threadpool(remember, conversation, request.message, "".join(parts))
+            yield sse("done", {"conversation_id": conversation.id, "cached": cached})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}  # No proxy buffering
+    )
+
+
+@app.post("/chat/batch", response_model=BatchResponse)
+async def chat_batch(request: BatchRequest, http_request: Request, x_admin_token: str = Header(default="")):
+    """
+    Answer many questions at once (offline evaluation, pre-answering).
+
+    Needs the X-Admin-Token header: one request can start hundreds of paid
+    LLM calls, so the endpoint is not open to the public.
+
+    Retrieval runs as one vectorized pass and LLM calls go out at most
+    BATCH_CONCURRENCY at a time. Results are in question order; a failed
+    item carries its error instead of failing the batch. No conversation
+    memory is used. The LLM calls share the server's admission limit, and
+    every question counts as one request against the client's rate limit.
+    """
+    require_admin(x_admin_token)
+    if not request.questions:
+        raise HTTPException(status_code=400, detail="No questions")
+    if len(request.questions) > settings.batch_max_questions:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.batch_max_questions} questions per batch"
+        )
+    client = get_llm_client()
+    rate_limiter.check(client_key(http_request), cost=len(request.questions))
+
+    with track_request("chat_batch"):
+        start = time.perf_counter()
+        store = await run_in_threadpool(get_vector_store)
+        results = await answer_batch(
+            store, client, request.questions, answer_cache,
+            concurrency=settings.batch_concurrency,
+            include_sources=request.include_sources,
+            admission=admission
         )
 
-        answer = response.choices[0].message.content
+    return BatchResponse(
+        results=results,
+        failed=sum(item["error"] is not None for item in results),
+        total_ms=round((time.perf_counter() - start) * 1000, 3)
+    )
+
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"LLM error: {str(e)}")
+def search_documents(query: str, filters: dict, page: int, page_size: int) -> tuple[list[dict], bool]:
+    """
+    One page of matching documents, best passage each (blocking; call from the thread pool).
 
-    # Prepare sources if requested
-    sources = None
-    if request.include_sources:
-        try:
-            store = get_vector_store()
-            results = store.search(request.message, n_results=3)
-            sources = [
-                {
-                    "title": r["metadata"].get("title", ""),
-                    "url": r["metadata"].get("url", ""),
-                    "score": r["score"]
-                }
-                for r in results
-            ]
-        except:
-            sources = []
+    Passages are fetched in growing batches until one more document than the
+    page needs has turned up, or the query has no more matches.
+    """
+    store = get_vector_store()
+    wanted = page * page_size
+    n_results = 3 * (wanted + 1)
+    while True:
+        results = store.search(query, n_results=n_results, filters=filters)
+        best = []
+        seen = set()
+        for r in results:
+            if r["parent_id"] not in seen:
+                seen.add(r["parent_id"])
+                best.append(r)
+        if len(best) > wanted or len(results) < n_results:
+            return best[wanted - page_size:wanted], len(best) > wanted
+        n_results *= 2
+
+
+@app.get("/search", response_model=SearchResponse)
+async def search(
+    q: str = Query(..., min_length=1, max_length=500),
+    source: list[str] | None = Query(None),
+    procedure_type: list[str] | None = Query(None),
+    page_name: list[str] | None = Query(None),
+    field: list[str] | None = Query(None),
+    page: int = Query(1, ge=1, le=100),
+    page_size: int = Query(settings.search_page_size, ge=1, le=50)
+):
+    """
+    Retrieval only: ranked documents for a query, without an LLM call.
 
-    return ChatResponse(
-        response=answer,
-        sources=sources,
-        conversation_id=request.conversation_id
+    Filters take one or more values each (?source=dichvucong&field=Hộ tịch)
+    and are applied before scoring, so a page is always full of matching
+    documents. Meant for "related procedures" lists in the widget.
+    """
+    filters = {"source": source, "procedure_type": procedure_type, "page_name": page_name, "field": field}
+    start = time.perf_counter()
+    with track_request("search"):
+        try:
+            results, has_more = await run_in_threadpool(search_documents, q, filters, page, page_size)
+        except Exception as e:
+            print(f"Error searching: {e}")
+            raise HTTPException(status_code=500, detail=f"Search error: {str(e)}")
+
+    return SearchResponse(
+        query=q,
+        page=page,
+        page_size=page_size,
+        has_more=has_more,
+        results=[
+            SearchResult(
+                title=r["metadata"].get("title", ""),
+                url=r["metadata"].get("url", ""),
+                section=r.get("section"),
+                snippet=r["content"][:300],
+                score=r["score"],
+                **{facet: r["metadata"].get(facet) or None for facet in filters}
+            )
+            for r in results
+        ],
+        took_ms=round((time.perf_counter() - start) * 1000, 3)
     )
 
 
+@app.get("/search/facets")
+async def search_facets(
+    source: list[str] | None = Query(None),
+    procedure_type: list[str] | None = Query(None),
+    page_name: list[str] | None = Query(None),
+    field: list[str] | None = Query(None)
+):
+    """Documents per value of every filter facet, among those matching the given filters."""
+    filters = {"source": source, "procedure_type": procedure_type, "page_name": page_name, "field": field}
+    return await run_in_threadpool(lambda: get_vector_store().facet_counts(filters))
+
+
 @app.get("/", response_class=HTMLResponse)
 async def root():
     """Simple test page."""
@@ -0,0 +1,173 @@
+"""
+Answer many questions in one go, for offline evaluation and pre-answering.
+
+Retrieval for the whole batch runs as one vectorized pass
+(VectorStore.search_many), then the LLM calls go out with bounded
+concurrency. Results come back in question order, each with its own timing
+and, when it failed, its error; one failure does not fail the batch.
+Answers are read from and written to the answer cache like /chat answers.
+
+The API server exposes this as POST /chat/batch, behind ADMIN_TOKEN. From
+the command line:
+
+    python src/api/batch.py questions.txt [--output answers.jsonl] [--concurrency 8] [--no-cache]
+
+questions.txt holds one question per line, or one {"question": ...} object
+per line (.jsonl); other fields of the object are copied to the output.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(BASE_DIR / "src"))
+
+from fastapi.concurrency import run_in_threadpool
+
+from api.answer_cache import answer_key
+from api.metrics import CONTEXT_TOKENS, LLM_ERRORS, LLM_SECONDS, RETRIEVAL_SECONDS
+from api.prompts import PROMPT_VERSION, build_messages, context_budget
+from api.rag import Retrieval, retrieve_many
+from config import settings
+
+
+async def answer_batch(
+    store,
+    client,
+    questions: list[str],
+    answer_cache=None,
+    concurrency: int = 8,
+    include_sources: bool = True,
+    admission=None
+) -> list[dict]:
+    """One result per question, in order: response, sources, cached, error and timings in ms."""
+    start = time.perf_counter()
+    retrievals = await run_in_threadpool(retrieve_many, store, questions)
+    if retrievals and retrievals[0].error is None:
+        RETRIEVAL_SECONDS.observe(time.perf_counter() - start)  # One pass for the whole batch
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def answer_one(question: str, retrieval: Retrieval) -> dict:
+        item = {
+            "question": question,
+            "response": None,
+            "sources": None,
+            "cached": False,
+            "error": None,
+            "retrieval_ms": round(retrieval.seconds * 1000, 3),  # Share of the batch search
+            "llm_ms": None,
+        }
+        if not question.strip():
+            item["error"] = "Message cannot be empty"
+            return item
+        if include_sources:
+            item["sources"] = retrieval.sources()
+
+        key = None
+        if answer_cache is not None and answer_cache.enabled and retrieval.error is None:
+            key = answer_key(question, retrieval.results, client.model, PROMPT_VERSION)
+            item["response"] = await run_in_threadpool(answer_cache.get, key)
+            if item["response"] is not None:
+                item["cached"] = True
+                return item
+
+        messages = build_messages(question, retrieval.context(context_budget(client.model)))
+        if retrieval.packing:
+            CONTEXT_TOKENS.observe(retrieval.packing["context_tokens"])
+        async with semaphore:
+            llm_start = time.perf_counter()
+            try:
+                if admission is None:
+                    item["response"] = await client.complete(messages, temperature=0.3, max_tokens=1024)
+                else:
+                    async with admission.slot():  # Shares the server's LLM limit with interactive chats
+                        item["response"] = await client.complete(messages, temperature=0.3, max_tokens=1024)
+            except Exception as e:
+                LLM_ERRORS.inc("complete")
+                item["error"] = f"LLM error: {str(e)}"
+            else:
+                LLM_SECONDS.observe(time.perf_counter() - llm_start, "complete")
+            item["llm_ms"] = round((time.perf_counter() - llm_start) * 1000, 3)
+
+        if key is not None and item["response"]:
+            await run_in_threadpool(answer_cache.put, key, item["response"], client.model)
+        return item
+
+    return await asyncio.gather(*(answer_one(q, r) for q, r in zip(questions, retrievals)))
+
+
+def read_questions(path: str) -> list[dict]:
+    """Questions of a .txt or .jsonl file; raises ValueError naming the line of a bad entry."""
+    with open(path, "r", encoding="utf-8") as f:
+        lines = [(number, line.strip()) for number, line in enumerate(f, start=1) if line.strip()]
+    if not path.endswith(".jsonl"):
+        return [{"question": line} for _, line in lines]
+
+    entries = []
+    for number, line in lines:
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"{path}:{number}: invalid JSON ({e})")
+        if not isinstance(entry, dict) or not isinstance(entry.get("question"), str) or not entry["question"].strip():
+            raise ValueError(f'{path}:{number}: expected an object with a non-empty "question" string')
+        entries.append(entry)
+    return entries
+
+
+async def main(args: argparse.Namespace) -> None:
+    from api.answer_cache import AnswerCache
+    from api.llm import LLMClient
+    from vector_store_module import load_vector_store_module
+
+    try:
+        entries = read_questions(args.questions)
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+    store = load_vector_store_module().VectorStore(persist_dir=str(BASE_DIR / "data" / "vector_store"))
+
+    if not settings.ai4u_api_key:
+        raise SystemExit("AI4U API key not configured. Set AI4U_API_KEY environment variable.")
+    client = LLMClient(api_key=settings.ai4u_api_key)
+    cache = None
+    if not args.no_cache:
+        cache = AnswerCache(
+            settings.answer_cache_path or str(BASE_DIR / "data" / "answer_cache.db"),
+            max_entries=settings.answer_cache_size,
+            ttl=settings.answer_cache_ttl
+        )
+
+    start = time.perf_counter()
+    try:
+        results = await answer_batch(
+            store, client, [entry["question"] for entry in entries], cache, args.concurrency
+        )
+    finally:
+        await client.close()
+        if cache is not None:
+            cache.close()
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    for entry, result in zip(entries, results):
+        out.write(json.dumps({**entry, **result}, ensure_ascii=False) + "\n")
+    if args.output:
+        out.close()
+    failed = sum(result["error"] is not None for result in results)
+    print(
+        f"Answered {len(results) - failed}/{len(results)} questions in {time.perf_counter() - start:.1f}s",
+        file=sys.stderr
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("questions", help="Questions file (.txt or .jsonl)")
+    parser.add_argument("--output", help="Write JSON lines to this file (default: stdout)")
+    parser.add_argument("--concurrency", type=int, default=settings.batch_concurrency, help="Parallel LLM calls")
+    parser.add_argument("--no-cache", action="store_true", help="Neither read nor write the answer cache")
+    asyncio.run(main(parser.parse_args()))
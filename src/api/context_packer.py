@@ -0,0 +1,97 @@
+"""
+Token-budgeted prompt context.
+
+Retrieved passages are packed into a context of at most `max_tokens`
+(estimated, see tokens.py):
+
+1. Near-duplicates are dropped. The same procedure is often scraped from
+   several search terms under different URLs; passages whose word 3-gram
+   sets overlap by DUPLICATE_JACCARD or more keep only the best-scored copy.
+2. Passages are taken in score order. A passage that fits whole goes in
+   whole; otherwise its sentences are ranked by how many query words they
+   contain and added greedily while they fit, then printed in their
+   original order.
+"""
+
+import re
+
+from api.tokens import estimate_tokens
+from retrieval.query_cache import normalize_query
+
+DUPLICATE_JACCARD = 0.8
+SHINGLE_WORDS = 3
+MIN_SENTENCE_TOKENS = 8  # Stop packing once less than this is left
+SEPARATOR = "\n\n---\n\n"
+WORD = re.compile(r"\w+")
+SENTENCE = re.compile(r"(?<=[.!?;])\s+|\n+")
+
+
+def shingles(text: str) -> set[tuple[str, ...]]:
+    words = WORD.findall(text.lower())
+    if len(words) < SHINGLE_WORDS:
+        return {tuple(words)}
+    return {tuple(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def drop_duplicates(results: list[dict], threshold: float = DUPLICATE_JACCARD) -> list[dict]:
+    """`results` (best first) without passages that repeat a better one."""
+    kept, kept_shingles = [], []
+    for r in results:
+        current = shingles(r["content"])
+        if any(len(current & other) / len(current | other) >= threshold for other in kept_shingles):
+            continue
+        kept.append(r)
+        kept_shingles.append(current)
+    return kept
+
+
+def header(number: int, r: dict) -> str:
+    title = r["metadata"].get("title", "Không có tiêu đề")
+    if r.get("section"):
+        title = f"{title} - {r['section']}"
+    source = r["metadata"].get("source", "unknown")
+    return f"[{number}] {title}\n(Nguồn: {source})\n"
+
+
+def select_sentences(content: str, query_words: set[str], max_tokens: int) -> str:
+    """The sentences of `content` that best match the query, within `max_tokens`, in order."""
+    sentences = [s.strip() for s in SENTENCE.split(content) if s.strip()]
+    ranked = sorted(
+        range(len(sentences)),
+        key=lambda i: (-len(query_words & set(WORD.findall(sentences[i].lower()))), i)
+    )
+    chosen, used = [], 0
+    for i in ranked:
+        cost = estimate_tokens(sentences[i])
+        if used + cost <= max_tokens:
+            chosen.append(i)
+            used += cost
+    return "\n".join(sentences[i] for i in sorted(chosen))
+
+
+def pack_context(query: str, results: list[dict], max_tokens: int) -> tuple[str, dict]:
+    """Context text for the prompt and packing stats (tokens, passages used, duplicates dropped)."""
+    unique = drop_duplicates(results)
+    query_words = set(WORD.findall(normalize_query(query)))
+
+    parts, used = [], 0
+    for r in unique:
+        remaining = max_tokens - used - estimate_tokens(SEPARATOR) * bool(parts)
+        head = header(len(parts) + 1, r)
+        room = remaining - estimate_tokens(head)
+        if room < MIN_SENTENCE_TOKENS:
+            break
+        content = r["content"]
+        if estimate_tokens(content) > room:
+            content = select_sentences(content, query_words, room)
+            if not content:
+                continue
+        parts.append(head + content)
+        used = estimate_tokens(SEPARATOR.join(parts))
+
+    return SEPARATOR.join(parts), {
+        "context_tokens": used,
+        "budget_tokens": max_tokens,
+        "passages": len(parts),
+        "duplicates": len(results) - len(unique),
+    }
@@ -0,0 +1,203 @@
+"""
+Conversation memory behind ChatRequest.conversation_id.
+
+A conversation keeps its recent turns verbatim within a token budget. Older
+turns are folded into a rolling summary, which has its own budget and drops
+its oldest lines first, so the history sent to the LLM stays bounded however
+long the conversation runs. The summary is extractive (each folded turn
+becomes the question plus the first sentence of the answer), so memory
+costs no extra LLM calls.
+
+Follow-ups such as "còn lệ phí thì sao?" carry no topic, so they are rewritten
+for retrieval by prefixing the topic of the conversation, the last question
+that was not itself a follow-up.
+
+Conversations live in an in-process LRU by default, or in a SQLite file
+shared by workers when CONVERSATION_DB_PATH is set.
+"""
+
+import json
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from api.tokens import clip_tokens, estimate_tokens
+from retrieval.query_cache import normalize_query
+
+# Questions that lean on an earlier turn: "còn ...", "vậy ...", "... thì sao", "thủ tục đó"
+FOLLOW_UP_START = re.compile(r"^(còn|vậy|thế|thế còn|nếu vậy|nếu thế|thì|và|rồi)\b")
+FOLLOW_UP_WORDS = re.compile(r"\b(đó|này|nó|trên|kia|thì sao|như vậy)\b")
+FOLLOW_UP_MAX_WORDS = 3  # Questions this short rarely name the procedure
+SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+SUMMARY_PREFIX = "Tóm tắt các lượt hỏi đáp trước:"
+
+
+def is_follow_up(message: str) -> bool:
+    question = normalize_query(message)
+    return (
+        len(question.split()) <= FOLLOW_UP_MAX_WORDS
+        or FOLLOW_UP_START.match(question) is not None
+        or FOLLOW_UP_WORDS.search(question) is not None
+    )
+
+
+class Conversation:
+    """Recent turns, a rolling summary of older ones, and the current topic."""
+
+    def __init__(
+        self,
+        conversation_id: str,
+        turns: Optional[list[dict]] = None,
+        summary: Optional[list[str]] = None,
+        topic: str = ""
+    ):
+        self.id = conversation_id
+        self.turns = turns or []  # {"role": "user" | "assistant", "content": ...}
+        self.summary = summary or []  # One line per folded question/answer pair
+        self.topic = topic
+
+    @property
+    def empty(self) -> bool:
+        return not self.turns and not self.summary
+
+    def retrieval_query(self, message: str) -> str:
+        """`message` as a standalone search query."""
+        if self.topic and is_follow_up(message):
+            return f"{self.topic} {message}"
+        return message
+
+    def history(self) -> list[dict]:
+        """Chat messages to put before the new question."""
+        messages = []
+        if self.summary:
+            messages.append({"role": "system", "content": "\n".join([SUMMARY_PREFIX] + self.summary)})
+        messages.extend({"role": turn["role"], "content": turn["content"]} for turn in self.turns)
+        return messages
+
+    def add_turn(self, message: str, answer: str, history_tokens: int, summary_tokens: int) -> None:
+        """Record a question and its answer, then fold old turns until the history fits."""
+        if not (self.topic and is_follow_up(message)):
+            self.topic = clip_tokens(message, 64)
+        self.turns.append({"role": "user", "content": clip_tokens(message, history_tokens // 4)})
+        self.turns.append({"role": "assistant", "content": clip_tokens(answer, history_tokens // 2)})
+
+        while len(self.turns) > 2 and sum(estimate_tokens(t["content"]) for t in self.turns) > history_tokens:
+            question, reply = self.turns[0]["content"], self.turns[1]["content"]
+            del self.turns[:2]
+            first_sentence = SENTENCE_END.split(reply.strip(), maxsplit=1)[0]
+            self.summary.append(f"- Hỏi: {clip_tokens(question, 48)} Đáp: {clip_tokens(first_sentence, 64)}")
+        while self.summary and estimate_tokens("\n".join(self.summary)) > summary_tokens:
+            self.summary.pop(0)
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "turns": self.turns, "summary": self.summary, "topic": self.topic}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Conversation":
+        return cls(data["id"], data["turns"], data["summary"], data["topic"])
+
+
+class MemoryConversationStore:
+    """In-process LRU of conversations with an idle timeout."""
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 86400.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, conversation_id: str) -> Optional[Conversation]:
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                self._entries.pop(conversation_id, None)
+                return None
+            self._entries.move_to_end(conversation_id)
+            # Stored as a dict so a request can't change the stored copy before put()
+            return Conversation.from_dict(json.loads(json.dumps(entry[1])))
+
+    def put(self, conversation: Conversation) -> None:
+        with self._lock:
+            self._entries[conversation.id] = (time.monotonic(), conversation.to_dict())
+            self._entries.move_to_end(conversation.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def count(self) -> int:
+        return len(self._entries)
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteConversationStore:
+    """Conversations in a SQLite file shared by workers, with an idle timeout and LRU eviction."""
+
+    def __init__(self, path: str, max_entries: int = 10000, ttl: float = 86400.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS conversations (
+                id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                updated REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS conversations_updated ON conversations (updated);
+        """)
+
+    def get(self, conversation_id: str) -> Optional[Conversation]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data FROM conversations WHERE id = ? AND updated > ?",
+                (conversation_id, time.time() - self.ttl)
+            ).fetchone()
+        return Conversation.from_dict(json.loads(row[0])) if row else None
+
+    def put(self, conversation: Conversation) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO conversations (id, data, updated) VALUES (?, ?, ?)",
+                (conversation.id, json.dumps(conversation.to_dict(), ensure_ascii=False), now)
+            )
+            self._db.execute("DELETE FROM conversations WHERE updated <= ?", (now - self.ttl,))
+            (count,) = self._db.execute("SELECT COUNT(*) FROM conversations").fetchone()
+            if count > self.max_entries:
+                self._db.execute(
+                    "DELETE FROM conversations WHERE id IN (SELECT id FROM conversations ORDER BY updated LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+            self._db.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+    def close(self) -> None:
+        self._db.close()
+
+
+def open_conversation_store(path: str = "", max_entries: int = 10000, ttl: float = 86400.0):
+    """SQLite store at `path`, or an in-process one when `path` is empty."""
+    if path:
+        return SQLiteConversationStore(path, max_entries, ttl)
+    return MemoryConversationStore(max_entries, ttl)
+
+
+def load_conversation(store, conversation_id: Optional[str]) -> Conversation:
+    """The stored conversation, or a new one (with a fresh id when none was given)."""
+    if conversation_id:
+        conversation = store.get(conversation_id)
+        if conversation is not None:
+            return conversation
+    return Conversation(conversation_id or uuid.uuid4().hex)
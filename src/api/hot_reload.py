@@ -0,0 +1,113 @@
+"""
+Hot reload of the search index in a running server.
+
+The index is published by replacing its manifest (see
+retrieval/segments.py), so a rebuild by `python src/vector-store.py` shows
+up as a new manifest.json. IndexHolder keeps the VectorStore that requests
+use; reload() opens the new index on the side and swaps the reference in
+one assignment. A request holds the store it started with, so requests in
+flight finish on the old snapshot, and the old store is freed (its segment
+maps closed) when the last of them lets go. Segment files a rebuild removes
+stay readable through those maps until then.
+
+watch() polls the manifest and reloads once it has been stable for one
+interval, so a rebuild that commits in several steps is picked up once,
+complete. An index that fails to open (say, a compaction removed segments
+while they were read) leaves the current store in place, and the next
+check tries again.
+"""
+
+import asyncio
+import threading
+import time
+import weakref
+from pathlib import Path
+from typing import Callable, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from retrieval.segments import MANIFEST_FILE
+
+
+def manifest_signature(persist_dir: Path) -> Optional[tuple]:
+    """Identity of the published manifest, or None while there is none."""
+    try:
+        stat = (persist_dir / MANIFEST_FILE).stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+class IndexHolder:
+    """The current VectorStore, replaced atomically on reload."""
+
+    def __init__(self, load: Callable[[], object], persist_dir: Path):
+        self._load = load
+        self.persist_dir = persist_dir
+        self.store = None
+        self.signature: Optional[tuple] = None
+        self.reloads = 0
+        self.loaded_at: Optional[float] = None
+        self._retired: list[weakref.ref] = []
+        self._lock = threading.Lock()
+
+    def get(self):
+        """The current store, loaded on first use (blocking; call from the thread pool)."""
+        if self.store is None:
+            with self._lock:  # Concurrent first requests must not load it twice
+                if self.store is None:
+                    self._swap()
+        return self.store
+
+    def reload(self) -> None:
+        """Open the index again and swap it in (blocking; call from the thread pool)."""
+        with self._lock:  # One reload at a time
+            self._swap()
+
+    def _swap(self) -> None:
+        # Signature first: a manifest replaced while loading triggers another reload
+        signature = manifest_signature(self.persist_dir)
+        store = self._load()
+        if store.load_error:
+            # Keep serving the old index and leave the signature, so the watcher retries
+            if self.store is not None:
+                raise RuntimeError(f"Index could not be opened: {store.load_error}")
+            signature = None
+        old, self.store = self.store, store
+        self.signature = signature
+        self.loaded_at = time.time()
+        if old is not None:
+            self.reloads += 1
+            self._retired.append(weakref.ref(old))
+            print(f"Index reloaded: {store.count()} passages")
+
+    def changed(self) -> bool:
+        signature = manifest_signature(self.persist_dir)
+        return self.store is not None and signature is not None and signature != self.signature
+
+    def stats(self) -> dict:
+        self._retired = [ref for ref in self._retired if ref() is not None]
+        return {
+            "reloads": self.reloads,
+            "loaded_at": self.loaded_at,
+            "draining_snapshots": len(self._retired),  # Old stores still held by requests
+        }
+
+
+async def watch(holder: IndexHolder, interval: float) -> None:
+    """Reload whenever the manifest changes and then stays put for `interval` seconds."""
+    pending = None
+    while True:
+        await asyncio.sleep(interval)
+        if not holder.changed():
+            pending = None
+            continue
+        signature = manifest_signature(holder.persist_dir)
+        if signature != pending:
+            pending = signature  # Wait one more interval for the writer to finish
+            continue
+        try:
+            await run_in_threadpool(holder.reload)
+        except Exception as e:
+            print(f"Error reloading index: {e}")
+        pending = None
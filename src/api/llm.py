@@ -0,0 +1,258 @@
+"""
+Shared async LLM client for the API server.
+
+One AsyncOpenAI client, with its own pooled httpx connection pool, is
+created when the app starts and reused by every request, so chats share
+keep-alive connections instead of paying a new pool and TLS handshake per
+request, and an LLM round-trip never blocks the event loop.
+
+Every call runs under a deadline (LLM_DEADLINE). Within it, connection
+errors, timeouts, 429s and 5xx responses are retried with jittered
+exponential backoff. With LLM_HEDGE on, a completion that takes longer than
+the recent p95 gets a second, identical request, and whichever answers
+first wins while the other is cancelled. When LLM_FALLBACK_MODEL is set,
+the primary model gets the deadline minus LLM_FALLBACK_RESERVE seconds;
+if it has not answered by then, or keeps failing, the rest of the time goes
+to the fallback model. For streams, the deadline, retries and fallback
+cover the wait for the first token; a stream is never hedged.
+"""
+
+import asyncio
+import random
+import time
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+import httpx
+import openai
+from openai import AsyncOpenAI
+
+from api.metrics import LLM_DEADLINES, LLM_FALLBACKS, LLM_HEDGES, LLM_RETRIES
+from config import settings
+
+# Completions timed before hedging starts, and how many recent ones are kept
+HEDGE_MIN_SAMPLES = 20
+HEDGE_WINDOW = 200
+
+
+class DeadlineExceeded(Exception):
+    """No answer within the call's deadline."""
+
+
+def retryable(error: Exception) -> bool:
+    """Errors another attempt may get past: connection problems, timeouts, 408/409/429 and 5xx."""
+    if isinstance(error, openai.APIConnectionError):  # Includes APITimeoutError
+        return True
+    return isinstance(error, openai.APIStatusError) and (
+        error.status_code in (408, 409, 429) or error.status_code >= 500
+    )
+
+
+class LLMClient:
+    """Pooled async client for the OpenAI-compatible chat API."""
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = settings.ai4u_base_url,
+        model: str = settings.chat_model
+    ):
+        self.model = model
+        self.http = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.llm_max_connections,
+                max_keepalive_connections=settings.llm_max_keepalive,
+                keepalive_expiry=settings.llm_keepalive_expiry
+            ),
+            timeout=httpx.Timeout(settings.llm_timeout, connect=settings.llm_connect_timeout)
+        )
+        self.client = AsyncOpenAI(
+            base_url=base_url,
+            api_key=api_key,
+            http_client=self.http,
+            max_retries=0  # Retried by _call() within the deadline
+        )
+        self._latencies: deque[float] = deque(maxlen=HEDGE_WINDOW)
+
+    def hedge_delay(self) -> Optional[float]:
+        """How long a completion may run before it is hedged; None until enough are timed."""
+        if len(self._latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._latencies)
+        quantile = ordered[min(len(ordered) - 1, int(settings.llm_hedge_quantile * len(ordered)))]
+        return max(settings.llm_hedge_min_delay, quantile)
+
+    async def _call(
+        self,
+        mode: str,
+        attempt: Callable[[str], Awaitable],
+        model: str,
+        deadline: Optional[float],
+        hedge: bool
+    ):
+        """Run attempt(model) under the deadline, falling back to the fallback model near its end."""
+        expires = time.monotonic() + (settings.llm_deadline if deadline is None else deadline)
+        fallback = settings.llm_fallback_model
+        if not fallback or fallback == model:
+            return await self._retrying(mode, attempt, model, expires, hedge)
+
+        try:
+            return await self._retrying(
+                mode, attempt, model, expires - settings.llm_fallback_reserve, hedge, final=False
+            )
+        except DeadlineExceeded:
+            reason = "deadline"
+        except Exception as e:
+            if not retryable(e):
+                raise  # A bad request fails the same way on any model
+            reason = "error"
+        LLM_FALLBACKS.inc(mode, reason)
+        return await self._retrying(mode, attempt, fallback, expires, hedge=False)
+
+    async def _retrying(
+        self,
+        mode: str,
+        attempt: Callable[[str], Awaitable],
+        model: str,
+        expires: float,
+        hedge: bool,
+        final: bool = True
+    ):
+        """
+        Retry retryable errors with full-jitter backoff until `expires` (a monotonic time).
+
+        Running out of time counts in LLM_DEADLINES only when `final`, i.e.
+        no fallback model gets a turn afterwards.
+        """
+        for retry in range(settings.llm_max_retries + 1):
+            remaining = expires - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                call = self._hedged(attempt, model) if hedge else attempt(model)
+                return await asyncio.wait_for(call, remaining)
+            except asyncio.TimeoutError:
+                break
+            except Exception as e:
+                if not retryable(e) or retry == settings.llm_max_retries:
+                    raise
+                delay = random.uniform(0, settings.llm_retry_backoff * 2 ** retry)
+                if time.monotonic() + delay >= expires:
+                    raise
+                LLM_RETRIES.inc(mode)
+                await asyncio.sleep(delay)
+        if final:
+            LLM_DEADLINES.inc(mode, model)
+        raise DeadlineExceeded(f"No answer from {model} in time")
+
+    async def _hedged(self, attempt: Callable[[str], Awaitable], model: str):
+        """attempt(model), plus a second copy if the first is slower than the recent p95."""
+        delay = self.hedge_delay() if settings.llm_hedge and model == self.model else None
+        start = time.monotonic()
+        first = asyncio.ensure_future(attempt(model))
+        tasks = [first]
+        try:
+            if delay is not None:
+                await asyncio.wait(tasks, timeout=delay)
+                if not first.done():
+                    tasks.append(asyncio.ensure_future(attempt(model)))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if len(tasks) > 1:
+                            LLM_HEDGES.inc("primary" if task is first else "hedge")
+                        if model == self.model:
+                            self._latencies.append(time.monotonic() - start)
+                        return task.result()
+            raise first.exception()  # Both failed
+        finally:
+            for task in tasks:
+                task.cancel()  # The slower request is abandoned; its connection is closed
+
+    async def complete(
+        self,
+        messages: list[dict],
+        temperature: float = 0.3,
+        max_tokens: int = 1024,
+        model: Optional[str] = None,
+        deadline: Optional[float] = None
+    ) -> str:
+        """
+        Run one chat completion and return the answer text.
+
+        Raises DeadlineExceeded if no model answered within `deadline`
+        seconds (LLM_DEADLINE by default).
+        """
+        async def attempt(model: str) -> str:
+            response = await self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+            return response.choices[0].message.content
+
+        return await self._call("complete", attempt, model or self.model, deadline, hedge=True)
+
+    async def stream(
+        self,
+        messages: list[dict],
+        temperature: float = 0.3,
+        max_tokens: int = 1024,
+        model: Optional[str] = None,
+        deadline: Optional[float] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream a chat completion as text deltas.
+
+        `deadline` bounds the wait for the first delta. Closing the generator
+        early (e.g. the client went away) closes the upstream response, which
+        cancels the completion.
+        """
+        async def attempt(model: str):
+            stream = await self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True
+            )
+            deltas = self._deltas(stream)
+            try:
+                return stream, deltas, await anext(deltas, None)
+            except BaseException:
+                await stream.close()
+                raise
+
+        stream, deltas, first = await self._call("stream", attempt, model or self.model, deadline, hedge=False)
+        try:
+            if first is not None:
+                yield first
+                async for delta in deltas:
+                    yield delta
+        finally:
+            await deltas.aclose()
+            await stream.close()
+
+    @staticmethod
+    async def _deltas(stream) -> AsyncIterator[str]:
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def warm_up(self, connections: int = 1) -> None:
+        """Open pooled connections (TCP + TLS) to the API ahead of the first chat."""
+        client = self.client.with_options(max_retries=0)
+
+        async def touch():
+            try:
+                await client.models.list()
+            except Exception:
+                pass  # Any response, even an error, leaves a connection in the pool
+
+        await asyncio.gather(*(touch() for _ in range(connections)))
+
+    async def close(self) -> None:
+        await self.client.close()
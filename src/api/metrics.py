@@ -0,0 +1,210 @@
+"""
+Prometheus metrics for the chat pipeline, without a client library.
+
+Histograms, counters and gauges are kept in process and rendered in the
+Prometheus text exposition format by /metrics. Recording a value is a lock
+and a bisect, cheap enough to leave on in production. Values that other
+components already count (index size, cache counters) are read through
+callbacks at scrape time instead of being mirrored here.
+
+With several workers each process exposes its own numbers; scrape every
+worker or sum over the `instance` label.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 1536, 2048, 3072, 4096, 8192)
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self._lock = threading.Lock()
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self) -> Iterator[str]:
+        for labels, value in sorted(self._values.items()):
+            yield f"{self.name}{_labels(self.label_names, labels)} {_number(value)}"
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def samples(self) -> Iterator[str]:
+        for labels, value in sorted(self._values.items()):
+            yield f"{self.name}{_labels(self.label_names, labels)} {_number(value)}"
+
+
+class Callback(Metric):
+    """Gauge or counter whose labelled values are read at scrape time."""
+
+    def __init__(self, name: str, help: str, read: Callable[[], dict], kind: str = "gauge",
+                 labels: tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self.kind = kind
+        self._read = read
+
+    def samples(self) -> Iterator[str]:
+        try:
+            values = self._read()
+        except Exception:
+            return  # A component that is not up yet has nothing to report
+        for labels, value in sorted(values.items()):
+            if value is not None:
+                yield f"{self.name}{_labels(self.label_names, labels)} {_number(value)}"
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: tuple[float, ...], labels: tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self.buckets = buckets
+        self._series: dict[tuple, list] = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            index = bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, *labels: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for labels, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                le = _labels(self.label_names, labels, f'le="{_number(bound)}"')
+                yield f"{self.name}_bucket{le} {cumulative}"
+            le = _labels(self.label_names, labels, 'le="+Inf"')
+            yield f"{self.name}_bucket{le} {values[-1]}"
+            yield f"{self.name}_sum{_labels(self.label_names, labels)} {_number(values[-2])}"
+            yield f"{self.name}_count{_labels(self.label_names, labels)} {values[-1]}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self.metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "diensanh_request_seconds", "Chat request time, to the last byte for streams",
+    LATENCY_BUCKETS, labels=("endpoint",)
+))
+REQUESTS_IN_FLIGHT = REGISTRY.register(Gauge(
+    "diensanh_requests_in_flight", "Chat requests being served", labels=("endpoint",)
+))
+RETRIEVAL_SECONDS = REGISTRY.register(Histogram(
+    "diensanh_retrieval_seconds", "Search time per retrieval pass", LATENCY_BUCKETS
+))
+CONTEXT_TOKENS = REGISTRY.register(Histogram(
+    "diensanh_context_tokens", "Estimated tokens of packed prompt context", TOKEN_BUCKETS
+))
+LLM_FIRST_TOKEN_SECONDS = REGISTRY.register(Histogram(
+    "diensanh_llm_first_token_seconds", "Time from the LLM call to its first streamed token", LATENCY_BUCKETS
+))
+LLM_SECONDS = REGISTRY.register(Histogram(
+    "diensanh_llm_seconds", "LLM call time, to the last token for streams", LATENCY_BUCKETS, labels=("mode",)
+))
+LLM_ERRORS = REGISTRY.register(Counter(
+    "diensanh_llm_errors_total", "Failed LLM calls", labels=("mode",)
+))
+LLM_RETRIES = REGISTRY.register(Counter(
+    "diensanh_llm_retries_total", "LLM attempts retried after a retryable error", labels=("mode",)
+))
+LLM_HEDGES = REGISTRY.register(Counter(
+    "diensanh_llm_hedges_total", "Hedged LLM calls by the request that answered", labels=("winner",)
+))
+LLM_FALLBACKS = REGISTRY.register(Counter(
+    "diensanh_llm_fallbacks_total", "LLM calls handed to the fallback model", labels=("mode", "reason")
+))
+LLM_DEADLINES = REGISTRY.register(Counter(
+    "diensanh_llm_deadline_exceeded_total", "LLM calls that ran out of time without an answer",
+    labels=("mode", "model")
+))
+
+
+@contextmanager
+def track_request(endpoint: str):
+    """Count a request in flight and time it."""
+    REQUESTS_IN_FLIGHT.inc(endpoint)
+    try:
+        with REQUEST_SECONDS.time(endpoint):
+            yield
+    finally:
+        REQUESTS_IN_FLIGHT.dec(endpoint)
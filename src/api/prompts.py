@@ -0,0 +1,48 @@
+"""
+Prompt for the chat model, shared by the API server and the batch runner.
+"""
+
+from config import settings
+
+# System prompt for the chatbot
+SYSTEM_PROMPT = """Bạn là trợ lý ảo của UBND xã Diên Sanh, tỉnh Quảng Trị.
+Nhiệm vụ của bạn là hỗ trợ người dân tìm hiểu thông tin về:
+- Các thủ tục hành chính công (đăng ký khai sinh, kết hôn, cấp giấy tờ, v.v.)
+- Thông tin về UBND xã và các cơ quan liên quan
+- Hướng dẫn quy trình, hồ sơ cần thiết, thời gian xử lý, phí/lệ phí
+
+Quy tắc trả lời:
+1. Trả lời bằng tiếng Việt, ngắn gọn, dễ hiểu
+2. Chỉ trả lời dựa trên thông tin được cung cấp trong ngữ cảnh
+3. Nếu không có thông tin, nói rõ và hướng dẫn liên hệ UBND xã
+4. Cung cấp thông tin liên hệ khi cần: Điện thoại, địa chỉ, email (nếu có trong ngữ cảnh)
+5. Nếu thủ tục có bước thực hiện, liệt kê rõ ràng từng bước
+
+Luôn thân thiện và sẵn sàng hỗ trợ người dân."""
+
+# Part of the answer cache key: bump whenever SYSTEM_PROMPT or build_messages changes
+PROMPT_VERSION = "1"
+
+
+def build_messages(message: str, context: str, history: list[dict] | None = None) -> list[dict]:
+    """Prompt for the LLM: system prompt, earlier turns, then the question with its context."""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        *(history or []),
+        {
+            "role": "user",
+            "content": f"""Ngữ cảnh (thông tin từ cơ sở dữ liệu):
+---
+{context}
+---
+
+Câu hỏi của người dân: {message}
+
+Hãy trả lời câu hỏi dựa trên ngữ cảnh trên."""
+        }
+    ]
+
+
+def context_budget(model: str) -> int:
+    """Token budget of the prompt context for `model`."""
+    return settings.context_token_budgets.get(model, settings.context_tokens)
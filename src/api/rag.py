@@ -0,0 +1,86 @@
+"""
+One retrieval pass per chat request.
+
+The prompt context and the sources list shown under an answer come from the
+same search, so a request retrieves once and both read from the Retrieval
+it returns. The object also keeps how long the search took, the scores it
+produced and how its context was packed.
+"""
+
+import time
+
+from api.context_packer import drop_duplicates, pack_context
+
+NO_CONTEXT = "Không tìm thấy thông tin liên quan trong cơ sở dữ liệu."
+
+
+class Retrieval:
+    """Passages retrieved for one query, with the timing of the search."""
+
+    def __init__(self, query: str, results: list[dict], seconds: float, error: str | None = None):
+        self.query = query
+        self.results = results
+        self.seconds = seconds
+        self.error = error
+        self.packing: dict = {}  # Set by context()
+
+    @property
+    def scores(self) -> list[float]:
+        return [r["score"] for r in self.results]
+
+    def context(self, max_tokens: int) -> str:
+        """Passages packed into `max_tokens` for the prompt (see context_packer.py)."""
+        if self.error is not None:
+            return ""
+        if not self.results:
+            return NO_CONTEXT
+        context, self.packing = pack_context(self.query, self.results, max_tokens)
+        return context
+
+    def sources(self, n_results: int = 3) -> list[dict]:
+        """Source links for an answer: the best `n_results` distinct passages."""
+        return [
+            {
+                "title": r["metadata"].get("title", ""),
+                "url": r["metadata"].get("url", ""),
+                "section": r.get("section"),
+                "score": r["score"]
+            }
+            for r in drop_duplicates(self.results)[:n_results]
+        ]
+
+    def stats(self) -> dict:
+        return {
+            "retrieved": len(self.results),
+            "retrieval_ms": round(self.seconds * 1000, 3),
+            "scores": self.scores,
+            **self.packing,
+        }
+
+
+def retrieve(store, query: str, n_results: int = 8) -> Retrieval:
+    """Search once for a chat request (blocking; call from the thread pool)."""
+    start = time.perf_counter()
+    try:
+        results = store.search(query, n_results=n_results)
+    except Exception as e:
+        print(f"Error retrieving context: {e}")
+        return Retrieval(query, [], time.perf_counter() - start, error=str(e))
+    return Retrieval(query, results, time.perf_counter() - start)
+
+
+def retrieve_many(store, queries: list[str], n_results: int = 8) -> list[Retrieval]:
+    """
+    One vectorized search for many queries (blocking; call from the thread pool).
+
+    Each Retrieval gets an equal share of the batch time as its `seconds`.
+    """
+    start = time.perf_counter()
+    try:
+        results = store.search_many(queries, n_results=n_results)
+    except Exception as e:
+        print(f"Error retrieving context: {e}")
+        seconds = (time.perf_counter() - start) / max(len(queries), 1)
+        return [Retrieval(query, [], seconds, error=str(e)) for query in queries]
+    seconds = (time.perf_counter() - start) / max(len(queries), 1)
+    return [Retrieval(query, query_results, seconds) for query, query_results in zip(queries, results)]
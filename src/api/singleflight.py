@@ -0,0 +1,141 @@
+"""
+Single-flight coalescing of identical in-flight requests.
+
+When an announcement goes out, dozens of citizens ask the same question
+within seconds. Requests with the same key attach to the computation that
+is already running instead of starting their own retrieval and LLM call:
+`do()` shares one awaited result, `subscribe()` fans one stream of items
+out to every subscriber, replaying what a late subscriber missed.
+
+The shared computation is cancelled only when every request attached to it
+has gone away, so one disconnecting client does not break the others.
+"""
+
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Hashable
+
+
+class Channel:
+    """Append-only list of stream items that subscribers can follow."""
+
+    def __init__(self):
+        self.items: list = []
+        self.closed = False
+        self.error: BaseException | None = None
+        self._changed = asyncio.Event()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def publish(self, item) -> None:
+        self.items.append(item)
+        self._notify()
+
+    def close(self, error: BaseException | None = None) -> None:
+        self.closed = True
+        self.error = error
+        self._notify()
+
+    async def follow(self) -> AsyncIterator:
+        """Every item from the first one, then new ones as they are published."""
+        position = 0
+        while True:
+            while position < len(self.items):
+                yield self.items[position]
+                position += 1
+            if self.closed:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self._changed.wait()
+
+
+class Flight:
+    """One running computation and the number of requests waiting on it."""
+
+    def __init__(self, task: asyncio.Task, channel: Channel | None = None):
+        self.task = task
+        self.channel = channel
+        self.waiters = 0
+
+    def attach(self) -> None:
+        self.waiters += 1
+
+    def detach(self) -> None:
+        self.waiters -= 1
+        if self.waiters == 0 and not self.task.done():
+            self.task.cancel()
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key within one event loop."""
+
+    def __init__(self):
+        self._flights: dict[Hashable, Flight] = {}
+        self.started = 0
+        self.joined = 0
+
+    def _start(self, key: Hashable, coroutine: Awaitable, channel: Channel | None = None) -> Flight:
+        flight = Flight(asyncio.ensure_future(coroutine), channel)
+        self._flights[key] = flight
+        flight.task.add_done_callback(lambda _: self._finish(key, flight))
+        self.started += 1
+        return flight
+
+    def _finish(self, key: Hashable, flight: Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.task.cancelled():
+            flight.task.exception()  # Retrieved by the waiters; keeps asyncio from logging it again
+
+    def _find(self, key: Hashable, streaming: bool) -> Flight | None:
+        flight = self._flights.get(key)
+        if flight is None or flight.task.done() or (flight.channel is not None) != streaming:
+            return None
+        self.joined += 1
+        return flight
+
+    async def do(self, key: Hashable, make: Callable[[], Awaitable]):
+        """Result of `make()`, shared with every concurrent call for `key`."""
+        flight = self._find(key, streaming=False) or self._start(key, make())
+        flight.attach()
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.detach()
+
+    async def subscribe(self, key: Hashable, produce: Callable[[Channel], Awaitable]) -> AsyncIterator:
+        """
+        Items published by `produce(channel)`, shared with every concurrent
+        subscriber for `key`. `produce` must not close the channel itself.
+        """
+        flight = self._find(key, streaming=True)
+        if flight is None:
+            channel = Channel()
+
+            async def run():
+                try:
+                    await produce(channel)
+                except asyncio.CancelledError:
+                    channel.close(ConnectionAbortedError("stream cancelled"))
+                    raise
+                except Exception as e:
+                    channel.close(e)
+                    return
+                channel.close()
+
+            flight = self._start(key, run(), channel)
+        flight.attach()
+        try:
+            async for item in flight.channel.follow():
+                yield item
+        finally:
+            flight.detach()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._flights),
+            "started": self.started,
+            "joined": self.joined,
+        }
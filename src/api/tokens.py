@@ -0,0 +1,19 @@
+"""
+Approximate token counting for prompt budgets.
+
+No tokenizer ships with the server and the chat model is behind an
+OpenAI-compatible proxy, so budgets are enforced with an estimate: BPE
+tokenizers average about 4 UTF-8 bytes per token on Vietnamese text.
+"""
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text.encode("utf-8")) // 4 + 1
+
+
+def clip_tokens(text: str, tokens: int) -> str:
+    """`text` cut to about `tokens` tokens."""
+    data = text.encode("utf-8")
+    if len(data) <= tokens * 4:
+        return text
+    return data[:tokens * 4].decode("utf-8", errors="ignore").rstrip() + "…"
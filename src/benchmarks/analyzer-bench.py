@@ -0,0 +1,63 @@
+"""
+Benchmark the vector store analyzers against each other.
+
+Reports tokens/sec, chars/sec (comparable across analyzers, since they
+emit different numbers of tokens), vocabulary size and on-disk index size
+for every analyzer in retrieval.analyzers.ANALYZERS, as JSON on stdout.
+
+Usage:
+    python src/benchmarks/analyzer-bench.py [data_dir] [persist_dir]
+
+The corpus is the scraped data in data_dir; if there is none, the documents
+of the existing index in persist_dir are used instead.
+"""
+
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from common import BASE_DIR, directory_size, load_corpus, vector_store
+from retrieval.analyzers import ANALYZERS
+
+
+def bench_analyzer(name: str, documents: list[dict]) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        store = vector_store.VectorStore(persist_dir=tmp, analyzer=name)
+        store.train_analyzer(documents)
+
+        start = time.perf_counter()
+        n_tokens = sum(len(store.analyzer(doc["content"])) for doc in documents)
+        elapsed = time.perf_counter() - start
+        n_chars = sum(len(doc["content"]) for doc in documents)
+
+        store.add_documents(documents)
+        store.compact()
+        segments_dir = Path(tmp) / "segments"
+        postings_bytes = sum(
+            f.stat().st_size for f in segments_dir.rglob("*.npy")
+            if not f.name.startswith(("docs_", "key_"))
+        )
+        return {
+            "analyzer": name,
+            "documents": len(documents),
+            "tokens": n_tokens,
+            "tokens_per_sec": round(n_tokens / elapsed) if elapsed else None,
+            "chars_per_sec": round(n_chars / elapsed) if elapsed else None,
+            "vocabulary_size": len(store.index.vocab),
+            "nnz": int(sum(len(seg.indices) for seg in store.index.segments)),
+            "postings_bytes": postings_bytes,
+            "index_bytes": directory_size(Path(tmp)),
+        }
+
+
+if __name__ == "__main__":
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else str(BASE_DIR / "data")
+    persist_dir = sys.argv[2] if len(sys.argv) > 2 else str(BASE_DIR / "data" / "vector_store")
+    corpus = load_corpus(data_dir, persist_dir)
+    if not corpus:
+        print("No documents found. Run scrapers or build the index first.")
+        sys.exit(1)
+    results = [bench_analyzer(name, corpus) for name in ANALYZERS]
+    print(json.dumps(results, ensure_ascii=False, indent=2))
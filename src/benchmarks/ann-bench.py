@@ -0,0 +1,81 @@
+"""
+Benchmark the IVF embedding index against an exact scan.
+
+Builds one segment-sized IVF index over synthetic clustered unit vectors
+for every storage dtype and reports build time, per-query latency (mean,
+p50, p95) of the IVF search and of a brute-force float32 scan, and
+recall@k of the IVF results against the exact ones, as JSON on stdout.
+
+Usage:
+    python src/benchmarks/ann-bench.py [n_vectors] [dim] [nprobe]
+"""
+
+import json
+import sys
+import time
+
+import numpy as np
+
+from common import BASE_DIR  # noqa: F401  (puts src/ on sys.path)
+from retrieval.ann import DTYPES, IVFIndex, normalize
+
+N_QUERIES = 200
+K = 10
+
+
+def clustered_vectors(n: int, dim: int, n_topics: int = 200, seed: int = 0) -> np.ndarray:
+    """Unit vectors around random topic directions, like passages of many procedures."""
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((n_topics, dim))
+    return normalize(topics[rng.integers(n_topics, size=n)] + 0.6 * rng.standard_normal((n, dim)))
+
+
+def percentiles(latencies: list[float]) -> dict:
+    ms = np.asarray(latencies) * 1000
+    return {
+        "mean": round(float(ms.mean()), 3),
+        "p50": round(float(np.percentile(ms, 50)), 3),
+        "p95": round(float(np.percentile(ms, 95)), 3),
+    }
+
+
+def bench_dtype(dtype: str, vectors: np.ndarray, queries: np.ndarray, nprobe: int) -> dict:
+    start = time.perf_counter()
+    index = IVFIndex.build(vectors, dtype)
+    build_seconds = time.perf_counter() - start
+    deleted = np.zeros(len(vectors), dtype=bool)
+
+    ivf_latencies, exact_latencies, recalls = [], [], []
+    for query in queries:
+        start = time.perf_counter()
+        rows, _ = index.search(query, deleted, K, nprobe)
+        ivf_latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        exact = np.argpartition(-(vectors @ query), K - 1)[:K]
+        exact_latencies.append(time.perf_counter() - start)
+        recalls.append(len(set(rows.tolist()) & set(exact.tolist())) / K)
+
+    return {
+        "dtype": dtype,
+        "lists": len(index.centroids),
+        "build_seconds": round(build_seconds, 2),
+        "vector_bytes": int(index.codes.nbytes + index.scales.nbytes),
+        "ivf_latency_ms": percentiles(ivf_latencies),
+        "exact_latency_ms": percentiles(exact_latencies),
+        f"recall_at_{K}": round(float(np.mean(recalls)), 3),
+    }
+
+
+if __name__ == "__main__":
+    n_vectors = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    dim = int(sys.argv[2]) if len(sys.argv) > 2 else 384
+    nprobe = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+    vectors = clustered_vectors(n_vectors + N_QUERIES, dim)
+    vectors, queries = vectors[:n_vectors], vectors[n_vectors:]
+    print(json.dumps({
+        "vectors": n_vectors,
+        "dim": dim,
+        "nprobe": nprobe,
+        "results": [bench_dtype(dtype, vectors, queries, nprobe) for dtype in DTYPES],
+    }, indent=2))
@@ -0,0 +1,39 @@
+"""
+Shared helpers for the benchmark scripts.
+"""
+
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(BASE_DIR / "src"))
+
+from vector_store_module import load_vector_store_module
+
+vector_store = load_vector_store_module()
+
+
+def load_corpus(data_dir: str, persist_dir: str) -> list[dict]:
+    """Scraped documents from data_dir, or the documents of an existing index."""
+    documents = vector_store.load_scraped_data(data_dir)
+    if documents:
+        return documents
+    # Reassemble documents from their passages
+    store = vector_store.VectorStore(persist_dir=persist_dir)
+    parents: dict[str, list[dict]] = {}
+    for seg in store.index.segments:
+        for row in range(len(seg)):
+            if not seg.deleted[row]:
+                doc = seg.documents[row]
+                parents.setdefault(doc["key"], []).append(doc)
+    return [
+        {
+            "content": "".join(p["content"] for p in sorted(passages, key=lambda p: p.get("start", 0))),
+            **passages[0]["metadata"]
+        }
+        for passages in parents.values()
+    ]
+
+
+def directory_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
@@ -0,0 +1,162 @@
+"""
+Open-loop load test of the chat API.
+
+Questions are replayed against /chat (or /chat/stream with --stream) at a
+target rate for a fixed duration. They come from a file in the format of
+batch.py: one per line, or one {"question": ...} object per line (.jsonl).
+Without a file, synthetic citizen questions are used
+(synthetic_corpus.make_queries). Requests start on a fixed timetable, or
+with Poisson arrivals with --poisson, whether or not earlier ones have
+finished. A server that falls behind therefore shows up as latency and
+errors rather than as a lower send rate. Latency is measured from each
+request's scheduled start.
+
+Reports as JSON: requests sent, succeeded and failed, achieved throughput,
+error rate and counts by status, and latency p50/p95/p99/max in ms. With
+--stream it also reports time to the first token.
+
+Run it against a server backed by mock-llm.py to measure capacity with no
+network or tokens. If the server has a per-client rate limit
+(RATE_LIMIT_PER_MINUTE), start it with TRUST_FORWARDED_FOR=true and pass
+--clients, so the limit does not turn the test into 429s. Repeated questions are served from the
+answer cache and coalesced; --unique makes every question distinct.
+
+Usage:
+    python src/benchmarks/load-test.py [questions.txt] [--url http://127.0.0.1:8000] [--rps 10] [--duration 30]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+from synthetic_corpus import make_queries
+
+BASE_DIR = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(BASE_DIR / "src"))
+
+from api.batch import read_questions
+
+
+def percentiles_ms(seconds: list[float]) -> dict:
+    if not seconds:
+        return {}
+    ms = np.asarray(seconds) * 1000
+    return {
+        "p50": round(float(np.percentile(ms, 50)), 1),
+        "p95": round(float(np.percentile(ms, 95)), 1),
+        "p99": round(float(np.percentile(ms, 99)), 1),
+        "max": round(float(ms.max()), 1),
+    }
+
+
+async def send(client: httpx.AsyncClient, args: argparse.Namespace, question: str, headers: dict,
+               scheduled: float) -> dict:
+    """One request; returns its outcome ("ok", an HTTP status, or an error name) and timings."""
+    result = {"outcome": "ok", "first_token": None}
+    try:
+        if not args.stream:
+            response = await client.post("/chat", json={"message": question}, headers=headers)
+            if response.status_code != 200:
+                result["outcome"] = str(response.status_code)
+        else:
+            async with client.stream("POST", "/chat/stream", json={"message": question}, headers=headers) as response:
+                if response.status_code != 200:
+                    result["outcome"] = str(response.status_code)
+                else:
+                    async for line in response.aiter_lines():
+                        if line == "event: token" and result["first_token"] is None:
+                            result["first_token"] = time.perf_counter() - scheduled
+                        elif line == "event: error":
+                            result["outcome"] = "stream_error"
+    except httpx.TimeoutException:
+        result["outcome"] = "timeout"
+    except httpx.HTTPError as e:
+        result["outcome"] = type(e).__name__
+    result["latency"] = time.perf_counter() - scheduled
+    return result
+
+
+async def run(args: argparse.Namespace, questions: list[str]) -> dict:
+    rng = random.Random(args.seed)
+    n_requests = max(1, int(args.rps * args.duration))
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        tasks = []
+        start = time.perf_counter()
+        scheduled = start
+        for i in range(n_requests):
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            question = questions[i % len(questions)]
+            if args.unique:
+                question = f"{question} ({i})"
+            headers = {"X-Forwarded-For": f"10.0.{i % args.clients // 256}.{i % args.clients % 256}"} \
+                if args.clients > 1 else {}
+            tasks.append(asyncio.create_task(send(client, args, question, headers, scheduled)))
+            scheduled += rng.expovariate(args.rps) if args.poisson else 1 / args.rps
+        send_seconds = time.perf_counter() - start
+        results = await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    outcomes = Counter(r["outcome"] for r in results)
+    succeeded = [r for r in results if r["outcome"] == "ok"]
+    report = {
+        "url": args.url,
+        "endpoint": "/chat/stream" if args.stream else "/chat",
+        "target_rps": args.rps,
+        "sent_rps": round(n_requests / send_seconds, 2) if send_seconds else None,
+        "requests": n_requests,
+        "succeeded": len(succeeded),
+        "failed": n_requests - len(succeeded),
+        "error_rate": round(1 - len(succeeded) / n_requests, 4),
+        "errors": {outcome: count for outcome, count in sorted(outcomes.items()) if outcome != "ok"},
+        "throughput_rps": round(len(succeeded) / elapsed, 2),
+        "elapsed_seconds": round(elapsed, 3),
+        "latency_ms": percentiles_ms([r["latency"] for r in succeeded]),
+    }
+    if args.stream:
+        report["first_token_ms"] = percentiles_ms([r["first_token"] for r in succeeded if r["first_token"] is not None])
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("questions", nargs="?", help="Question file (default: synthetic questions)")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Base URL of the API server")
+    parser.add_argument("--rps", type=float, default=10.0, help="Target requests per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to send requests for")
+    parser.add_argument("--stream", action="store_true", help="Use /chat/stream and measure time to first token")
+    parser.add_argument("--poisson", action="store_true", help="Poisson arrivals instead of a fixed interval")
+    parser.add_argument("--unique", action="store_true", help="Make every question distinct (no cache hits)")
+    parser.add_argument("--clients", type=int, default=1, help="Spread requests over this many X-Forwarded-For addresses")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds before a request counts as timed out")
+    parser.add_argument("--max-connections", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the report to this JSON file (default: stdout)")
+    args = parser.parse_args()
+
+    if args.questions:
+        try:
+            questions = [item["question"] for item in read_questions(args.questions)]
+        except ValueError as e:
+            raise SystemExit(str(e))
+    else:
+        questions = make_queries(1000, args.seed)
+    if not questions:
+        raise SystemExit("No questions to send.")
+
+    report = json.dumps(asyncio.run(run(args, questions)), ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(report + "\n", encoding="utf-8")
+    else:
+        print(report)
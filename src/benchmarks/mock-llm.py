@@ -0,0 +1,138 @@
+"""
+OpenAI-compatible mock of the chat API, for load tests that spend no tokens.
+
+Serves POST /v1/chat/completions, plain and with stream=True, and
+GET /v1/models, which is enough for LLMClient. Every request waits for a
+time drawn from the chosen distribution before its first token:
+
+    fixed       always --latency seconds
+    uniform     between 0 and twice --latency
+    lognormal   median --latency with spread --sigma: a long right tail,
+                like a real LLM API under load
+
+A stream then sends --answer-tokens tokens at --tokens-per-sec. Faults
+are injected at random: --error-rate of the requests fail with
+--error-status, and --hang-rate of them never answer until the client
+gives up. GET /stats reports what the mock served, including streams the
+client cancelled.
+
+Usage:
+    python src/benchmarks/mock-llm.py [--port 9000] [--latency 0.8] [--distribution lognormal]
+
+Then point the API server at it:
+    AI4U_API_KEY=mock AI4U_BASE_URL=http://127.0.0.1:9000/v1 ./run.sh serve
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+
+
+def create_app(args: argparse.Namespace) -> FastAPI:
+    app = FastAPI(title="Mock LLM")
+    rng = random.Random(args.seed)
+    stats = {"requests": 0, "streams": 0, "errors": 0, "hangs": 0, "completed": 0, "cancelled": 0}
+
+    def first_token_delay() -> float:
+        if args.distribution == "uniform":
+            return rng.uniform(0, 2 * args.latency)
+        if args.distribution == "lognormal":
+            return rng.lognormvariate(math.log(args.latency), args.sigma)
+        return args.latency
+
+    def answer_words(messages: list[dict]) -> list[str]:
+        # Echo the end of the question so answers differ per question
+        words = (messages[-1].get("content") or "").split()[-8:] if messages else []
+        filler = "Nội dung trả lời mẫu cho câu hỏi về thủ tục hành chính.".split()
+        while len(words) < args.answer_tokens:
+            words.extend(filler)
+        return words[:args.answer_tokens]
+
+    def chunk(model: str, content: str | None, finish: str | None = None) -> str:
+        return "data: " + json.dumps({
+            "id": "mock", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "delta": {"content": content} if content else {}, "finish_reason": finish}],
+        }, ensure_ascii=False) + "\n\n"
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "mock"}]}
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "mock")
+        stats["requests"] += 1
+
+        roll = rng.random()
+        if roll < args.hang_rate:
+            stats["hangs"] += 1
+            await asyncio.sleep(3600)
+        await asyncio.sleep(first_token_delay())
+        if roll < args.hang_rate + args.error_rate:
+            stats["errors"] += 1
+            return JSONResponse(
+                {"error": {"message": "Injected error", "type": "mock_error"}}, status_code=args.error_status
+            )
+
+        words = answer_words(body.get("messages", []))
+        if not body.get("stream"):
+            stats["completed"] += 1
+            return {
+                "id": "mock", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{
+                    "index": 0, "message": {"role": "assistant", "content": " ".join(words)}, "finish_reason": "stop"
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(words), "total_tokens": len(words)},
+            }
+
+        stats["streams"] += 1
+
+        async def events():
+            try:
+                for i, word in enumerate(words):
+                    if i and args.tokens_per_sec > 0:
+                        await asyncio.sleep(1 / args.tokens_per_sec)
+                    yield chunk(model, word if i == 0 else " " + word)
+                yield chunk(model, None, "stop")
+                yield "data: [DONE]\n\n"
+                stats["completed"] += 1
+            except asyncio.CancelledError:
+                stats["cancelled"] += 1  # The client closed the stream
+                raise
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="lognormal",
+                        help="Distribution of the time to first token")
+    parser.add_argument("--latency", type=float, default=0.8, help="Seconds to first token (median for lognormal)")
+    parser.add_argument("--sigma", type=float, default=0.5, help="Spread of the lognormal distribution")
+    parser.add_argument("--tokens-per-sec", type=float, default=50.0, help="Streaming speed after the first token")
+    parser.add_argument("--answer-tokens", type=int, default=200, help="Words per answer")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=503, help="HTTP status of injected errors")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="Fraction of requests that never answer")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(args), host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,87 @@
+"""
+Benchmark the TF-IDF and BM25F rankers against each other.
+
+Every query has one relevant page. Reports, per ranker, recall@k (the share
+of queries whose page is among the top k passages), MRR, and per-query
+latency (mean, p50, p95) for VectorStore.search, as JSON on stdout.
+
+Usage:
+    python src/benchmarks/ranker-bench.py [persist_dir] [queries.jsonl] [k]
+
+queries.jsonl holds one {"query": ..., "url": ...} object per line. Without
+it, queries are sampled from the index: a run of words from a passage,
+labelled with the URL of its page.
+"""
+
+import json
+import random
+import sys
+import time
+
+import numpy as np
+
+from common import BASE_DIR, vector_store
+
+QUERY_WORDS = 8
+N_SAMPLED = 500
+
+
+def sample_queries(store, n_queries: int, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    passages = [
+        seg.documents[row]
+        for seg in store.index.segments
+        for row in np.flatnonzero(~seg.deleted)
+    ]
+    queries = []
+    for doc in rng.sample(passages, min(n_queries, len(passages))):
+        words = doc["content"].split()
+        if len(words) < QUERY_WORDS or not doc["metadata"].get("url"):
+            continue
+        start = rng.randrange(len(words) - QUERY_WORDS + 1)
+        queries.append({"query": " ".join(words[start:start + QUERY_WORDS]), "url": doc["metadata"]["url"]})
+    return queries
+
+
+def load_queries(path: str) -> list[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def bench_ranker(store, ranker: str, queries: list[dict], k: int) -> dict:
+    store.ranker = ranker
+    latencies, hits, reciprocal_ranks = [], 0, []
+    for query in queries:
+        start = time.perf_counter()
+        results = store.search(query["query"], n_results=k)
+        latencies.append(time.perf_counter() - start)
+        urls = [r["metadata"].get("url") for r in results]
+        rank = urls.index(query["url"]) + 1 if query["url"] in urls else None
+        hits += rank is not None
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+    latencies_ms = np.asarray(latencies) * 1000
+    return {
+        "ranker": ranker,
+        f"recall_at_{k}": round(hits / len(queries), 3),
+        "mrr": round(float(np.mean(reciprocal_ranks)), 3),
+        "latency_ms_mean": round(float(latencies_ms.mean()), 3),
+        "latency_ms_p50": round(float(np.percentile(latencies_ms, 50)), 3),
+        "latency_ms_p95": round(float(np.percentile(latencies_ms, 95)), 3),
+    }
+
+
+if __name__ == "__main__":
+    persist_dir = sys.argv[1] if len(sys.argv) > 1 else str(BASE_DIR / "data" / "vector_store")
+    k = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    store = vector_store.VectorStore(persist_dir=persist_dir)
+    store.query_cache.max_entries = 0  # Measure scoring, not cache hits
+    queries = load_queries(sys.argv[2]) if len(sys.argv) > 2 else sample_queries(store, N_SAMPLED)
+    if not queries:
+        print("No queries. Build the index first or pass a queries file.")
+        sys.exit(1)
+    results = [bench_ranker(store, ranker, queries, k) for ranker in vector_store.RANKERS]
+    print(json.dumps({
+        "passages": store.count(),
+        "queries": len(queries),
+        "rankers": results,
+    }, ensure_ascii=False, indent=2))
@@ -0,0 +1,184 @@
+"""
+Reproducible benchmark suite for the retrieval engine.
+
+For every corpus size, a synthetic procedure corpus (see
+synthetic_corpus.py) is generated and measured in a fresh subprocess, so
+peak RSS belongs to that size alone:
+
+    build_seconds       build_index() from the scraped-data JSON
+    add_seconds         add_documents() of a 1% batch of new procedures
+    load_seconds        opening the built index (VectorStore._load)
+    search_ms           p50/p99 of search() per ranker, query cache off
+    index_bytes         size of the index on disk
+    peak_rss_mb         peak resident memory of the run
+
+Results are written as JSON with the commit they were measured on;
+`--compare` prints the ratio of every metric against an earlier run.
+
+Usage:
+    python src/benchmarks/retrieval-bench.py [--sizes 100,1000,10000] [--output FILE]
+    python src/benchmarks/retrieval-bench.py --compare OLD.json NEW.json
+
+Sizes up to 1,000,000 documents are supported but need hours and tens of
+GB of RAM; the default stops at 10,000.
+"""
+
+import argparse
+import contextlib
+import json
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from common import BASE_DIR, directory_size
+from synthetic_corpus import generate, make_queries, write_corpus
+
+DEFAULT_SIZES = "100,1000,10000"
+N_QUERIES = 500
+SEED = 0
+
+
+def percentile_ms(latencies: list[float], q: float) -> float:
+    return round(float(np.percentile(np.asarray(latencies) * 1000, q)), 3)
+
+
+def run_size(n_docs: int) -> dict:
+    """Measure one corpus size (runs inside the worker subprocess)."""
+    from common import vector_store
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir, persist_dir = Path(tmp) / "data", Path(tmp) / "index"
+        write_corpus(data_dir, n_docs, SEED)
+
+        # Library progress output goes to stderr; stdout carries the JSON
+        with contextlib.redirect_stdout(sys.stderr):
+            start = time.perf_counter()
+            store = vector_store.build_index(str(data_dir), str(persist_dir))
+            build_seconds = time.perf_counter() - start
+
+            batch = [
+                {
+                    "content": f"Thủ tục: {p['title']}\n{p['detail']['full_content']}",
+                    "title": p["title"], "url": p["url"], "source": "dichvucong"
+                }
+                for p in generate(max(n_docs // 100, 10), SEED, start=n_docs)
+            ]
+            start = time.perf_counter()
+            store.add_documents(batch)
+            add_seconds = time.perf_counter() - start
+            store.index.compact(wait=True)  # Settle any background merge before measuring load
+            del store
+
+            start = time.perf_counter()
+            store = vector_store.VectorStore(persist_dir=str(persist_dir))
+            load_seconds = time.perf_counter() - start
+
+            store.query_cache.max_entries = 0
+            queries = make_queries(N_QUERIES, SEED)
+            search_ms = {}
+            for ranker in vector_store.RANKERS:
+                store.ranker = ranker
+                store.search(queries[0])  # Fault in the postings once
+                latencies = []
+                for query in queries:
+                    start = time.perf_counter()
+                    store.search(query)
+                    latencies.append(time.perf_counter() - start)
+                search_ms[ranker] = {"p50": percentile_ms(latencies, 50), "p99": percentile_ms(latencies, 99)}
+
+        return {
+            "documents": n_docs,
+            "passages": store.count(),
+            "build_seconds": round(build_seconds, 3),
+            "add_seconds": round(add_seconds, 3),
+            "load_seconds": round(load_seconds, 4),
+            "search_ms": search_ms,
+            "index_bytes": directory_size(persist_dir),
+            # ru_maxrss is in kilobytes on Linux
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_suite(sizes: list[int]) -> dict:
+    from config import settings
+
+    results = []
+    for n_docs in sizes:
+        print(f"Benchmarking {n_docs} documents...", file=sys.stderr)
+        worker = subprocess.run(
+            [sys.executable, __file__, "--worker", str(n_docs)], capture_output=True, text=True
+        )
+        if worker.returncode != 0:
+            sys.stderr.write(worker.stderr)
+            raise SystemExit(f"Benchmark for {n_docs} documents failed")
+        results.append(json.loads(worker.stdout))
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "analyzer": settings.analyzer,
+        "seed": SEED,
+        "results": results,
+    }
+
+
+def flatten(result: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in result.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and key != "documents":
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(old: dict, new: dict) -> dict:
+    """new / old for every metric of the sizes both runs measured (< 1 is faster or smaller)."""
+    old_by_size = {r["documents"]: flatten(r) for r in old["results"]}
+    ratios = {}
+    for result in new["results"]:
+        before = old_by_size.get(result["documents"])
+        if before is None:
+            continue
+        ratios[result["documents"]] = {
+            key: round(value / before[key], 3)
+            for key, value in flatten(result).items() if before.get(key)
+        }
+    return {"old": old["commit"], "new": new["commit"], "ratios": ratios}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma-separated corpus sizes")
+    parser.add_argument("--output", help="Write results to this JSON file (default: stdout)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two result files")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        print(json.dumps(run_size(args.worker)))
+    elif args.compare:
+        with open(args.compare[0], encoding="utf-8") as f_old, open(args.compare[1], encoding="utf-8") as f_new:
+            print(json.dumps(compare(json.load(f_old), json.load(f_new)), indent=2))
+    else:
+        report = json.dumps(run_suite([int(size) for size in args.sizes.split(",")]), indent=2)
+        if args.output:
+            Path(args.output).write_text(report + "\n", encoding="utf-8")
+        else:
+            print(report)
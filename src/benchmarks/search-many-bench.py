@@ -0,0 +1,65 @@
+"""
+Benchmark batched search against a loop of single searches.
+
+Queries are built from document titles (page_name/title metadata, falling
+back to the first words of the content) and repeated up to the requested
+count. Reports queries/sec for VectorStore.search in a loop and for
+VectorStore.search_many, plus whether both return the same scores, as JSON.
+
+Usage:
+    python src/benchmarks/search-many-bench.py [persist_dir] [n_queries]
+"""
+
+import json
+import sys
+import time
+
+from common import BASE_DIR, vector_store
+
+
+def make_queries(store, n_queries: int) -> list[str]:
+    titles = []
+    for seg in store.index.segments:
+        for row in range(len(seg)):
+            if seg.deleted[row]:
+                continue
+            doc = seg.documents[row]
+            title = doc["metadata"].get("page_name") or doc["metadata"].get("title")
+            titles.append(title or " ".join(doc["content"].split()[:6]))
+    return [titles[i % len(titles)] for i in range(n_queries)] if titles else []
+
+
+def throughput(n_queries: int, elapsed: float) -> float:
+    return round(n_queries / elapsed, 1) if elapsed else None
+
+
+if __name__ == "__main__":
+    persist_dir = sys.argv[1] if len(sys.argv) > 1 else str(BASE_DIR / "data" / "vector_store")
+    n_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    store = vector_store.VectorStore(persist_dir=persist_dir)
+    store.query_cache.max_entries = 0  # Measure scoring, not cache hits
+    queries = make_queries(store, n_queries)
+    if not queries:
+        print("Vector store is empty. Build the index first.")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    looped = [store.search(query) for query in queries]
+    loop_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = store.search_many(queries)
+    batch_elapsed = time.perf_counter() - start
+
+    same = all(
+        [r["score"] for r in a] == [r["score"] for r in b]
+        for a, b in zip(looped, batched)
+    )
+    print(json.dumps({
+        "documents": store.count(),
+        "queries": len(queries),
+        "loop_queries_per_sec": throughput(len(queries), loop_elapsed),
+        "batch_queries_per_sec": throughput(len(queries), batch_elapsed),
+        "speedup": round(loop_elapsed / batch_elapsed, 2) if batch_elapsed else None,
+        "same_scores": same,
+    }, ensure_ascii=False, indent=2))
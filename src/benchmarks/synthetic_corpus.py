@@ -0,0 +1,153 @@
+"""
+Synthetic Vietnamese procedure corpus for the retrieval benchmarks.
+
+Procedures are assembled from templates shaped like the dichvucong pages:
+a title made of an action, a subject and an optional qualifier, followed by
+the usual sections (Trình tự thực hiện, Cách thức thực hiện, Thành phần hồ
+sơ, Thời hạn giải quyết, Phí, lệ phí, ...) with a very uneven number of
+lines. Generated place and person names keep the vocabulary growing with
+the corpus size, as it does on real data. Output is deterministic for a
+given seed and is written in the format of dichvucong-scraper.py, so it goes
+through load_scraped_data/build_index unchanged.
+"""
+
+import json
+import random
+from pathlib import Path
+from typing import Iterator
+
+ACTIONS = [
+    "Đăng ký", "Cấp", "Cấp lại", "Cấp đổi", "Xác nhận", "Chứng thực", "Gia hạn",
+    "Điều chỉnh", "Thay đổi", "Đăng ký lại", "Giải quyết", "Thẩm định", "Công nhận",
+]
+SUBJECTS = [
+    "khai sinh", "khai tử", "kết hôn", "nhận cha, mẹ, con", "giám hộ", "thường trú",
+    "tạm trú", "giấy phép xây dựng", "hộ kinh doanh", "tình trạng hôn nhân",
+    "quyền sử dụng đất", "bản sao từ bản chính", "chữ ký", "hợp đồng, giao dịch",
+    "trợ cấp xã hội", "người có công", "hộ nghèo", "bảo hiểm y tế", "nuôi con nuôi",
+    "thay đổi, cải chính hộ tịch", "trích lục hộ tịch", "di chúc", "văn bản thừa kế",
+]
+QUALIFIERS = [
+    "", "", "", "có yếu tố nước ngoài", "lưu động", "kết hợp", "cho người nước ngoài",
+    "trực tuyến", "tại Ủy ban nhân dân cấp xã", "cho hộ gia đình, cá nhân",
+]
+FIELDS = [
+    "Hộ tịch", "Chứng thực", "Xây dựng", "Đất đai", "Bảo trợ xã hội", "Người có công",
+    "Kinh doanh", "Cư trú", "Nuôi con nuôi", "Thi đua, khen thưởng",
+]
+AGENCIES = [
+    "Ủy ban nhân dân cấp xã", "Công an xã", "Phòng Tư pháp", "Văn phòng đăng ký đất đai",
+    "Phòng Lao động - Thương binh và Xã hội", "Bộ phận một cửa",
+]
+PAPERS = [
+    "Tờ khai theo mẫu", "Bản sao giấy khai sinh", "Căn cước công dân", "Giấy chứng nhận kết hôn",
+    "Sổ hộ khẩu", "Giấy xác nhận tình trạng hôn nhân", "Giấy chứng sinh", "Đơn đề nghị",
+    "Văn bản ủy quyền", "Bản chính giấy tờ", "Giấy chứng nhận quyền sử dụng đất",
+    "Hợp đồng thuê nhà", "Bản vẽ thiết kế", "Giấy tờ chứng minh nơi cư trú",
+]
+STEPS = [
+    "Người yêu cầu nộp hồ sơ tại {agency}",
+    "Cán bộ tiếp nhận kiểm tra tính hợp lệ của hồ sơ",
+    "Trường hợp hồ sơ chưa đầy đủ thì hướng dẫn người nộp bổ sung, hoàn thiện",
+    "{agency} thẩm định và trình lãnh đạo ký",
+    "Trả kết quả cho người yêu cầu tại {place}",
+    "Người dân nhận kết quả trực tiếp hoặc qua dịch vụ bưu chính",
+    "Công chức tư pháp - hộ tịch ghi vào sổ và cập nhật cơ sở dữ liệu",
+]
+CHANNELS = [
+    "Nộp trực tiếp tại Bộ phận tiếp nhận và trả kết quả",
+    "Nộp trực tuyến qua Cổng dịch vụ công quốc gia",
+    "Nộp qua dịch vụ bưu chính công ích",
+]
+LAWS = [
+    "Luật Hộ tịch năm 2014", "Nghị định số 123/2015/NĐ-CP", "Thông tư số 04/2020/TT-BTP",
+    "Luật Cư trú năm 2020", "Nghị định số 23/2015/NĐ-CP", "Luật Xây dựng năm 2014",
+    "Luật Đất đai năm 2013", "Nghị định số 20/2021/NĐ-CP",
+]
+# Syllables for generated place and person names
+SYLLABLES = [
+    "an", "bình", "cẩm", "diên", "đông", "giang", "hà", "hải", "hòa", "hưng", "khánh",
+    "lâm", "long", "mỹ", "nam", "ninh", "phú", "phước", "quang", "sanh", "sơn", "tân",
+    "thạnh", "thành", "thuận", "trung", "vĩnh", "xuân", "yên", "lộc", "hiệp", "mai",
+    "thủy", "tây", "bắc", "phong", "điền", "lương", "kim", "hương",
+]
+
+QUERY_TEMPLATES = [
+    "{subject} cần giấy tờ gì",
+    "thủ tục {action} {subject}",
+    "lệ phí {action} {subject} bao nhiêu",
+    "thời hạn giải quyết {subject}",
+    "{action} {subject} ở đâu",
+    "hồ sơ {action} {subject} {qualifier}",
+]
+
+
+def _name(rng: random.Random) -> str:
+    return " ".join(rng.choice(SYLLABLES).capitalize() for _ in range(2))
+
+
+def _section(heading: str, lines: list[str]) -> str:
+    return heading + ":\n" + "\n".join(lines)
+
+
+def make_procedure(i: int, rng: random.Random) -> dict:
+    """One procedure in the dichvucong scraper format."""
+    action, subject, qualifier = rng.choice(ACTIONS), rng.choice(SUBJECTS), rng.choice(QUALIFIERS)
+    title = " ".join(part for part in (action, subject, qualifier) if part)
+    agency, place = rng.choice(AGENCIES), f"thôn {_name(rng)}"
+    # Long-tailed page lengths: most pages are short, a few are very long
+    scale = min(int(rng.paretovariate(1.2)), 12)
+
+    steps = [
+        f"Bước {n}: " + rng.choice(STEPS).format(agency=agency, place=place)
+        for n in range(1, 3 + rng.randint(0, 3) * scale)
+    ]
+    papers = [f"- {rng.choice(PAPERS)} của ông/bà {_name(rng)}" for _ in range(2 + rng.randint(0, 4) * scale)]
+    fee = rng.choice(["Miễn phí", f"{rng.randint(1, 20) * 5}.000 đồng/trường hợp", "Không quy định"])
+    sections = [
+        _section("Trình tự thực hiện", steps),
+        _section("Cách thức thực hiện", rng.sample(CHANNELS, rng.randint(1, len(CHANNELS)))),
+        _section("Thành phần hồ sơ", papers),
+        _section("Thời hạn giải quyết", [f"{rng.randint(1, 20)} ngày làm việc kể từ ngày nhận đủ hồ sơ hợp lệ"]),
+        _section("Phí, lệ phí", [fee]),
+        _section("Yêu cầu, điều kiện", [f"Người yêu cầu cư trú tại {place}, xã {_name(rng)}"] * (1 + scale // 4)),
+        _section("Căn cứ pháp lý", rng.sample(LAWS, rng.randint(1, 4))),
+    ]
+    return {
+        "title": title,
+        "url": f"https://dichvucong.example/thu-tuc/{i}",
+        "implementing": agency,
+        "field": rng.choice(FIELDS),
+        "code": f"1.{i:06d}",
+        "detail": {"full_content": "\n".join(sections)},
+    }
+
+
+def generate(n: int, seed: int = 0, start: int = 0) -> Iterator[dict]:
+    """`n` procedures numbered from `start`; the same seed gives the same corpus."""
+    rng = random.Random(f"{seed}:{start}")
+    for i in range(start, start + n):
+        yield make_procedure(i, rng)
+
+
+def write_corpus(data_dir: Path, n: int, seed: int = 0) -> Path:
+    """Write `n` procedures as data_dir/dichvucong_procedures.json, streaming."""
+    data_dir.mkdir(parents=True, exist_ok=True)
+    path = data_dir / "dichvucong_procedures.json"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"procedures": [')
+        for i, procedure in enumerate(generate(n, seed)):
+            f.write(("," if i else "") + json.dumps(procedure, ensure_ascii=False))
+        f.write("]}")
+    return path
+
+
+def make_queries(n: int, seed: int = 0) -> list[str]:
+    """Citizen-style questions over the same templates."""
+    rng = random.Random(f"queries:{seed}")
+    return [
+        rng.choice(QUERY_TEMPLATES).format(
+            action=rng.choice(ACTIONS).lower(), subject=rng.choice(SUBJECTS), qualifier=rng.choice(QUALIFIERS)
+        ).strip()
+        for _ in range(n)
+    ]
@@ -19,6 +19,57 @@ class Settings(BaseSettings):
     chat_model: str = Field(default="gemini-2.5-flash", env="CHAT_MODEL")
     embedding_model: str = Field(default="all-MiniLM-L6-v2", env="EMBEDDING_MODEL")
 
+    # LLM connection pool (one shared client per worker)
+    llm_max_connections: int = Field(default=100, env="LLM_MAX_CONNECTIONS")
+    llm_max_keepalive: int = Field(default=20, env="LLM_MAX_KEEPALIVE")
+    llm_keepalive_expiry: float = Field(default=30.0, env="LLM_KEEPALIVE_EXPIRY")  # Seconds
+    llm_timeout: float = Field(default=60.0, env="LLM_TIMEOUT")  # Seconds, per read/write
+    llm_connect_timeout: float = Field(default=5.0, env="LLM_CONNECT_TIMEOUT")
+    llm_max_retries: int = Field(default=2, env="LLM_MAX_RETRIES")  # Retries of retryable errors, within the deadline
+    llm_retry_backoff: float = Field(default=0.5, env="LLM_RETRY_BACKOFF")  # Seconds; doubled per retry, jittered
+    llm_deadline: float = Field(default=30.0, env="LLM_DEADLINE")  # Seconds per answer (to the first token for streams)
+    llm_hedge: bool = Field(default=False, env="LLM_HEDGE")  # Second request for completions slower than usual
+    llm_hedge_quantile: float = Field(default=0.95, env="LLM_HEDGE_QUANTILE")  # Of recent completion times
+    llm_hedge_min_delay: float = Field(default=1.0, env="LLM_HEDGE_MIN_DELAY")  # Seconds
+    llm_fallback_model: str = Field(default="", env="LLM_FALLBACK_MODEL")  # Cheaper/faster model near the deadline
+    llm_fallback_reserve: float = Field(default=10.0, env="LLM_FALLBACK_RESERVE")  # Seconds of the deadline kept for it
+    llm_warm_connections: int = Field(default=2, env="LLM_WARM_CONNECTIONS")  # Opened at startup
+
+    # LLM admission control
+    llm_max_concurrency: int = Field(default=32, env="LLM_MAX_CONCURRENCY")  # LLM calls in flight per worker
+    llm_max_queue: int = Field(default=64, env="LLM_MAX_QUEUE")  # Calls waiting for a slot before 503s
+    llm_queue_timeout: float = Field(default=10.0, env="LLM_QUEUE_TIMEOUT")  # Seconds a call may wait
+
+    # Batch answering and retrieval-only search
+    batch_concurrency: int = Field(default=8, env="BATCH_CONCURRENCY")  # Parallel LLM calls per batch
+    batch_max_questions: int = Field(default=500, env="BATCH_MAX_QUESTIONS")  # Per /chat/batch request
+    search_page_size: int = Field(default=10, env="SEARCH_PAGE_SIZE")  # Default /search page size
+
+    # Retrieval settings
+    analyzer: str = Field(default="regex", env="ANALYZER")  # "regex" or "vi-trie"
+    passage_max_chars: int = Field(default=1200, env="PASSAGE_MAX_CHARS")
+    ranker: str = Field(default="tfidf", env="RANKER")  # "tfidf" or "bm25"
+    embedder: str = Field(default="", env="EMBEDDER")  # "", "hash" or "api"
+    dense_weight: float = Field(default=0.5, env="DENSE_WEIGHT")  # Share of the embedding score in hybrid search
+    vector_dtype: str = Field(default="int8", env="VECTOR_DTYPE")  # "int8" or "float16"
+    ann_nprobe: int = Field(default=8, env="ANN_NPROBE")
+    context_tokens: int = Field(default=1200, env="CONTEXT_TOKENS")  # Prompt context budget
+    context_token_budgets: dict[str, int] = Field(default={}, env="CONTEXT_TOKEN_BUDGETS")  # Per chat model
+    query_cache_size: int = Field(default=1024, env="QUERY_CACHE_SIZE")  # 0 disables the cache
+    query_cache_ttl: float = Field(default=300.0, env="QUERY_CACHE_TTL")  # Seconds
+
+    # Answer cache (SQLite, shared by workers)
+    answer_cache_path: str = Field(default="", env="ANSWER_CACHE_PATH")  # Default: data/answer_cache.db
+    answer_cache_size: int = Field(default=10000, env="ANSWER_CACHE_SIZE")  # 0 disables the cache
+    answer_cache_ttl: float = Field(default=86400.0, env="ANSWER_CACHE_TTL")  # Seconds
+
+    # Conversation memory
+    conversation_db_path: str = Field(default="", env="CONVERSATION_DB_PATH")  # "" keeps conversations in process
+    conversation_max: int = Field(default=10000, env="CONVERSATION_MAX")
+    conversation_ttl: float = Field(default=86400.0, env="CONVERSATION_TTL")  # Seconds since the last turn
+    history_tokens: int = Field(default=1024, env="HISTORY_TOKENS")  # Recent turns sent with each question
+    summary_tokens: int = Field(default=256, env="SUMMARY_TOKENS")  # Summary of older turns
+
     # Scraping targets
     main_site_url: str = "https://diensanh.quangtri.gov.vn"
     services_portal_url: str = "https://dichvucong.quangtri.gov.vn"
@@ -30,6 +81,15 @@ class Settings(BaseSettings):
     # Server settings
     api_host: str = Field(default="0.0.0.0", env="API_HOST")
     api_port: int = Field(default=8000, env="API_PORT")
+    index_watch_interval: float = Field(default=5.0, env="INDEX_WATCH_INTERVAL")  # Seconds; 0 disables hot reload
+    admin_token: str = Field(default="", env="ADMIN_TOKEN")  # Enables POST /admin/reload and /chat/batch
+    warmup: bool = Field(default=True, env="WARMUP")  # Load the index and open LLM connections at startup
+
+    # Per-client rate limit; off by default, since behind a reverse proxy every
+    # client shares the proxy's address unless TRUST_FORWARDED_FOR is set
+    rate_limit_per_minute: float = Field(default=0.0, env="RATE_LIMIT_PER_MINUTE")  # Per client; 0 disables
+    rate_limit_burst: int = Field(default=10, env="RATE_LIMIT_BURST")
+    trust_forwarded_for: bool = Field(default=False, env="TRUST_FORWARDED_FOR")  # Key clients by X-Forwarded-For
 
     # CORS for widget embedding
     cors_origins: list[str] = Field(
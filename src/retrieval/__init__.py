@@ -0,0 +1 @@
+# Retrieval engine modules
@@ -0,0 +1,188 @@
+"""
+Text analyzers for the vector store.
+
+`regex` is the original analyzer: regex syllables plus every bigram.
+`vi-trie` segments Vietnamese text into dictionary words with a syllable
+trie (longest match), so compounds such as "khai sinh" or "hộ tịch" become
+one token instead of two syllables plus a bigram. Its dictionary combines
+administrative vocabulary with multi-syllable terms mined from the scraped
+procedures.
+"""
+
+import math
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+from sklearn.feature_extraction.text import CountVectorizer
+
+ANALYZERS = ("regex", "vi-trie")
+TOKEN_PATTERN = re.compile(r"(?u)\b\w+\b")
+# Punctuation and line breaks end a phrase; compounds never cross them
+PHRASE_BREAK = re.compile(r"[^\w \t]+")
+# Syllables and phrase breaks in one pass, for the segmenter
+SYLLABLE_OR_BREAK = re.compile(r"\w+|[^\w \t]+")
+
+# Administrative vocabulary for commune-level procedures
+ADMIN_TERMS = [
+    "ủy ban nhân dân", "hội đồng nhân dân", "mặt trận tổ quốc", "công an", "công an xã",
+    "thủ tục", "thủ tục hành chính", "dịch vụ công", "dịch vụ công trực tuyến", "một cửa",
+    "hồ sơ", "thành phần hồ sơ", "trình tự thực hiện", "cách thức thực hiện",
+    "thời hạn giải quyết", "phí", "lệ phí", "miễn phí", "cơ quan thực hiện", "lĩnh vực",
+    "yêu cầu", "điều kiện", "kết quả", "giấy tờ", "bản sao", "bản chính", "tờ khai",
+    "đăng ký", "khai sinh", "khai tử", "kết hôn", "ly hôn", "nhận cha", "nhận mẹ", "nhận con",
+    "giám hộ", "hộ tịch", "trích lục", "cải chính", "quốc tịch", "nuôi con nuôi",
+    "tình trạng hôn nhân", "giấy xác nhận", "xác nhận", "chứng thực", "chữ ký",
+    "hợp đồng", "giao dịch", "di chúc", "thừa kế",
+    "cư trú", "thường trú", "tạm trú", "tạm vắng", "lưu trú", "hộ khẩu", "sổ hộ khẩu",
+    "căn cước", "căn cước công dân", "chứng minh nhân dân", "định danh", "công dân",
+    "người nước ngoài", "hộ gia đình", "cá nhân", "tổ chức", "người dân",
+    "bảo trợ xã hội", "trợ cấp", "người có công", "chính sách xã hội", "hộ nghèo",
+    "hộ cận nghèo", "người khuyết tật", "người cao tuổi", "bảo hiểm y tế", "bảo hiểm xã hội",
+    "đất đai", "quyền sử dụng đất", "giấy chứng nhận", "xây dựng", "giấy phép", "giấy phép xây dựng",
+    "kinh doanh", "hộ kinh doanh", "thuế", "nông nghiệp", "môi trường", "khiếu nại", "tố cáo",
+    "trực tiếp", "trực tuyến", "bưu chính", "ngày làm việc", "giờ hành chính",
+    "nghĩa vụ quân sự", "thôn", "xã", "huyện", "tỉnh", "quảng trị", "diên sanh", "hải lăng",
+]
+
+
+def regex_analyzer() -> Callable[[str], list[str]]:
+    """Original analyzer: lowercase regex syllables plus all bigrams."""
+    return CountVectorizer(
+        ngram_range=(1, 2),
+        token_pattern=r'(?u)\b\w+\b',  # Simple word pattern
+        lowercase=True,
+        strip_accents=None  # Preserve Vietnamese diacritics
+    ).build_analyzer()
+
+
+class SyllableTrie:
+    """
+    Dictionary words compiled into a syllable trie for longest-match segmentation.
+
+    Each node is a dict keyed by the next syllable; the empty-string key marks
+    the end of a word (syllables are never empty). Matched multi-syllable words
+    are emitted joined with "_", e.g. "đăng_ký khai_sinh".
+    """
+
+    END = ""
+
+    def __init__(self, words: Iterable[str]):
+        self.root: dict = {}
+        self.size = 0
+        for word in words:
+            syllables = TOKEN_PATTERN.findall(word.lower())
+            if len(syllables) < 2:
+                continue
+            node = self.root
+            for syllable in syllables:
+                node = node.setdefault(syllable, {})
+            if self.END not in node:
+                node[self.END] = True
+                self.size += 1
+
+    def segment(self, syllables: list[str]) -> list[str]:
+        """Longest-match segmentation; tokens that are not words act as phrase breaks."""
+        root, end = self.root, self.END
+        tokens = []
+        i, n = 0, len(syllables)
+        while i < n:
+            syllable = syllables[i]
+            node = root.get(syllable)
+            if node is None:
+                if syllable[0].isalnum() or syllable[0] == "_":
+                    tokens.append(syllable)
+                i += 1
+                continue
+            match = i + 1
+            j = i + 1
+            while True:
+                if end in node:
+                    match = j
+                if j == n:
+                    break
+                node = node.get(syllables[j])
+                if node is None:
+                    break
+                j += 1
+            tokens.append(syllable if match == i + 1 else "_".join(syllables[i:match]))
+            i = match
+        return tokens
+
+    def __call__(self, text: str) -> list[str]:
+        return self.segment(SYLLABLE_OR_BREAK.findall(text.lower()))
+
+
+def mine_terms(
+    texts: Iterable[str],
+    min_count: int = 5,
+    min_pmi: float = 3.0,
+    max_syllables: int = 3
+) -> list[str]:
+    """
+    Mine multi-syllable terms from a corpus by count and pointwise mutual information.
+
+    A candidate n-gram must stay inside one phrase, contain no digits, occur
+    at least `min_count` times, and every adjacent syllable pair in it must
+    have PMI of at least `min_pmi`.
+
+    Returns:
+        Terms as space-separated syllables, most frequent first
+    """
+    unigrams: Counter = Counter()
+    ngrams: Counter = Counter()
+    for text in texts:
+        for phrase in PHRASE_BREAK.split(text.lower()):
+            syllables = TOKEN_PATTERN.findall(phrase)
+            unigrams.update(syllables)
+            for size in range(2, max_syllables + 1):
+                for i in range(len(syllables) - size + 1):
+                    ngrams[tuple(syllables[i:i + size])] += 1
+
+    total = sum(unigrams.values()) or 1
+
+    def pmi(a: str, b: str) -> float:
+        pair = ngrams.get((a, b), 0)
+        if not pair:
+            return float("-inf")
+        return math.log(pair * total / (unigrams[a] * unigrams[b]))
+
+    terms = []
+    for gram, count in ngrams.most_common():
+        if count < min_count:
+            break
+        if any(any(ch.isdigit() for ch in syllable) for syllable in gram):
+            continue
+        if all(pmi(a, b) >= min_pmi for a, b in zip(gram, gram[1:])):
+            terms.append(" ".join(gram))
+    return terms
+
+
+def load_dictionary(path: Path) -> list[str]:
+    if not path.exists():
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [line for line in f.read().split("\n") if line]
+
+
+def save_dictionary(path: Path, terms: list[str]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("".join(term + "\n" for term in terms))
+
+
+def build_analyzer(name: str, dictionary_path: Optional[Path] = None) -> Callable[[str], list[str]]:
+    """
+    Create an analyzer by name.
+
+    Args:
+        name: One of ANALYZERS
+        dictionary_path: Mined terms for `vi-trie` (added to ADMIN_TERMS)
+    """
+    if name == "regex":
+        return regex_analyzer()
+    if name == "vi-trie":
+        mined = load_dictionary(dictionary_path) if dictionary_path else []
+        return SyllableTrie(ADMIN_TERMS + mined)
+    raise ValueError(f"Unknown analyzer '{name}', expected one of {ANALYZERS}")
@@ -0,0 +1,227 @@
+"""
+Approximate nearest-neighbour search over passage embeddings.
+
+Each segment with embeddings holds an IVF index: spherical k-means
+centroids, and the passage vectors grouped into one inverted list per
+centroid. A query scores the centroids, then only the vectors of the
+`nprobe` closest lists, so its cost follows nprobe * n / nlist instead of n.
+Small segments get a single list, which is an exact scan.
+
+Vectors are stored as int8 codes with a per-vector scale (the default:
+half the size, and several times faster to score than float16, which NumPy
+converts without SIMD) or as float16, and memory-mapped like the rest of the
+segment (see disk_format.py):
+
+    dense_centroids     (nlist x dim) float32, unit length
+    dense_offsets       start of every list in the arrays below
+    dense_rows          segment row of every stored vector
+    dense_codes         (n x dim) float16 or int8, grouped by list
+    dense_scales        per-vector dequantization scale
+    dense_positions     row -> position in dense_codes
+"""
+
+import heapq
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
+
+from retrieval.disk_format import load_array, save_array
+
+DTYPES = ("int8", "float16")
+# Segments up to this size are scanned exactly
+MIN_LIST_SIZE = 1024
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_PER_LIST = 64
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def kmeans(vectors: np.ndarray, nlist: int, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on a sample of unit vectors; returns unit centroids."""
+    rng = np.random.default_rng(seed)
+    sample = vectors
+    if len(vectors) > nlist * KMEANS_SAMPLE_PER_LIST:
+        sample = vectors[rng.choice(len(vectors), nlist * KMEANS_SAMPLE_PER_LIST, replace=False)]
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        empty = np.bincount(assign, minlength=nlist) == 0
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]  # Reseed empty lists
+        centroids = normalize(sums)
+    return centroids
+
+
+class IVFIndex:
+    """Inverted-file index over the unit embedding vectors of one segment."""
+
+    def __init__(
+        self,
+        centroids: np.ndarray,
+        offsets: np.ndarray,
+        rows: np.ndarray,
+        codes: np.ndarray,
+        scales: np.ndarray,
+        positions: np.ndarray
+    ):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.rows = rows
+        self.codes = codes
+        self.scales = scales
+        self.positions = positions
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, dtype: str = "int8") -> "IVFIndex":
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown vector dtype '{dtype}'; expected one of {DTYPES}")
+        vectors = normalize(vectors)
+        nlist = max(1, int(np.sqrt(len(vectors)))) if len(vectors) > MIN_LIST_SIZE else 1
+        if nlist == 1:
+            centroids = normalize(vectors.mean(axis=0, keepdims=True))
+            assign = np.zeros(len(vectors), dtype=np.int64)
+        else:
+            centroids = kmeans(vectors, nlist)
+            assign = np.argmax(vectors @ centroids.T, axis=1)
+
+        order = np.argsort(assign, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))])
+        grouped = vectors[order]
+        if dtype == "int8":
+            scales = np.abs(grouped).max(axis=1) / 127
+            scales[scales == 0] = 1.0
+            codes = np.round(grouped / scales[:, None]).astype(np.int8)
+        else:
+            scales = np.ones(len(grouped))
+            codes = grouped.astype(np.float16)
+        positions = np.empty(len(order), dtype=np.int32)
+        positions[order] = np.arange(len(order))
+        return cls(
+            centroids.astype(np.float32), offsets.astype(np.int64), order.astype(np.int32),
+            codes, scales.astype(np.float32), positions
+        )
+
+    @classmethod
+    def open(cls, directory: Path) -> Optional["IVFIndex"]:
+        """Map the index of a segment, or None if it was written without embeddings."""
+        if not (directory / "dense_codes.npy").exists():
+            return None
+        return cls(*(load_array(directory, f"dense_{name}") for name in (
+            "centroids", "offsets", "rows", "codes", "scales", "positions"
+        )))
+
+    def save(self, directory: Path) -> None:
+        save_array(directory, "dense_centroids", self.centroids)
+        save_array(directory, "dense_offsets", self.offsets)
+        save_array(directory, "dense_rows", self.rows)
+        save_array(directory, "dense_codes", self.codes)
+        save_array(directory, "dense_scales", self.scales)
+        save_array(directory, "dense_positions", self.positions)
+
+    def vectors(self, rows: np.ndarray) -> np.ndarray:
+        """Dequantized vectors of segment rows, for merging segments."""
+        positions = self.positions[rows]
+        return self.codes[positions].astype(np.float32) * self.scales[positions, None]
+
+    def score_rows(self, query: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """Exact cosine of the query with the given rows."""
+        return self.vectors(rows) @ query
+
+    def search(self, query: np.ndarray, deleted: np.ndarray, k: int, nprobe: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Best `k` live rows among the `nprobe` lists closest to the query.
+
+        Returns:
+            (rows, scores), unordered
+        """
+        nlist = len(self.centroids)
+        if nlist <= nprobe:
+            lists = np.arange(nlist)
+        else:
+            lists = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        spans = [slice(self.offsets[i], self.offsets[i + 1]) for i in np.sort(lists)]
+        codes = np.concatenate([self.codes[span] for span in spans])
+        if not len(codes):
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        scores = (codes.astype(np.float32) @ query) * np.concatenate([self.scales[span] for span in spans])
+        rows = np.concatenate([self.rows[span] for span in spans])
+        live = ~deleted[rows]
+        rows, scores = rows[live], scores[live]
+        if len(rows) > k:
+            best = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[best], scores[best]
+        return rows, scores
+
+
+def top_k_dense(
+    segments: Sequence,
+    query: np.ndarray,
+    k: int,
+    nprobe: int = 8,
+    excluded: Optional[dict] = None
+) -> list[tuple[float, object, int]]:
+    """
+    Best `k` passages by embedding similarity across segments.
+
+    Segments written without embeddings are skipped, as are segments
+    missing from `excluded` when it is given (see top_k in inverted.py).
+
+    Returns:
+        List of (score, segment, row), highest score first
+    """
+    if k <= 0:
+        return []
+    hits: list[tuple[float, int, object, int]] = []
+    tiebreak = 0
+    for seg in segments:
+        skip = seg.deleted if excluded is None else excluded.get(seg)
+        if seg.dense is None or skip is None:
+            continue
+        rows, scores = seg.dense.search(query, skip, k, nprobe)
+        for row, score in zip(rows.tolist(), scores.tolist()):
+            hits.append((score, tiebreak, seg, row))
+            tiebreak -= 1
+    best = heapq.nlargest(k, hits, key=lambda hit: (hit[0], hit[1]))
+    return [(score, seg, row) for score, _, seg, row in best]
+
+
+def fuse(
+    sparse: list[tuple[float, object, int]],
+    dense: list[tuple[float, object, int]],
+    query: np.ndarray,
+    dense_weight: float,
+    k: int,
+    min_score: float
+) -> list[tuple[float, object, int]]:
+    """
+    Hybrid ranking: (1 - dense_weight) * sparse + dense_weight * cosine.
+
+    Candidates found only by the sparse path get their exact cosine from the
+    stored vectors; candidates found only by the dense path count a sparse
+    score of zero (they matched no query term strongly enough to surface).
+
+    Returns:
+        List of (score, segment, row), highest score first
+    """
+    candidates: dict[tuple[int, int], list] = {}
+    for score, seg, row in sparse:
+        candidates[(id(seg), row)] = [seg, row, score, None]
+    for score, seg, row in dense:
+        candidates.setdefault((id(seg), row), [seg, row, 0.0, None])[3] = score
+
+    fused = []
+    for seg, row, sparse_score, dense_score in candidates.values():
+        if dense_score is None:
+            dense_score = float(seg.dense.score_rows(query, np.asarray([row]))[0]) if seg.dense is not None else 0.0
+        score = (1 - dense_weight) * sparse_score + dense_weight * max(dense_score, 0.0)
+        if score >= min_score:
+            fused.append((score, seg, row))
+    fused.sort(key=lambda hit: hit[0], reverse=True)
+    return fused[:k]
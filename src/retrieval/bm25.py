@@ -0,0 +1,63 @@
+"""
+BM25F ranking for the segmented vector store.
+
+Passages are scored over two fields: the parent document's title and the
+passage content. Procedure titles name the procedure exactly, so a title hit
+is weighted above a content hit, and each field is length-normalised on its
+own, which keeps the very long procedure pages from drowning short ones.
+
+    tf~(t, d) = sum_f  w_f * tf_f / (1 - b_f + b_f * len_f / avg_len_f)
+    score     = sum_t  idf(t) * tf~ / (k1 + tf~)
+
+The saturated per-term weights are precomputed into postings when a segment
+is written, with the average field lengths current at that time (just like
+the TF-IDF norms; compaction refreshes both). A query then only multiplies
+IDF by these impacts, so it reuses the MaxScore path of retrieval/inverted.py.
+The (k1 + 1) factor is left out and query weights sum to one, so scores fall
+in [0, 1) like cosine scores and `min_score` keeps its meaning.
+"""
+
+import numpy as np
+from scipy.sparse import csr_matrix, diags
+
+K1 = 1.2
+# (weight, b) per field; order matches the columns of the lengths array
+CONTENT = (1.0, 0.75)
+TITLE = (3.0, 0.3)
+FIELDS = ("content", "title")
+
+
+def title_text(doc: dict) -> str:
+    """Title field of a document (or of a passage's metadata)."""
+    return doc.get("title") or doc.get("page_name") or ""
+
+
+def field_lengths(counts: csr_matrix, titles: csr_matrix) -> np.ndarray:
+    """(rows x 2) token counts of the content and title fields."""
+    return np.column_stack([
+        np.asarray(counts.sum(axis=1)).ravel(),
+        np.asarray(titles.sum(axis=1)).ravel()
+    ]).astype(np.float32)
+
+
+def impacts(
+    counts: csr_matrix,
+    titles: csr_matrix,
+    lengths: np.ndarray,
+    avg_lengths: np.ndarray
+) -> csr_matrix:
+    """Saturated BM25F weight of every (row, term) present in either field."""
+    fields = []
+    for (weight, b), matrix, length, avg in zip((CONTENT, TITLE), (counts, titles), lengths.T, avg_lengths):
+        norm = 1 - b + b * length / max(float(avg), 1.0)
+        fields.append(diags(weight / norm) @ matrix)
+    tf = (fields[0] + fields[1]).tocsr()
+    tf.data = tf.data / (K1 + tf.data)
+    return tf
+
+
+def idf(df: np.ndarray, n: int) -> np.ndarray:
+    """Robertson-Sparck Jones IDF, kept positive; zero for unseen terms."""
+    weights = np.log(1 + (n - df + 0.5) / (df + 0.5))
+    weights[df == 0] = 0.0
+    return weights
@@ -0,0 +1,164 @@
+"""
+Versioned, memory-mapped on-disk layout for the vector store index.
+
+Every large structure is kept as a raw array or byte blob that is opened
+with mmap, so loading an index costs milliseconds, uses almost no private
+memory, and the OS page cache is shared between uvicorn workers. Format 3
+adds the title field, field lengths and BM25F postings to format 2, and
+format 4 adds the facet bitmaps.
+
+    manifest.json                       format, generation, segments, tombstones
+    vocab/base_NNNNNN/                  hashed term table (see TermTable)
+    vocab/base_NNNNNN.log               "id<TAB>term" lines added since that base
+    segments/seg_NNNNNN/
+        counts_{indptr,indices,data}    CSR raw term counts of the content
+        title_{indptr,indices,data}     CSR raw term counts of the title
+        lengths                         content and title length per row
+        norms                           frozen TF-IDF row norms
+        postings_*                      CSC postings, weights = tf / norm,
+                                        plus per-term upper bound for pruning
+        bm25_*                          CSC postings of frozen BM25F impacts
+        doc_freq                        per-term document counts (content)
+        field_doc_freq                  per-term document counts (any field)
+        dense_*                         optional IVF embedding index (see ann.py)
+        key_{hashes,rows}               sorted key hash -> row
+        facets.json + facet_bitmaps     (facet, value) list and one packed row
+                                        bitmap per entry (see facets.py)
+        facet_heads                     packed bitmap of first passages
+        docs.jsonl + docs_offsets       offset-indexed documents
+"""
+
+import hashlib
+import json
+import mmap
+from pathlib import Path
+from typing import Iterator, Optional
+
+import numpy as np
+
+FORMAT_VERSION = 4
+
+
+def term_hash(text: str) -> int:
+    """64-bit hash used by the term and key tables."""
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def save_array(directory: Path, name: str, array: np.ndarray) -> None:
+    np.save(directory / f"{name}.npy", np.ascontiguousarray(array))
+
+
+def load_array(directory: Path, name: str) -> np.ndarray:
+    return np.load(directory / f"{name}.npy", mmap_mode="r")
+
+
+def index_dtype(size: int) -> type:
+    """Smallest index dtype for CSR/CSC arrays, shared by indptr and indices."""
+    return np.int32 if size < 2 ** 31 else np.int64
+
+
+class _Blob:
+    """Read-only mmap of a file, tolerating empty files."""
+
+    def __init__(self, path: Path):
+        self._file = open(path, "rb")
+        size = path.stat().st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __getitem__(self, item: slice) -> bytes:
+        return self._map[item]
+
+
+class DocumentTable:
+    """Documents stored as JSON lines, addressed through an offsets array."""
+
+    FILE = "docs.jsonl"
+    OFFSETS = "docs_offsets"
+
+    def __init__(self, directory: Path):
+        self._blob = _Blob(directory / self.FILE)
+        self._offsets = load_array(directory, self.OFFSETS)
+
+    @classmethod
+    def write(cls, directory: Path, documents: list[dict]) -> None:
+        offsets = [0]
+        with open(directory / cls.FILE, "wb") as f:
+            for doc in documents:
+                line = json.dumps(doc, ensure_ascii=False).encode("utf-8") + b"\n"
+                f.write(line)
+                offsets.append(offsets[-1] + len(line))
+        save_array(directory, cls.OFFSETS, np.asarray(offsets, dtype=np.uint64))
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, row: int) -> dict:
+        return json.loads(self._blob[int(self._offsets[row]):int(self._offsets[row + 1])])
+
+    def __iter__(self) -> Iterator[dict]:
+        for row in range(len(self)):
+            yield self[row]
+
+
+class TermTable:
+    """
+    Immutable hashed term dictionary.
+
+    Terms are stored by id in a UTF-8 blob with an offsets array; lookups go
+    through a sorted array of 64-bit term hashes and the matching ids, and
+    are verified against the blob so hash collisions cannot misroute a term.
+    """
+
+    def __init__(self, directory: Path):
+        self._blob = _Blob(directory / "terms.bin")
+        self._offsets = load_array(directory, "offsets")
+        self._hashes = load_array(directory, "hashes")
+        self._ids = load_array(directory, "ids")
+
+    @staticmethod
+    def write(directory: Path, terms: list[str]) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        offsets = [0]
+        with open(directory / "terms.bin", "wb") as f:
+            for term in terms:
+                data = term.encode("utf-8")
+                f.write(data)
+                offsets.append(offsets[-1] + len(data))
+        hashes = np.fromiter((term_hash(term) for term in terms), dtype=np.uint64, count=len(terms))
+        order = np.argsort(hashes, kind="stable")
+        save_array(directory, "offsets", np.asarray(offsets, dtype=np.uint64))
+        save_array(directory, "hashes", hashes[order])
+        save_array(directory, "ids", order.astype(np.int32))
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def term(self, term_id: int) -> str:
+        return self._blob[int(self._offsets[term_id]):int(self._offsets[term_id + 1])].decode("utf-8")
+
+    def terms(self) -> list[str]:
+        return [self.term(i) for i in range(len(self))]
+
+    def lookup(self, term: str) -> Optional[int]:
+        h = np.uint64(term_hash(term))
+        pos = int(np.searchsorted(self._hashes, h))
+        while pos < len(self._hashes) and self._hashes[pos] == h:
+            term_id = int(self._ids[pos])
+            if self.term(term_id) == term:
+                return term_id
+            pos += 1
+        return None
+
+
+def write_key_index(directory: Path, keys: list[str]) -> None:
+    """Sorted key hashes and their rows, for URL -> row lookups."""
+    hashes = np.fromiter((term_hash(key) for key in keys), dtype=np.uint64, count=len(keys))
+    order = np.argsort(hashes, kind="stable")
+    save_array(directory, "key_hashes", hashes[order])
+    save_array(directory, "key_rows", order.astype(np.int64))
+
+
+def find_key_rows(hashes: np.ndarray, rows: np.ndarray, key: str) -> np.ndarray:
+    """Rows whose key hash matches `key` (callers verify the key itself)."""
+    h = np.uint64(term_hash(key))
+    return rows[np.searchsorted(hashes, h, "left"):np.searchsorted(hashes, h, "right")]
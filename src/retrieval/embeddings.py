@@ -0,0 +1,175 @@
+"""
+Text embedders and the on-disk embedding cache for dense retrieval.
+
+`hash` is a deterministic local stand-in: signed feature hashing of the
+index analyzer's terms into a fixed number of dimensions. It needs no model
+or network, so tests and benchmarks can exercise the dense path; it is
+cheaper to recompute than to look up, so it is never cached.
+`api` calls the embeddings endpoint of the OpenAI-compatible API with
+settings.embedding_model.
+
+Embeddings are cached per embedder under `embeddings/<name>/`, keyed by the
+content hash of the passage, so re-indexing or re-chunking never embeds an
+unchanged passage twice:
+
+    meta.json       {"dim": ...}
+    keys.txt        one content hash per line
+    vectors.bin     float16 rows, in the order of keys.txt
+"""
+
+import json
+import re
+import threading
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+
+from retrieval.ann import normalize
+from retrieval.disk_format import term_hash
+from retrieval.segments import content_hash
+
+EMBEDDERS = ("hash", "api")
+HASH_DIM = 256
+
+
+class HashEmbedder:
+    """Deterministic embedder: signed hashing of analyzer terms, L2-normalised."""
+
+    cached = False
+
+    def __init__(self, analyzer: Callable[[str], list[str]], dim: int = HASH_DIM):
+        self.analyzer = analyzer
+        self.dim = dim
+        self.name = "hash"
+
+    def __call__(self, texts: list[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for term in self.analyzer(text):
+                h = term_hash(term)
+                vectors[i, h % self.dim] += 1.0 if (h >> 63) & 1 else -1.0
+        return normalize(vectors)
+
+
+class ApiEmbedder:
+    """Embeddings from the OpenAI-compatible API."""
+
+    cached = True
+
+    def __init__(self, model: str, base_url: str, api_key: str, batch_size: int = 64):
+        from openai import OpenAI  # Only needed when API embeddings are enabled
+
+        self.client = OpenAI(base_url=base_url, api_key=api_key)
+        self.model = model
+        self.batch_size = batch_size
+        self.name = f"api:{model}"
+
+    def __call__(self, texts: list[str]) -> np.ndarray:
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            response = self.client.embeddings.create(model=self.model, input=texts[start:start + self.batch_size])
+            vectors.extend(item.embedding for item in response.data)
+        return normalize(np.asarray(vectors, dtype=np.float32))
+
+
+def build_embedder(name: str, analyzer: Callable[[str], list[str]]):
+    """
+    Create an embedder by name.
+
+    Args:
+        name: "hash", "api" (uses settings.embedding_model) or "api:<model>"
+            as recorded in an index manifest
+        analyzer: Index analyzer, used by the hash embedder
+    """
+    if name == "hash":
+        return HashEmbedder(analyzer)
+    if name == "api" or name.startswith("api:"):
+        from config import settings
+
+        model = name.split(":", 1)[1] if ":" in name else settings.embedding_model
+        return ApiEmbedder(model, settings.ai4u_base_url, settings.ai4u_api_key)
+    raise ValueError(f"Unknown embedder '{name}'; expected one of {EMBEDDERS}")
+
+
+class EmbeddingCache:
+    """Append-only float16 embedding store keyed by content hash."""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self._lock = threading.Lock()
+        self._rows: dict[str, int] = {}
+        self._vectors = np.zeros((0, 0), dtype=np.float16)
+        self.dim: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self) -> None:
+        meta = self.directory / "meta.json"
+        if not meta.exists():
+            return
+        with open(meta, "r", encoding="utf-8") as f:
+            self.dim = json.load(f)["dim"]
+        with open(self.directory / "keys.txt", "r", encoding="utf-8") as f:
+            keys = f.read().split("\n")[:-1]
+        vectors = np.fromfile(self.directory / "vectors.bin", dtype=np.float16)
+        n = min(len(keys), len(vectors) // self.dim)  # Ignore a crashed tail
+        self._vectors = vectors[:n * self.dim].reshape(n, self.dim)
+        self._rows = {key: i for i, key in enumerate(keys[:n])}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def get(self, keys: list[str]) -> list[Optional[np.ndarray]]:
+        with self._lock:
+            return [self._vectors[self._rows[key]] if key in self._rows else None for key in keys]
+
+    def put(self, keys: list[str], vectors: np.ndarray) -> None:
+        with self._lock:
+            # One row per new key, even if a batch repeats a passage
+            first: dict[str, int] = {}
+            for i, key in enumerate(keys):
+                if key not in self._rows:
+                    first.setdefault(key, i)
+            fresh = list(first.values())
+            if not fresh:
+                return
+            block = np.asarray(vectors, dtype=np.float16)[fresh]
+            self.directory.mkdir(parents=True, exist_ok=True)
+            if self.dim is None:
+                self.dim = block.shape[1]
+                with open(self.directory / "meta.json", "w", encoding="utf-8") as f:
+                    json.dump({"dim": self.dim}, f)
+            # Vectors before keys: a crash leaves extra vectors, never a key without one
+            with open(self.directory / "vectors.bin", "ab") as f:
+                f.write(block.tobytes())
+            with open(self.directory / "keys.txt", "a", encoding="utf-8") as f:
+                f.write("".join(f"{keys[i]}\n" for i in fresh))
+            for row, i in enumerate(fresh, start=len(self._vectors)):
+                self._rows[keys[i]] = row
+            self._vectors = np.concatenate([self._vectors.reshape(-1, self.dim), block])
+
+
+class CachedEmbedder:
+    """Wraps an embedder so only passages missing from the cache are embedded."""
+
+    def __init__(self, embedder, cache_dir: Path):
+        self.embedder = embedder
+        self.name = embedder.name
+        self.cache = EmbeddingCache(Path(cache_dir) / re.sub(r"[^\w.-]+", "_", embedder.name))
+
+    def __call__(self, texts: list[str]) -> np.ndarray:
+        keys = [content_hash(text) for text in texts]
+        cached = self.cache.get(keys)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        self.cache.hits += len(texts) - len(missing)
+        self.cache.misses += len(missing)
+        if missing:
+            fresh = self.embedder([texts[i] for i in missing])
+            self.cache.put([keys[i] for i in missing], fresh)
+            for i, vector in zip(missing, fresh):
+                cached[i] = vector
+        if not texts:
+            return np.zeros((0, self.cache.dim or 0), dtype=np.float32)
+        return normalize(np.stack(cached).astype(np.float32))
@@ -0,0 +1,127 @@
+"""
+Facet index for filtered search.
+
+Every segment stores one packed row bitmap per metadata value of the
+filterable facets (source, procedure_type, page_name, field), written with
+the segment and memory-mapped like its other arrays. A filter is answered
+by OR-ing the bitmaps of the values asked for within a facet and AND-ing
+the facets, and the resulting mask is merged with the segment's tombstones.
+Rows outside the mask are dropped from the postings before any score is
+accumulated (see score_postings in inverted.py), a segment with no matching
+row is not visited, and the pruning threshold rises only on rows that can
+be returned.
+"""
+
+import json
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+
+from retrieval.disk_format import load_array, save_array
+
+FACETS = ("source", "procedure_type", "page_name", "field")
+FACETS_FILE = "facets.json"
+
+# Set bits per byte value, for counting rows in packed bitmaps
+_POPCOUNT = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.int64)
+
+
+def normalize_filters(filters: Optional[dict]) -> tuple:
+    """
+    Canonical, hashable form of a filter: ((facet, (value, ...)), ...).
+
+    A facet maps to one value or a list of accepted values; empty facets
+    are dropped.
+    """
+    if not filters:
+        return ()
+    normalized = []
+    for facet, values in filters.items():
+        if facet not in FACETS:
+            raise ValueError(f"Unknown facet '{facet}'; expected one of {FACETS}")
+        values = [values] if isinstance(values, str) else list(values or ())
+        if values:
+            normalized.append((facet, tuple(sorted(set(values)))))
+    return tuple(sorted(normalized))
+
+
+class FacetIndex:
+    """Packed row bitmaps of one segment, one per (facet, value)."""
+
+    def __init__(self, size: int, entries: list[tuple[str, str]], bitmaps: np.ndarray, heads: np.ndarray):
+        self.size = size
+        self.entries = entries  # (facet, value) of each bitmap row
+        self.bitmaps = bitmaps  # (entries x ceil(size / 8)) packed bits
+        self.heads = heads  # Packed bits of each document's first passage, for counting documents
+        self._rows = {entry: i for i, entry in enumerate(entries)}
+
+    @classmethod
+    def build(cls, documents: Iterable[dict], size: int) -> "FacetIndex":
+        rows: dict[tuple[str, str], list[int]] = {}
+        heads = np.zeros(size, dtype=bool)
+        parent = None
+        for row, doc in enumerate(documents):
+            # Passages of a document are written next to each other
+            doc_parent = doc.get("parent_id", doc.get("id"))
+            heads[row] = doc_parent != parent
+            parent = doc_parent
+            metadata = doc.get("metadata", {})
+            for facet in FACETS:
+                value = metadata.get(facet)
+                if value:
+                    rows.setdefault((facet, value), []).append(row)
+
+        entries = sorted(rows)
+        bitmaps = np.zeros((len(entries), size), dtype=bool)
+        for i, entry in enumerate(entries):
+            bitmaps[i, rows[entry]] = True
+        return cls(size, entries, np.packbits(bitmaps, axis=1), np.packbits(heads))
+
+    @classmethod
+    def open(cls, directory: Path, size: int) -> "FacetIndex":
+        with open(directory / FACETS_FILE, "r", encoding="utf-8") as f:
+            entries = [tuple(entry) for entry in json.load(f)]
+        return cls(size, entries, load_array(directory, "facet_bitmaps"), load_array(directory, "facet_heads"))
+
+    def save(self, directory: Path) -> None:
+        with open(directory / FACETS_FILE, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        save_array(directory, "facet_bitmaps", self.bitmaps)
+        save_array(directory, "facet_heads", self.heads)
+
+    def _packed_mask(self, filters: tuple) -> np.ndarray:
+        allowed = np.full(self.heads.shape, 0xFF, dtype=np.uint8)
+        for facet, values in filters:
+            rows = [self._rows[(facet, value)] for value in values if (facet, value) in self._rows]
+            if not rows:
+                return np.zeros_like(allowed)
+            allowed &= np.bitwise_or.reduce(self.bitmaps[rows], axis=0)
+        return allowed
+
+    def mask(self, filters: tuple) -> np.ndarray:
+        """Rows matching normalized `filters` (see normalize_filters), as a bool array."""
+        return np.unpackbits(self._packed_mask(filters), count=self.size).view(bool)
+
+    def counts(self, live: np.ndarray) -> dict[str, dict[str, int]]:
+        """Documents per facet value among the rows of `live`."""
+        documents = np.packbits(live) & self.heads
+        per_entry = _POPCOUNT[self.bitmaps & documents].sum(axis=1) if len(self.entries) else []
+        counts: dict[str, dict[str, int]] = {facet: {} for facet in FACETS}
+        for (facet, value), count in zip(self.entries, per_entry):
+            counts[facet][value] = int(count)
+        return counts
+
+
+def excluded_rows(segments: Iterable, filters: tuple) -> dict:
+    """
+    Rows to skip per segment under `filters`: tombstones plus non-matching rows.
+
+    Segments without a single live matching row are left out.
+    """
+    excluded = {}
+    for seg in segments:
+        skip = seg.deleted | ~seg.facets.mask(filters)
+        if not skip.all():
+            excluded[seg] = skip
+    return excluded
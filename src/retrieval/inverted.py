@@ -0,0 +1,253 @@
+"""
+Inverted-index query path for the segmented vector store.
+
+Each segment exposes term postings per ranker (document rows plus
+precomputed weights: `tf / norm` for TF-IDF, saturated impacts for BM25F).
+A query walks only the postings of its own terms, using MaxScore-style
+pruning: terms are visited by descending upper bound and, once the remaining
+terms cannot lift an unseen document over the current threshold, they only
+update documents that are already candidates. The threshold starts at
+`min_score` and rises to the k-th best score found so far, so latency tracks
+how many documents a query matches rather than corpus size.
+"""
+
+import heapq
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
+from scipy.sparse import csc_matrix, csr_matrix
+
+from retrieval.disk_format import index_dtype, load_array, save_array
+
+
+class Postings:
+    """Column-major view of a segment: per term, sorted rows and weights."""
+
+    def __init__(
+        self,
+        indptr: np.ndarray,
+        rows: np.ndarray,
+        weights: np.ndarray,
+        max_weight: np.ndarray
+    ):
+        self.indptr = indptr
+        self.rows = rows
+        self.weights = weights
+        self.max_weight = max_weight
+
+    @classmethod
+    def build(cls, matrix: csr_matrix) -> "Postings":
+        """Invert a (documents x terms) matrix of precomputed weights."""
+        csc = matrix.tocsc()
+        csc.sort_indices()
+        weights = csc.data.astype(np.float32)
+        # Per-term upper bound on any single document weight
+        max_weight = np.zeros(csc.shape[1], dtype=np.float32)
+        nonempty = np.diff(csc.indptr) > 0
+        if nonempty.any():
+            max_weight[nonempty] = np.maximum.reduceat(weights, csc.indptr[:-1][nonempty])
+        return cls(csc.indptr, csc.indices, weights, max_weight)
+
+    @classmethod
+    def open(cls, directory: Path, prefix: str = "postings") -> "Postings":
+        return cls(
+            load_array(directory, f"{prefix}_indptr"),
+            load_array(directory, f"{prefix}_rows"),
+            load_array(directory, f"{prefix}_weights"),
+            load_array(directory, f"{prefix}_max_weight")
+        )
+
+    def save(self, directory: Path, prefix: str = "postings") -> None:
+        dtype = index_dtype(len(self.rows))
+        save_array(directory, f"{prefix}_indptr", self.indptr.astype(dtype))
+        save_array(directory, f"{prefix}_rows", self.rows.astype(dtype))
+        save_array(directory, f"{prefix}_weights", self.weights)
+        save_array(directory, f"{prefix}_max_weight", self.max_weight)
+
+    @property
+    def width(self) -> int:
+        return len(self.max_weight)
+
+    def matrix(self, n_rows: int) -> csc_matrix:
+        """Postings as a (documents x terms) sparse matrix, without copying."""
+        return csc_matrix((self.weights, self.rows, self.indptr), shape=(n_rows, self.width), copy=False)
+
+    def term(self, term_id: int) -> tuple[np.ndarray, np.ndarray]:
+        start, end = self.indptr[term_id], self.indptr[term_id + 1]
+        return self.rows[start:end], self.weights[start:end]
+
+
+def score_postings(
+    postings: Postings,
+    deleted: np.ndarray,
+    term_ids: np.ndarray,
+    weights: np.ndarray,
+    threshold: float
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Score the documents of one segment that can reach `threshold`.
+
+    Rows set in `deleted` (tombstones, or rows outside a filter) are dropped
+    from the postings before their scores are accumulated.
+
+    Returns:
+        (rows, scores) of live documents scoring at least `threshold`
+    """
+    empty = np.zeros(0, dtype=np.int64), np.zeros(0)
+    inside = term_ids < postings.width
+    term_ids, weights = term_ids[inside], weights[inside]
+    if not len(term_ids):
+        return empty
+
+    bounds = weights * postings.max_weight[term_ids]
+    order = np.argsort(-bounds)
+    term_ids, weights, bounds = term_ids[order], weights[order], bounds[order]
+    remaining = np.cumsum(bounds[::-1])[::-1]  # Best score still reachable from term i onwards
+
+    # Essential terms: a document missing all of them cannot reach the threshold
+    n_essential = int(np.count_nonzero(remaining >= threshold))
+    if n_essential == 0:
+        return empty
+
+    rows, contributions = [], []
+    for term_id, weight in zip(term_ids[:n_essential], weights[:n_essential]):
+        term_rows, term_weights = postings.term(term_id)
+        live = ~deleted[term_rows]
+        rows.append(term_rows[live])
+        contributions.append(weight * term_weights[live])
+    candidates, inverse = np.unique(np.concatenate(rows), return_inverse=True)
+    scores = np.bincount(inverse, weights=np.concatenate(contributions))
+
+    for i in range(n_essential, len(term_ids)):
+        alive = scores + remaining[i] >= threshold
+        candidates, scores = candidates[alive], scores[alive]
+        if not len(candidates):
+            return empty
+        term_rows, term_weights = postings.term(term_ids[i])
+        if not len(term_rows):
+            continue
+        positions = np.minimum(np.searchsorted(term_rows, candidates), len(term_rows) - 1)
+        hit = term_rows[positions] == candidates
+        scores[hit] += weights[i] * term_weights[positions[hit]]
+
+    keep = scores >= threshold  # Candidates come from live rows only
+    return candidates[keep], scores[keep]
+
+
+def top_k(
+    segments: Sequence,
+    term_ids: np.ndarray,
+    weights: np.ndarray,
+    k: int,
+    min_score: float,
+    ranker: str = "tfidf",
+    excluded: Optional[dict] = None
+) -> list[tuple[float, object, int]]:
+    """
+    Best `k` documents across segments, scored with the postings of `ranker`.
+
+    `excluded` maps segments to the rows they must not return (see
+    retrieval/facets.py); segments missing from it are skipped. By default
+    every segment is searched without its tombstoned rows.
+
+    Returns:
+        List of (score, segment, row), highest score first
+    """
+    if k <= 0:
+        return []
+
+    hits: list[tuple[float, int, object, int]] = []
+    threshold = min_score
+    tiebreak = 0
+    # Large segments first so the threshold rises early for the small ones
+    for seg in sorted(segments, key=len, reverse=True):
+        skip = seg.deleted if excluded is None else excluded.get(seg)
+        if skip is None:
+            continue
+        rows, scores = score_postings(seg.ranking(ranker), skip, term_ids, weights, threshold)
+        if not len(rows):
+            continue
+        if len(rows) > k:
+            best = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[best], scores[best]
+        for row, score in zip(rows.tolist(), scores.tolist()):
+            hits.append((score, tiebreak, seg, row))
+            tiebreak -= 1
+        if len(hits) >= k:
+            hits = heapq.nlargest(k, hits, key=lambda hit: (hit[0], hit[1]))
+            threshold = max(threshold, hits[-1][0])
+
+    hits.sort(key=lambda hit: (hit[0], hit[1]), reverse=True)
+    return [(score, seg, row) for score, _, seg, row in hits[:k]]
+
+
+def top_k_many(
+    segments: Sequence,
+    queries: csr_matrix,
+    k: int,
+    min_score: float,
+    ranker: str = "tfidf",
+    batch_size: int = 256
+) -> list[list[tuple[float, object, int]]]:
+    """
+    Best `k` documents for many queries at once.
+
+    Every batch of queries is scored against a segment with one sparse
+    matrix product; top-k selection over the sparse result is a single
+    lexsort per batch instead of a Python loop per query. Tombstoned rows
+    are sliced out of a segment's postings once, before any product.
+
+    Args:
+        segments: Segments to search
+        queries: (n_queries x terms) weights from SegmentStore.query_matrix
+        k: Results per query
+        min_score: Minimum score to keep
+        ranker: Postings to score with ("tfidf" or "bm25")
+        batch_size: Queries scored per matrix product (bounds memory)
+
+    Returns:
+        One list of (score, segment, row) per query, highest score first
+    """
+    results: list[list[tuple[float, object, int]]] = [[] for _ in range(queries.shape[0])]
+    if k <= 0:
+        return results
+    segments = list(segments)
+    live_postings = []
+    for seg in segments:
+        postings = seg.ranking(ranker)
+        matrix = postings.matrix(len(seg))
+        live = None
+        if seg.deleted.any():
+            live = np.flatnonzero(~seg.deleted)
+            matrix = matrix[live]
+        live_postings.append((matrix, postings.width, live))
+
+    for start in range(0, queries.shape[0], batch_size):
+        batch = queries[start:start + batch_size]
+        query_ids, scores, owners, rows = [], [], [], []
+        for owner, (matrix, postings_width, live) in enumerate(live_postings):
+            width = min(postings_width, batch.shape[1])
+            product = (batch[:, :width] @ matrix[:, :width].T).tocoo()
+            keep = product.data >= min_score
+            query_ids.append(product.row[keep])
+            scores.append(product.data[keep])
+            rows.append(product.col[keep] if live is None else live[product.col[keep]])
+            owners.append(np.full(int(keep.sum()), owner))
+        if not query_ids:
+            continue
+        query_ids, scores = np.concatenate(query_ids), np.concatenate(scores)
+        owners, rows = np.concatenate(owners), np.concatenate(rows)
+
+        # Sort by query, then by descending score; keep the first k of each query
+        order = np.lexsort((-scores, query_ids))
+        query_ids = query_ids[order]
+        starts = np.searchsorted(query_ids, query_ids, side="left")
+        rank = np.arange(len(query_ids)) - starts
+        best = order[rank < k]
+        for query, score, owner, row in zip(
+            query_ids[rank < k].tolist(), scores[best].tolist(), owners[best].tolist(), rows[best].tolist()
+        ):
+            results[start + query].append((score, segments[owner], row))
+
+    return results
@@ -0,0 +1,113 @@
+"""
+Passage chunking for the vector store.
+
+Procedure pages are long (up to 5000 chars) but a question is usually about
+one section of them: the fees, the processing time or the required papers.
+Documents are split on the section headings the dichvucong scraper already
+recognises, and long sections are split again at line breaks, so search
+returns the passage that answers the question instead of the top of a page.
+
+Every passage records its section and [start, end) character offsets into
+the parent document's content.
+"""
+
+import re
+
+# Section headings of dichvucong procedure pages (see dichvucong-scraper.py)
+SECTION_HEADINGS = (
+    "Cách thức thực hiện",
+    "Thời hạn giải quyết",
+    "Phí, lệ phí",
+    "Thành phần hồ sơ",
+    "Trình tự thực hiện",
+    "Trình tự",
+    "Cơ quan thực hiện",
+    "Yêu cầu, điều kiện",
+    "Yêu cầu",
+    "Căn cứ pháp lý",
+    "Kết quả thực hiện",
+)
+# A heading is a line of its own; "Cơ quan thực hiện: ..." inside a section is not
+HEADING_PATTERN = re.compile(
+    r"^[ \t]*(" + "|".join(re.escape(h) for h in SECTION_HEADINGS) + r")[ \t]*:?[ \t]*$",
+    re.IGNORECASE | re.MULTILINE
+)
+# Section name of the text before the first heading
+INTRO_SECTION = "Giới thiệu"
+
+
+def split_sections(content: str) -> list[tuple[str, int, int]]:
+    """
+    Split content at section headings.
+
+    Returns:
+        List of (section, start, end); sections cover the content without gaps
+    """
+    sections = []
+    name, start = INTRO_SECTION, 0
+    for match in HEADING_PATTERN.finditer(content):
+        if match.start() > start:
+            sections.append((name, start, match.start()))
+        name, start = match.group(1), match.start()
+    if start < len(content):
+        sections.append((name, start, len(content)))
+    return sections
+
+
+def _split_long(content: str, start: int, end: int, max_chars: int) -> list[tuple[int, int]]:
+    """Split [start, end) into pieces of at most max_chars, preferring line breaks."""
+    pieces = []
+    while end - start > max_chars:
+        cut = content.rfind("\n", start + max_chars // 2, start + max_chars)
+        if cut < 0:
+            cut = content.rfind(" ", start + max_chars // 2, start + max_chars)
+        cut = cut + 1 if cut >= 0 else start + max_chars
+        pieces.append((start, cut))
+        start = cut
+    pieces.append((start, end))
+    return pieces
+
+
+def chunk_document(content: str, max_chars: int = 1200, min_chars: int = 150) -> list[dict]:
+    """
+    Split a document into passages.
+
+    Sections shorter than `min_chars` are merged into the following one and
+    both names are kept (so a bare heading never becomes a passage on its
+    own); sections longer than `max_chars` are split at line breaks.
+
+    Args:
+        content: Document text
+        max_chars: Maximum passage length
+        min_chars: Minimum section length before merging
+
+    Returns:
+        List of dicts with section, start, end and content
+    """
+    merged: list[list] = []
+    pending = None
+    for name, start, end in split_sections(content):
+        if pending is not None:
+            name = name if pending[0] == INTRO_SECTION else f"{pending[0]}; {name}"
+            start = pending[1]
+            pending = None
+        if end - start < min_chars and end < len(content):
+            pending = (name, start)
+            continue
+        merged.append([name, start, end])
+    if pending is not None:
+        merged.append([pending[0], pending[1], len(content)])
+
+    passages = []
+    for name, start, end in merged:
+        for piece_start, piece_end in _split_long(content, start, end, max_chars):
+            text = content[piece_start:piece_end]
+            if not text.strip():
+                continue
+            passages.append({
+                "section": name,
+                "start": piece_start,
+                "end": piece_end,
+                "content": text
+            })
+    return passages
@@ -0,0 +1,97 @@
+"""
+Bounded LRU + TTL cache of search results.
+
+Citizens ask the same handful of questions all day, so VectorStore keeps
+the results of recent queries. Keys are the normalised query plus every
+parameter that changes the result; entries are tied to the index
+generation, which SegmentStore bumps on every add, delete, clear and
+compaction, so a changed index never serves stale passages.
+"""
+
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+WHITESPACE = re.compile(r"\s+")
+# Punctuation around a question does not change its terms
+EDGE_PUNCTUATION = re.compile(r"^[^\w]+|[^\w]+$")
+
+
+def normalize_query(query: str) -> str:
+    """NFC, lowercase, single spaces, no surrounding punctuation."""
+    query = unicodedata.normalize("NFC", query).lower()
+    return EDGE_PUNCTUATION.sub("", WHITESPACE.sub(" ", query).strip())
+
+
+class QueryCache:
+    """Thread-safe LRU cache with a time-to-live, invalidated per index generation."""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, tuple[float, object]] = OrderedDict()
+        self._generation: Optional[int] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _sync(self, generation: int) -> None:
+        if generation != self._generation:
+            if self._entries:
+                self.invalidations += 1
+            self._entries = OrderedDict()
+            self._generation = generation
+
+    def get(self, key: Hashable, generation: int) -> Optional[object]:
+        """Cached value for `key`, or None on a miss."""
+        if self.max_entries <= 0:
+            return None
+        with self._lock:
+            self._sync(generation)
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, generation: int, value: object) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._sync(generation)
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries = OrderedDict()
+
+    def stats(self) -> dict:
+        """Counters for sizing the cache."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
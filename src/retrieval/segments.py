@@ -0,0 +1,845 @@
+"""
+Segmented, append-friendly storage for the vector store index.
+
+New documents are written to small immutable segments instead of refitting
+the whole corpus. Replaced or removed pages are tombstoned, and compaction
+at the end of a write merges small segments and drops deleted rows, so ingest cost
+follows the size of the change rather than the size of the corpus.
+
+Segments, the vocabulary and documents are memory-mapped (see
+retrieval/disk_format.py); only the manifest, tombstones and global document
+frequencies live in private memory.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+import numpy as np
+from scipy.sparse import csr_matrix, diags, vstack
+
+from retrieval import bm25
+from retrieval.ann import IVFIndex
+from retrieval.disk_format import (
+    FORMAT_VERSION,
+    DocumentTable,
+    TermTable,
+    find_key_rows,
+    index_dtype,
+    load_array,
+    save_array,
+    write_key_index,
+)
+from retrieval.facets import FacetIndex
+from retrieval.inverted import Postings
+
+MANIFEST_FILE = "manifest.json"
+SEGMENTS_DIR = "segments"
+VOCAB_DIR = "vocab"
+LOCK_FILE = ".lock"
+# Age after which a half-written segment directory is assumed abandoned
+STALE_TMP_SECONDS = 3600
+
+
+def content_hash(content: str) -> str:
+    """Stable fingerprint used to skip unchanged pages on re-ingest."""
+    return hashlib.md5(content.encode("utf-8")).hexdigest()
+
+
+def document_key(doc: dict) -> str:
+    """Identity of a document: its URL, or its content hash when it has none."""
+    return doc.get("url") or f"sha:{content_hash(doc.get('content', ''))}"
+
+
+class Vocabulary:
+    """
+    Term dictionary: a memory-mapped hashed base table plus an append log.
+
+    Term ids never change. Terms added after the base was written are kept
+    in memory and appended to `vocab/<base>.log`; compaction folds them into
+    a new base table.
+    """
+
+    def __init__(self):
+        self.base: Optional[TermTable] = None
+        self.base_name = "base_000000"
+        self.base_size = 0
+        self.added: list[str] = []
+        self.added_index: dict[str, int] = {}
+        self._flushed = 0
+
+    def __len__(self) -> int:
+        return self.base_size + len(self.added)
+
+    def get(self, term: str) -> Optional[int]:
+        term_id = self.added_index.get(term)
+        if term_id is None and self.base is not None:
+            term_id = self.base.lookup(term)
+        return term_id
+
+    def add(self, term: str) -> int:
+        term_id = self.get(term)
+        if term_id is None:
+            term_id = len(self)
+            self.added.append(term)
+            self.added_index[term] = term_id
+        return term_id
+
+    def terms(self, size: int) -> list[str]:
+        """The first `size` terms, in id order."""
+        base = self.base.terms() if self.base is not None else []
+        return (base + self.added[:size - self.base_size])[:size]
+
+    def load(self, vocab_dir: Path, base_name: str, size: int) -> None:
+        """Open the base table and replay its log up to `size` terms."""
+        base_dir = vocab_dir / base_name
+        self.base = TermTable(base_dir) if base_dir.exists() else None
+        self.base_name = base_name
+        self.base_size = len(self.base) if self.base is not None else 0
+
+        entries: dict[int, str] = {}
+        log = vocab_dir / f"{base_name}.log"
+        if log.exists():
+            with open(log, "r", encoding="utf-8") as f:
+                for line in f.read().split("\n")[:-1]:
+                    term_id, term = line.split("\t", 1)
+                    entries[int(term_id)] = term  # Later lines win over a crashed tail
+        self.added = [entries[i] for i in range(self.base_size, size)]
+        self.added_index = {term: self.base_size + i for i, term in enumerate(self.added)}
+        self._flushed = len(self.added)
+
+    def flush(self, vocab_dir: Path) -> None:
+        """Append terms added since the last flush to the log."""
+        pending = self.added[self._flushed:]
+        if pending:
+            vocab_dir.mkdir(parents=True, exist_ok=True)
+            first = self.base_size + self._flushed
+            with open(vocab_dir / f"{self.base_name}.log", "a", encoding="utf-8") as f:
+                f.write("".join(f"{first + i}\t{term}\n" for i, term in enumerate(pending)))
+            self._flushed = len(self.added)
+
+    def rebase(self, vocab_dir: Path, base_name: str, size: int) -> None:
+        """Switch to a freshly written base holding the first `size` terms."""
+        remaining = self.added[size - self.base_size:]
+        self.base = TermTable(vocab_dir / base_name)
+        self.base_name = base_name
+        self.base_size = size
+        self.added = remaining
+        self.added_index = {term: size + i for i, term in enumerate(remaining)}
+        self._flushed = 0
+        self.flush(vocab_dir)
+
+
+class Segment:
+    """
+    Immutable, memory-mapped block of passages with raw term counts.
+
+    All passages of a document share its key and are written together, and
+    every passage carries the title of its document as a separate field.
+
+    Norms are the L2 norms of the TF-IDF rows computed with the IDF that was
+    current when the segment was written, and BM25F impacts use the average
+    field lengths of that time; compaction refreshes both. Segments written
+    while an embedder is configured also hold an IVF index of passage
+    embeddings (see retrieval/ann.py). Only the tombstone mask is private to
+    the process.
+    """
+
+    def __init__(self, name: str, directory: Path):
+        self.name = name
+        self.directory = directory
+        self.documents = DocumentTable(directory)
+        self.indptr = load_array(directory, "counts_indptr")
+        self.indices = load_array(directory, "counts_indices")
+        self.data = load_array(directory, "counts_data")
+        self.title_indptr = load_array(directory, "title_indptr")
+        self.title_indices = load_array(directory, "title_indices")
+        self.title_data = load_array(directory, "title_data")
+        self.lengths = load_array(directory, "lengths")
+        self.norms = load_array(directory, "norms")
+        self.doc_freq = load_array(directory, "doc_freq")
+        self.field_doc_freq = load_array(directory, "field_doc_freq")
+        self.postings = Postings.open(directory)
+        self.bm25 = Postings.open(directory, "bm25")
+        self.dense = IVFIndex.open(directory)
+        self._key_hashes = load_array(directory, "key_hashes")
+        self._key_rows = load_array(directory, "key_rows")
+        self.facets = FacetIndex.open(directory, len(self.documents))
+        self.deleted = np.zeros(len(self.documents), dtype=bool)
+
+    @classmethod
+    def write(
+        cls,
+        name: str,
+        directory: Path,
+        documents: list[dict],
+        counts: csr_matrix,
+        titles: csr_matrix,
+        norms: np.ndarray,
+        avg_lengths: np.ndarray,
+        vectors: Optional[np.ndarray] = None,
+        vector_dtype: str = "int8"
+    ) -> "Segment":
+        """
+        Write a segment directory atomically and open it.
+
+        `counts` and `titles` are the content and title term counts, both
+        as wide as the vocabulary; `vectors` are optional passage embeddings.
+        """
+        tmp = directory.with_name(directory.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+
+        width = counts.shape[1]
+        lengths = bm25.field_lengths(counts, titles)
+        impacts = bm25.impacts(counts, titles, lengths, avg_lengths)
+        for prefix, matrix in (("counts", counts), ("title", titles)):
+            dtype = index_dtype(matrix.nnz)
+            save_array(tmp, f"{prefix}_indptr", matrix.indptr.astype(dtype))
+            save_array(tmp, f"{prefix}_indices", matrix.indices.astype(dtype))
+            save_array(tmp, f"{prefix}_data", matrix.data.astype(np.float32))
+        save_array(tmp, "lengths", lengths)
+        save_array(tmp, "norms", norms.astype(np.float32))
+        save_array(tmp, "doc_freq", np.bincount(counts.indices, minlength=width).astype(np.int32))
+        save_array(tmp, "field_doc_freq", np.bincount(impacts.indices, minlength=width).astype(np.int32))
+        Postings.build((diags(1 / norms) @ counts).tocsr()).save(tmp)
+        Postings.build(impacts).save(tmp, "bm25")
+        if vectors is not None and len(vectors):
+            IVFIndex.build(vectors, vector_dtype).save(tmp)
+        write_key_index(tmp, [doc["key"] for doc in documents])
+        FacetIndex.build(documents, len(documents)).save(tmp)
+        DocumentTable.write(tmp, documents)
+
+        os.replace(tmp, directory)
+        return cls(name, directory)
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    @property
+    def width(self) -> int:
+        return len(self.doc_freq)
+
+    @property
+    def live_count(self) -> int:
+        return len(self.documents) - int(self.deleted.sum())
+
+    @property
+    def counts(self) -> csr_matrix:
+        return csr_matrix((self.data, self.indices, self.indptr), shape=(len(self), self.width), copy=False)
+
+    @property
+    def titles(self) -> csr_matrix:
+        return csr_matrix(
+            (self.title_data, self.title_indices, self.title_indptr), shape=(len(self), self.width), copy=False
+        )
+
+    def ranking(self, ranker: str) -> Postings:
+        """Postings scored by `ranker` ("tfidf" or "bm25")."""
+        return self.bm25 if ranker == "bm25" else self.postings
+
+    def row_terms(self, row: int) -> np.ndarray:
+        """Term ids present in a document row."""
+        return self.indices[self.indptr[row]:self.indptr[row + 1]]
+
+    def row_fields(self, row: int) -> np.ndarray:
+        """Term ids present in either field of a document row."""
+        title = self.title_indices[self.title_indptr[row]:self.title_indptr[row + 1]]
+        return np.union1d(self.row_terms(row), title)
+
+    def live_doc_freq(self, size: int, fields: bool = False) -> np.ndarray:
+        """Document frequency of every term over the live rows (content only, or any field)."""
+        df = np.zeros(size, dtype=np.int64)
+        df[:self.width] += self.field_doc_freq if fields else self.doc_freq
+        row_terms = self.row_fields if fields else self.row_terms
+        rows = np.flatnonzero(self.deleted)
+        if len(rows):
+            df -= np.bincount(np.concatenate([row_terms(row) for row in rows]), minlength=size)
+        return df
+
+    def find(self, key: str) -> list[int]:
+        """Live rows (the passages of one document) holding `key`."""
+        return [
+            int(row) for row in find_key_rows(self._key_hashes, self._key_rows, key)
+            if not self.deleted[row] and self.documents[row]["key"] == key
+        ]
+
+
+class SegmentStore:
+    """Manifest of segments plus the global statistics needed for scoring."""
+
+    def __init__(
+        self,
+        persist_dir: Path,
+        max_segments: int = 8,
+        max_deleted_ratio: float = 0.3,
+        max_df: float = 0.99
+    ):
+        self.persist_dir = Path(persist_dir)
+        self.max_segments = max_segments
+        self.max_deleted_ratio = max_deleted_ratio
+        self.max_df = max_df
+
+        # Passage embedder (texts -> unit vectors) and vector storage, set by VectorStore
+        self.embed: Optional[Callable[[list[str]], np.ndarray]] = None
+        self.vector_dtype = "int8"
+
+        self._lock = threading.RLock()
+        self._compactor: Optional[threading.Thread] = None
+        self._writer = threading.RLock()  # Held with the cross-process lock (see exclusive())
+        self._writer_depth = 0
+        self._reset()
+
+    def _reset(self) -> None:
+        self.segments: list[Segment] = []
+        self.vocab = Vocabulary()
+        self.analyzer_name: Optional[str] = None
+        self.embedder_name: Optional[str] = None
+        self.generation = getattr(self, "generation", -1) + 1
+        self.next_seq = 0
+        self.next_name = 1
+
+        self._df = np.zeros(0, dtype=np.int64)
+        self._field_df = np.zeros(0, dtype=np.int64)
+        self._lengths = np.zeros(len(bm25.FIELDS))
+        self._n_live = 0
+        self._idf: Optional[np.ndarray] = None
+        self._idf_generation = -1
+        self._bm25_idf: Optional[np.ndarray] = None
+        self._bm25_idf_generation = -1
+
+    # ------------------------------------------------------------------
+    # Statistics
+    # ------------------------------------------------------------------
+
+    def count(self) -> int:
+        """Number of live passages."""
+        return self._n_live
+
+    def keys(self) -> Iterator[str]:
+        """Keys of all live documents (reads every passage)."""
+        seen = set()
+        for seg in list(self.segments):
+            for row in np.flatnonzero(~seg.deleted):
+                key = seg.documents[row]["key"]
+                if key not in seen:
+                    seen.add(key)
+                    yield key
+
+    def idf(self) -> np.ndarray:
+        """Smoothed IDF over live documents, matching TfidfVectorizer."""
+        if self._idf_generation != self.generation or self._idf is None:
+            n = self._n_live
+            df = self._df
+            idf = np.log((1 + n) / (1 + df)) + 1
+            idf[df == 0] = 0.0
+            idf[df > self.max_df * n] = 0.0  # Same pruning as max_df
+            self._idf = idf
+            self._idf_generation = self.generation
+        return self._idf
+
+    def bm25_idf(self) -> np.ndarray:
+        """BM25 IDF over live documents, counting a term found in any field."""
+        if self._bm25_idf_generation != self.generation or self._bm25_idf is None:
+            self._bm25_idf = bm25.idf(self._field_df, self._n_live)
+            self._bm25_idf_generation = self.generation
+        return self._bm25_idf
+
+    def avg_lengths(self) -> np.ndarray:
+        """Average content and title length of the live passages."""
+        return self._lengths / max(self._n_live, 1)
+
+    def query_weights(self, terms: Counter, ranker: str = "tfidf") -> tuple[np.ndarray, np.ndarray]:
+        """
+        Turn analyzed query terms into (term ids, weights).
+
+        Weights already include the document-side IDF, so a row score is
+        just the dot product of `weights` with the row's postings weights
+        for `ranker`.
+        """
+        idf = self.bm25_idf() if ranker == "bm25" else self.idf()
+        ids, tf = [], []
+        for term, freq in terms.items():
+            term_id = self.vocab.get(term)
+            if term_id is not None and idf[term_id] > 0:
+                ids.append(term_id)
+                tf.append(freq)
+        if not ids:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        ids = np.asarray(ids, dtype=np.int64)
+        query = np.asarray(tf, dtype=np.float64) * idf[ids]
+        if ranker == "bm25":
+            return ids, query / query.sum()  # Impacts are < 1, so scores stay below 1
+        query /= np.linalg.norm(query)
+        return ids, query * idf[ids]
+
+    def query_matrix(self, queries: list[Counter], ranker: str = "tfidf") -> csr_matrix:
+        """Stack the weights of many analyzed queries into one sparse matrix."""
+        indptr, indices, data = [0], [], []
+        for terms in queries:
+            ids, weights = self.query_weights(terms, ranker)
+            indices.append(ids)
+            data.append(weights)
+            indptr.append(indptr[-1] + len(ids))
+        return csr_matrix(
+            (np.concatenate(data) if data else np.zeros(0),
+             np.concatenate(indices) if indices else np.zeros(0, dtype=np.int64),
+             np.asarray(indptr)),
+            shape=(len(queries), len(self.vocab))
+        )
+
+    def _norms(self, counts: csr_matrix, idf: np.ndarray) -> np.ndarray:
+        weighted = counts.multiply(idf[:counts.shape[1]]).tocsr()
+        norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return norms.astype(np.float32)
+
+    def _title_terms(self, title: str, analyzer: Callable[[str], list[str]]) -> list[tuple[int, int]]:
+        return [(self.vocab.add(term), freq) for term, freq in Counter(analyzer(title)).items()]
+
+    def _locate(self, key: str) -> list[tuple[Segment, int]]:
+        """Live passages of a document; they are always written to one segment."""
+        for seg in reversed(self.segments):
+            rows = seg.find(key)
+            if rows:
+                return [(seg, row) for row in rows]
+        return []
+
+    # ------------------------------------------------------------------
+    # Mutations
+    # ------------------------------------------------------------------
+
+    def add(
+        self,
+        documents: list[dict],
+        analyzer: Callable[[str], list[str]],
+        id_prefix: str = "doc",
+        chunker: Optional[Callable[[str], list[dict]]] = None
+    ) -> int:
+        """
+        Index new or changed documents into a fresh segment.
+
+        Documents whose key (URL) is already indexed with identical content
+        are skipped; changed ones replace the previous version, passages
+        included.
+
+        Args:
+            documents: Documents with 'content' and metadata fields
+            analyzer: Turns text into terms
+            id_prefix: Prefix for document IDs
+            chunker: Splits content into passages (see retrieval/passages.py);
+                without one every document is a single passage
+
+        Returns:
+            Number of documents written
+        """
+        with self.exclusive(), self._lock:
+            fresh: dict[str, tuple[dict, str]] = {}
+            stale: list[tuple[Segment, int]] = []
+            for doc in documents:
+                content = doc.get("content", "")
+                if not content or len(content) < 20:
+                    continue
+                digest = content_hash(content)
+                key = doc.get("url") or f"sha:{digest}"
+                locations = self._locate(key)
+                if locations:
+                    seg, row = locations[0]
+                    if seg.documents[row]["hash"] == digest:
+                        continue
+                    stale.extend(locations)
+                fresh[key] = (doc, digest)
+
+            if fresh:
+                self._write(fresh, stale, analyzer, id_prefix, chunker)
+
+        # Also after a run that changed nothing, so a compaction that an
+        # earlier writer did not finish is picked up again
+        self._maybe_compact()
+        return len(fresh)
+
+    def _write(
+        self,
+        fresh: dict[str, tuple[dict, str]],
+        stale: list[tuple[Segment, int]],
+        analyzer: Callable[[str], list[str]],
+        id_prefix: str,
+        chunker: Optional[Callable[[str], list[dict]]]
+    ) -> None:
+        """Tombstone `stale` rows and write `fresh` documents as a new segment (caller holds the lock)."""
+        self._delete_rows(stale)
+
+        indptr, indices, values, docs = [0], [], [], []
+        title_indptr, title_indices, title_values = [0], [], []
+        for key, (doc, digest) in fresh.items():
+            parent_id = f"{id_prefix}_{self.next_seq}"
+            metadata = {k: str(v)[:500] for k, v in doc.items() if k != "content" and v}
+            title_terms = self._title_terms(bm25.title_text(doc), analyzer)
+            content = doc["content"]
+            passages = chunker(content) if chunker else [
+                {"section": None, "start": 0, "end": len(content), "content": content}
+            ]
+            for number, passage in enumerate(passages):
+                terms = Counter(analyzer(passage["content"]))
+                for term, freq in terms.items():
+                    indices.append(self.vocab.add(term))
+                    values.append(freq)
+                indptr.append(len(indices))
+                for term_id, freq in title_terms:
+                    title_indices.append(term_id)
+                    title_values.append(freq)
+                title_indptr.append(len(title_indices))
+                docs.append({
+                    "id": f"{parent_id}#{number}",
+                    "parent_id": parent_id,
+                    "key": key,
+                    "hash": digest,
+                    "section": passage["section"],
+                    "start": passage["start"],
+                    "end": passage["end"],
+                    "content": passage["content"],
+                    "metadata": metadata
+                })
+            self.next_seq += 1
+
+        width = len(self.vocab)
+        counts = csr_matrix(
+            (np.asarray(values, dtype=np.float32), np.asarray(indices, dtype=np.int32), np.asarray(indptr)),
+            shape=(len(docs), width)
+        )
+        titles = csr_matrix(
+            (np.asarray(title_values, dtype=np.float32), np.asarray(title_indices, dtype=np.int32),
+             np.asarray(title_indptr)),
+            shape=(len(docs), width)
+        )
+        self._grow_df(width)
+        self._df += np.bincount(counts.indices, minlength=width)
+        self._field_df += np.bincount((counts + titles).indices, minlength=width)
+        self._lengths += bm25.field_lengths(counts, titles).sum(axis=0)
+        self._n_live += len(docs)
+        self.generation += 1
+
+        name = self._new_name("seg")
+        vectors = self.embed([doc["content"] for doc in docs]) if self.embed else None
+        segment = Segment.write(
+            name, self._segment_path(name), docs, counts, titles,
+            self._norms(counts, self.idf()), self.avg_lengths(), vectors, self.vector_dtype
+        )
+        self.segments.append(segment)
+        self._commit()
+
+    def delete(self, keys: list[str]) -> int:
+        """Tombstone documents by key (URL). Returns number deleted."""
+        with self.exclusive(), self._lock:
+            found = [locations for locations in map(self._locate, set(keys)) if locations]
+            if found:
+                self._delete_rows([location for locations in found for location in locations])
+                self.generation += 1
+                self._commit()
+        self._maybe_compact()
+        return len(found)
+
+    def _delete_rows(self, locations: list[tuple[Segment, int]]) -> None:
+        by_segment: dict[int, tuple[Segment, list[int]]] = {}
+        for seg, row in locations:
+            by_segment.setdefault(id(seg), (seg, []))[1].append(row)
+
+        for seg, rows in by_segment.values():
+            deleted = seg.deleted.copy()  # Copy-on-write for concurrent readers
+            for row in rows:
+                if deleted[row]:
+                    continue
+                deleted[row] = True
+                self._df[seg.row_terms(row)] -= 1
+                self._field_df[seg.row_fields(row)] -= 1
+                self._lengths -= seg.lengths[row]
+                self._n_live -= 1
+            seg.deleted = deleted
+
+    def clear(self) -> None:
+        with self.exclusive(), self._lock:
+            shutil.rmtree(self.persist_dir / SEGMENTS_DIR, ignore_errors=True)
+            shutil.rmtree(self.persist_dir / VOCAB_DIR, ignore_errors=True)
+            (self.persist_dir / MANIFEST_FILE).unlink(missing_ok=True)
+            self._reset()
+
+    # ------------------------------------------------------------------
+    # Compaction
+    # ------------------------------------------------------------------
+
+    def compact(self, full: bool = False, wait: bool = True) -> None:
+        """
+        Merge segments and drop tombstoned rows.
+
+        Args:
+            full: Merge every segment into one (also refreshes all norms)
+            wait: Run inline instead of on a background thread
+        """
+        if wait:
+            self._compact(full)
+            return
+        with self._lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                return
+            # Not a daemon: the interpreter waits for the merge before exiting
+            self._compactor = threading.Thread(target=self._compact, args=(full,))
+            self._compactor.start()
+
+    def _maybe_compact(self) -> None:
+        # Inline: writers are short-lived CLI runs that would exit mid-merge
+        if len(self.segments) > self.max_segments or any(
+            seg.deleted.mean() > self.max_deleted_ratio for seg in self.segments if len(seg)
+        ):
+            self.compact()
+
+    def _pick_merge(self, full: bool) -> list[Segment]:
+        if full:
+            return list(self.segments)
+        picked = [seg for seg in self.segments if len(seg) and seg.deleted.mean() > self.max_deleted_ratio]
+        if len(self.segments) > self.max_segments:
+            by_size = sorted(self.segments, key=lambda seg: seg.live_count)
+            n_merge = len(self.segments) - self.max_segments // 2 + 1
+            picked += [seg for seg in by_size[:n_merge] if seg not in picked]
+        return picked
+
+    def _compact(self, full: bool) -> None:
+        # One writer at a time, across processes too: a compaction deletes the
+        # merged segments and any files it does not know as orphans
+        with self.exclusive():
+            self._merge(full)
+
+    def _merge(self, full: bool) -> None:
+        with self._lock:
+            self._remove_orphans()
+            picked = self._pick_merge(full)
+            if not picked or (len(picked) == 1 and not picked[0].deleted.any()):
+                return
+            live_rows = [np.flatnonzero(~seg.deleted) for seg in picked]
+            idf = self.idf().copy()
+            avg_lengths = self.avg_lengths()
+            embed, vector_dtype = self.embed, self.vector_dtype
+            vocab_size = len(self.vocab)
+            segment_name = self._new_name("seg")
+            base_name = self._new_name("base")
+
+        # Heavy lifting happens outside the lock; segments are immutable
+        width = len(idf)
+        blocks, title_blocks, vector_blocks, docs = [], [], [], []
+        has_vectors = True  # Embeddings survive a merge only if every merged passage has one
+        for seg, rows in zip(picked, live_rows):
+            for matrix, target in ((seg.counts, blocks), (seg.titles, title_blocks)):
+                block = matrix[rows]
+                block.resize((len(rows), width))
+                target.append(block)
+            seg_docs = [seg.documents[row] for row in rows]
+            if seg.dense is not None:
+                vector_blocks.append(seg.dense.vectors(rows))
+            elif embed is not None:
+                vector_blocks.append(embed([doc["content"] for doc in seg_docs]))  # Backfill
+            elif len(rows):
+                has_vectors = False
+            docs.extend(seg_docs)
+        merged = None
+        if docs:
+            counts = vstack(blocks, format="csr")
+            titles = vstack(title_blocks, format="csr")
+            vectors = np.concatenate(vector_blocks) if has_vectors and vector_blocks else None
+            merged = Segment.write(
+                segment_name, self._segment_path(segment_name), docs, counts, titles,
+                self._norms(counts, idf), avg_lengths, vectors, vector_dtype
+            )
+        TermTable.write(self.persist_dir / VOCAB_DIR / base_name, self.vocab.terms(vocab_size))
+
+        with self._lock:
+            if any(seg not in self.segments for seg in picked):
+                return  # Store was cleared meanwhile; orphans are removed next time
+
+            remaining = [seg for seg in self.segments if seg not in picked]
+            if merged is not None:
+                # Carry over tombstones that landed while merging
+                offset = 0
+                for seg, rows in zip(picked, live_rows):
+                    merged.deleted[offset + np.flatnonzero(seg.deleted[rows])] = True
+                    offset += len(rows)
+                position = self.segments.index(picked[0])
+                remaining.insert(min(position, len(remaining)), merged)
+            self.segments = remaining
+
+            old_base = self.vocab.base_name
+            self.vocab.rebase(self.persist_dir / VOCAB_DIR, base_name, vocab_size)
+            self.generation += 1
+            self._commit()
+            for seg in picked:
+                shutil.rmtree(seg.directory, ignore_errors=True)
+            shutil.rmtree(self.persist_dir / VOCAB_DIR / old_base, ignore_errors=True)
+            (self.persist_dir / VOCAB_DIR / f"{old_base}.log").unlink(missing_ok=True)
+        print(f"Compacted {len(picked)} segments into {segment_name} ({len(docs)} passages)")
+
+    def _remove_orphans(self) -> None:
+        """Delete files left behind by an interrupted write or compaction."""
+        referenced = {seg.directory.name for seg in self.segments}
+        for path in (self.persist_dir / SEGMENTS_DIR).glob("seg_*"):
+            if path.name not in referenced:
+                shutil.rmtree(path, ignore_errors=True)
+        for path in (self.persist_dir / VOCAB_DIR).glob("base_*"):
+            if path.name.split(".")[0] != self.vocab.base_name:
+                if path.is_dir():
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    path.unlink(missing_ok=True)
+
+    def _remove_stale_writes(self) -> None:
+        """
+        Delete segment directories a killed writer left half-written.
+
+        Only old ones: a younger .tmp may belong to a writer in another
+        process that is still running.
+        """
+        cutoff = time.time() - STALE_TMP_SECONDS
+        for path in (self.persist_dir / SEGMENTS_DIR).glob("seg_*.tmp"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    shutil.rmtree(path, ignore_errors=True)
+            except FileNotFoundError:
+                pass
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def _new_name(self, prefix: str) -> str:
+        name = f"{prefix}_{self.next_name:06d}"
+        self.next_name += 1
+        return name
+
+    def _segment_path(self, name: str) -> Path:
+        return self.persist_dir / SEGMENTS_DIR / name
+
+    def _grow_df(self, width: int) -> None:
+        if len(self._df) < width:
+            self._df = np.concatenate([self._df, np.zeros(width - len(self._df), dtype=np.int64)])
+        if len(self._field_df) < width:
+            self._field_df = np.concatenate([self._field_df, np.zeros(width - len(self._field_df), dtype=np.int64)])
+
+    def _commit(self) -> None:
+        """Flush new vocabulary, then atomically replace the manifest."""
+        self.vocab.flush(self.persist_dir / VOCAB_DIR)
+        manifest = {
+            "format": FORMAT_VERSION,
+            "generation": self.generation,
+            "analyzer": self.analyzer_name,
+            "embedder": self.embedder_name,
+            "next_seq": self.next_seq,
+            "next_name": self.next_name,
+            "vocab": {"base": self.vocab.base_name, "size": len(self.vocab)},
+            "segments": [
+                {"name": seg.name, "deleted": np.flatnonzero(seg.deleted).tolist()}
+                for seg in self.segments
+            ]
+        }
+        tmp = self.persist_dir / (MANIFEST_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, self.persist_dir / MANIFEST_FILE)
+
+    def stored_format(self) -> Optional[int]:
+        """Format version of the index on disk, or None if there is none."""
+        manifest_file = self.persist_dir / MANIFEST_FILE
+        if not manifest_file.exists():
+            return None
+        with open(manifest_file, "r", encoding="utf-8") as f:
+            return json.load(f).get("format", 1)
+
+    @contextmanager
+    def exclusive(self):
+        """
+        Cross-process writer lock, held around every change to the manifest.
+
+        Re-entrant within a thread. On entry the store first catches up with
+        what other processes committed meanwhile, so concurrent CLI runs
+        (index, index-compact, convert) never commit over each other.
+        """
+        with self._writer:
+            if self._writer_depth:
+                self._writer_depth += 1
+                try:
+                    yield
+                finally:
+                    self._writer_depth -= 1
+                return
+            self.persist_dir.mkdir(parents=True, exist_ok=True)
+            with open(self.persist_dir / LOCK_FILE, "w") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                self._writer_depth = 1
+                try:
+                    self._refresh()
+                    yield
+                finally:
+                    self._writer_depth = 0
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _refresh(self) -> None:
+        """Reload the manifest if another process committed since this store last read or wrote it."""
+        manifest_file = self.persist_dir / MANIFEST_FILE
+        with self._lock:
+            if manifest_file.exists():
+                with open(manifest_file, "r", encoding="utf-8") as f:
+                    manifest = json.load(f)
+                if (manifest.get("generation"), manifest.get("next_name")) != (self.generation, self.next_name):
+                    self.load()
+            elif self.segments:
+                # Cleared elsewhere; keep the analyzer and embedder this store was configured with
+                analyzer_name, embedder_name = self.analyzer_name, self.embedder_name
+                self._reset()
+                self.analyzer_name, self.embedder_name = analyzer_name, embedder_name
+
+    def load(self) -> bool:
+        """Open the manifest and map its segments. Returns False if none exists."""
+        manifest_file = self.persist_dir / MANIFEST_FILE
+        if not manifest_file.exists():
+            return False
+
+        with open(manifest_file, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("format", 1) != FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported index format {manifest.get('format', 1)}; "
+                "rebuild it with `./run.sh index-rebuild`"
+            )
+
+        with self._lock:
+            self.vocab = Vocabulary()
+            self.vocab.load(self.persist_dir / VOCAB_DIR, manifest["vocab"]["base"], manifest["vocab"]["size"])
+            self.generation = manifest["generation"]
+            self.analyzer_name = manifest.get("analyzer") or "regex"
+            self.embedder_name = manifest.get("embedder")
+            self.next_seq = manifest["next_seq"]
+            self.next_name = manifest["next_name"]
+            self.segments = []
+            for entry in manifest["segments"]:
+                seg = Segment(entry["name"], self._segment_path(entry["name"]))
+                seg.deleted[entry["deleted"]] = True
+                self.segments.append(seg)
+            self._remove_stale_writes()
+
+            width = len(self.vocab)
+            self._df = np.zeros(width, dtype=np.int64)
+            self._field_df = np.zeros(width, dtype=np.int64)
+            self._lengths = np.zeros(len(bm25.FIELDS))
+            self._n_live = 0
+            for seg in self.segments:
+                self._df += seg.live_doc_freq(width)
+                self._field_df += seg.live_doc_freq(width, fields=True)
+                self._lengths += seg.lengths[~seg.deleted].sum(axis=0)
+                self._n_live += seg.live_count
+            self._idf_generation = -1
+            self._bm25_idf_generation = -1
+        return True
@@ -2,17 +2,48 @@
 Vector store module using simple TF-IDF + cosine similarity.
 Lightweight alternative to ChromaDB for Python 3.14 compatibility.
 Uses the LLM API for embeddings when needed.
+
+The index is segmented (see retrieval/segments.py): adding or replacing
+pages only writes a small delta segment instead of refitting the corpus.
+Segments are memory-mapped from disk (see retrieval/disk_format.py), and
+queries walk an inverted index (see retrieval/inverted.py) rather than
+scoring every document. Documents are indexed as passages split on their
+section headings (see retrieval/passages.py), so search returns the part of
+a page that matches instead of its first characters. Passages are ranked by
+TF-IDF cosine or by BM25F over title and content (see retrieval/bm25.py),
+optionally blended with embedding similarity from a per-segment IVF index
+(see retrieval/ann.py and retrieval/embeddings.py). Searches can be
+restricted by metadata through per-segment facet bitmaps, applied before
+scoring (see retrieval/facets.py).
 """
 
 import json
 import os
 import pickle
+import sys
+from collections import Counter
+from functools import partial
 from pathlib import Path
 from typing import Optional
 
-import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+if str(Path(__file__).parent) not in sys.path:
+    sys.path.insert(0, str(Path(__file__).parent))
+
+from config import settings
+from retrieval.analyzers import build_analyzer, mine_terms, save_dictionary
+from retrieval.ann import fuse, top_k_dense
+from retrieval.embeddings import CachedEmbedder, build_embedder
+from retrieval.facets import excluded_rows, normalize_filters
+from retrieval.inverted import top_k, top_k_many
+from retrieval.passages import chunk_document
+from retrieval.query_cache import QueryCache, normalize_query
+from retrieval.segments import SegmentStore, document_key
+
+DICTIONARY_FILE = "analyzer/dictionary.txt"
+EMBEDDINGS_DIR = "embeddings"
+# Sparse and dense candidates per result fed into hybrid fusion
+HYBRID_DEPTH = 4
+RANKERS = ("tfidf", "bm25")
 
 
 class VectorStore:
@@ -21,65 +52,130 @@ class VectorStore:
     def __init__(
         self,
         persist_dir: str = "./data/vector_store",
+        max_segments: int = 8,
+        analyzer: Optional[str] = None,
+        ranker: Optional[str] = None,
+        embedder: Optional[str] = None,
+        dense_weight: Optional[float] = None
     ):
         """
         Initialize vector store.
 
         Args:
             persist_dir: Directory to persist index data
+            max_segments: Segment count that triggers compaction after a write
+            analyzer: Analyzer for a new index ("regex" or "vi-trie");
+                defaults to settings.analyzer. An existing index keeps the
+                analyzer it was built with until it is rebuilt.
+            ranker: Scoring engine ("tfidf" or "bm25"); defaults to
+                settings.ranker. Both are indexed, so it can be switched
+                without rebuilding.
+            embedder: Embedder for new passages ("hash" or "api"); defaults
+                to settings.embedder, empty disables dense retrieval. An
+                existing index keeps the embedder it was built with.
+            dense_weight: Share of embedding similarity in hybrid scores
+                (0 = sparse only, 1 = dense only); defaults to
+                settings.dense_weight
         """
+        self.ranker = ranker or settings.ranker
+        if self.ranker not in RANKERS:
+            raise ValueError(f"Unknown ranker '{self.ranker}'; expected one of {RANKERS}")
         self.persist_dir = Path(persist_dir)
         self.persist_dir.mkdir(parents=True, exist_ok=True)
 
-        self.documents: list[dict] = []
-        # Simple word tokenization for Vietnamese
-        self.vectorizer = TfidfVectorizer(
-            max_features=10000,
-            ngram_range=(1, 2),
-            min_df=1,
-            max_df=0.99,  # Higher threshold for small corpus
-            token_pattern=r'(?u)\b\w+\b',  # Simple word pattern
-            lowercase=True,
-            strip_accents=None  # Preserve Vietnamese diacritics
+        self.index = SegmentStore(
+            self.persist_dir,
+            max_segments=max_segments,
+            max_df=0.99  # Higher threshold for small corpus
         )
-        self.tfidf_matrix = None
+        self.chunker = partial(chunk_document, max_chars=settings.passage_max_chars)
+        self.query_cache = QueryCache(settings.query_cache_size, settings.query_cache_ttl)
+        self._requested_analyzer = analyzer or settings.analyzer
+        self._configure_analyzer(self._requested_analyzer)
 
         # Try to load existing index
+        self.load_error: Optional[str] = None  # Why an existing index could not be opened
         self._load()
+        if self.index.analyzer_name and self.index.analyzer_name != self.analyzer_name:
+            if analyzer:
+                print(f"Index was built with '{self.index.analyzer_name}' analyzer; rebuild it to use '{analyzer}'")
+            self._configure_analyzer(self.index.analyzer_name)
+
+        self.dense_weight = settings.dense_weight if dense_weight is None else dense_weight
+        self.index.vector_dtype = settings.vector_dtype
+        self._requested_embedder = embedder if embedder is not None else settings.embedder
+        if self.index.embedder_name and embedder and not self.index.embedder_name.startswith(embedder):
+            print(f"Index was built with '{self.index.embedder_name}' embeddings; rebuild it to use '{embedder}'")
+        self._configure_embedder(self.index.embedder_name or self._requested_embedder)
+
+    def _configure_analyzer(self, name: str) -> None:
+        self.analyzer_name = name
+        self.analyzer = build_analyzer(name, self.persist_dir / DICTIONARY_FILE)
+        self.index.analyzer_name = name
+
+    def _configure_embedder(self, name: str) -> None:
+        self.embedder = build_embedder(name, self.analyzer) if name else None
+        self.index.embed = self.embedder
+        if self.embedder is not None and self.embedder.cached:
+            self.index.embed = CachedEmbedder(self.embedder, self.persist_dir / EMBEDDINGS_DIR)
+        self.index.embedder_name = self.embedder.name if self.embedder else None
+
+    def train_analyzer(self, documents: list[dict]) -> int:
+        """
+        Mine compound terms for the `vi-trie` analyzer from a corpus.
 
-    def _save(self) -> None:
-        """Persist index to disk."""
-        data = {
-            "documents": self.documents,
-            "vectorizer": self.vectorizer,
-            "tfidf_matrix": self.tfidf_matrix
-        }
-        with open(self.persist_dir / "index.pkl", "wb") as f:
-            pickle.dump(data, f)
+        Only allowed on an empty index, since changing the dictionary
+        changes how existing documents would be tokenized.
+
+        Returns:
+            Number of mined terms
+        """
+        if self.analyzer_name != "vi-trie" or self.count():
+            return 0
+        terms = mine_terms(doc.get("content", "") for doc in documents)
+        save_dictionary(self.persist_dir / DICTIONARY_FILE, terms)
+        self._configure_analyzer(self.analyzer_name)
+        self._configure_embedder(self.index.embedder_name or "")
+        print(f"Mined {len(terms)} dictionary terms for the vi-trie analyzer")
+        return len(terms)
 
     def _load(self) -> bool:
-        """Load index from disk."""
-        index_file = self.persist_dir / "index.pkl"
-        if index_file.exists():
-            try:
-                with open(index_file, "rb") as f:
-                    data = pickle.load(f)
-                self.documents = data["documents"]
-                self.vectorizer = data["vectorizer"]
-                self.tfidf_matrix = data["tfidf_matrix"]
-                print(f"Loaded {len(self.documents)} documents from index")
+        """Map the index from disk, converting a pickle-based index first."""
+        try:
+            if self.index.stored_format() is None and (self.persist_dir / "index.pkl").exists():
+                self.convert()
+            if self.index.load():
+                print(f"Loaded {self.count()} passages from index")
                 return True
-            except Exception as e:
-                print(f"Error loading index: {e}")
+        except Exception as e:
+            self.load_error = str(e)
+            print(f"Error loading index: {e}")
         return False
 
+    def convert(self) -> None:
+        """
+        Convert the original single-file index.pkl to the memory-mapped
+        format in place. Safe to call from several processes at once.
+        """
+        with self.index.exclusive():
+            if self.index.stored_format() is None and (self.persist_dir / "index.pkl").exists():
+                with open(self.persist_dir / "index.pkl", "rb") as f:
+                    data = pickle.load(f)
+                documents = [{"content": d["content"], **d["metadata"]} for d in data["documents"]]
+                print(f"Converting {len(documents)} documents from legacy index.pkl")
+                self.index.add(documents, self.analyzer, chunker=self.chunker)
+
     def add_documents(
         self,
         documents: list[dict],
         id_prefix: str = "doc"
     ) -> int:
         """
-        Add documents to the vector store.
+        Add or replace documents in the vector store.
+
+        Documents are keyed by URL: a known URL with unchanged content is
+        skipped, a known URL with new content replaces the old version.
+        Each document is indexed as passages split on its section headings.
 
         Args:
             documents: List of dicts with 'content' and optional 'metadata'
@@ -91,92 +187,215 @@ class VectorStore:
         if not documents:
             return 0
 
-        added = 0
-        for i, doc in enumerate(documents):
-            content = doc.get("content", "")
-            if not content or len(content) < 20:
-                continue
-
-            self.documents.append({
-                "id": f"{id_prefix}_{len(self.documents)}",
-                "content": content,
-                "metadata": {k: str(v)[:500] for k, v in doc.items() if k != "content" and v}
-            })
-            added += 1
-
-        if added > 0:
-            # Rebuild TF-IDF matrix
-            texts = [d["content"] for d in self.documents]
-            self.tfidf_matrix = self.vectorizer.fit_transform(texts)
-            self._save()
-
-        print(f"Added {added} documents. Total: {len(self.documents)}")
+        added = self.index.add(documents, self.analyzer, id_prefix=id_prefix, chunker=self.chunker)
+        print(f"Added {added} documents. Total: {self.count()} passages")
         return added
 
+    def delete_documents(self, keys: list[str]) -> int:
+        """
+        Remove documents from the store.
+
+        Args:
+            keys: Document URLs (content keys for pages without a URL)
+
+        Returns:
+            Number of documents removed
+        """
+        deleted = self.index.delete(keys)
+        if deleted:
+            print(f"Deleted {deleted} documents. Total: {self.count()} passages")
+        return deleted
+
+    def compact(self, wait: bool = True) -> None:
+        """Merge all segments into one and drop deleted documents."""
+        self.index.compact(full=True, wait=wait)
+
     def search(
         self,
         query: str,
         n_results: int = 5,
-        min_score: float = 0.1
+        min_score: float = 0.1,
+        filters: Optional[dict] = None
     ) -> list[dict]:
         """
-        Search for relevant documents.
+        Search for relevant passages.
+
+        Results of recent queries are served from the query cache until the
+        index changes (see retrieval/query_cache.py).
 
         Args:
             query: Search query in natural language
             n_results: Maximum number of results
-            min_score: Minimum similarity score (0-1)
+            min_score: Minimum score (0-1), for either ranker
+            filters: Metadata the passages must have, as facet -> value or
+                list of accepted values (facets: source, procedure_type,
+                page_name, field)
 
         Returns:
-            List of matching documents with scores
+            List of matching passages with scores, parent document id,
+            section name and offsets into the parent content
         """
-        if not self.documents or self.tfidf_matrix is None:
+        query = normalize_query(query)
+        filters = normalize_filters(filters)
+        generation = self.index.generation
+        key = self._cache_key(query, n_results, min_score, filters)
+        results = self.query_cache.get(key, generation)
+        if results is None:
+            results = self._search(query, n_results, min_score, filters)
+            self._cache_put(key, generation, results)
+        return [dict(r) for r in results]
+
+    def _search(self, query: str, n_results: int, min_score: float, filters: tuple = ()) -> list[dict]:
+        if not self.count():
+            return []
+        excluded = excluded_rows(self.index.segments, filters) if filters else None
+        if excluded is not None and not excluded:
+            return []  # No passage matches the filters
+
+        # Weight query terms with the live IDF
+        term_ids, weights = self.index.query_weights(Counter(self.analyzer(query)), self.ranker)
+        if not len(term_ids) and not self._hybrid:
             return []
 
-        # Transform query using fitted vectorizer
-        query_vec = self.vectorizer.transform([query])
+        if self._hybrid:
+            query_vector = self.embedder([query])[0]
+            return self._fused(term_ids, weights, query_vector, n_results, min_score, excluded)
 
-        # Compute cosine similarity
-        similarities = cosine_similarity(query_vec, self.tfidf_matrix).flatten()
+        # Walk the postings of the query terms only, keeping the top-k
+        hits = top_k(self.index.segments, term_ids, weights, n_results, min_score, self.ranker, excluded)
+
+        return [self._result(seg.documents[row], score) for score, seg, row in hits]
+
+    def search_many(
+        self,
+        queries: list[str],
+        n_results: int = 5,
+        min_score: float = 0.1
+    ) -> list[list[dict]]:
+        """
+        Search for many queries in one pass.
 
-        # Get top results
-        top_indices = similarities.argsort()[::-1][:n_results]
+        Queries are vectorized into a single matrix and scored with one
+        sparse matrix product per segment, which is much cheaper per query
+        than calling search() in a loop for evaluation or batch jobs.
+        Queries found in the query cache are not scored again.
 
-        results = []
-        for idx in top_indices:
-            score = float(similarities[idx])
-            if score >= min_score:
-                doc = self.documents[idx]
-                results.append({
-                    "content": doc["content"],
-                    "metadata": doc["metadata"],
-                    "score": round(score, 3)
-                })
+        Args:
+            queries: Search queries in natural language
+            n_results: Maximum number of results per query
+            min_score: Minimum score (0-1), for either ranker
 
-        return results
+        Returns:
+            One result list per query, in the same format as search()
+        """
+        queries = [normalize_query(query) for query in queries]
+        generation = self.index.generation
+        keys = [self._cache_key(query, n_results, min_score) for query in queries]
+        results = [self.query_cache.get(key, generation) for key in keys]
+        missing = sorted({query for query, cached in zip(queries, results) if cached is None})
+        if missing:
+            found = dict(zip(missing, self._search_many(missing, n_results, min_score)))
+            for i, query in enumerate(queries):
+                if results[i] is None:
+                    results[i] = found[query]
+                    self._cache_put(keys[i], generation, results[i])
+        return [[dict(r) for r in query_results] for query_results in results]
+
+    def _search_many(self, queries: list[str], n_results: int, min_score: float) -> list[list[dict]]:
+        if not self.count():
+            return [[] for _ in queries]
+
+        if self._hybrid:
+            # Embed the batch in one call; fusion itself is per query
+            query_vectors = self.embedder(queries)
+            return [
+                self._fused(*self.index.query_weights(Counter(self.analyzer(query)), self.ranker),
+                            query_vector, n_results, min_score)
+                for query, query_vector in zip(queries, query_vectors)
+            ]
+
+        matrix = self.index.query_matrix([Counter(self.analyzer(query)) for query in queries], self.ranker)
+        hits = top_k_many(self.index.segments, matrix, n_results, min_score, self.ranker)
+
+        return [
+            [self._result(seg.documents[row], score) for score, seg, row in query_hits]
+            for query_hits in hits
+        ]
+
+    def _cache_key(self, query: str, n_results: int, min_score: float, filters: tuple = ()) -> tuple:
+        dense = (self.embedder.name, self.dense_weight) if self._hybrid else None
+        return query, n_results, min_score, self.ranker, dense, filters
+
+    def _cache_put(self, key: tuple, generation: int, results: list[dict]) -> None:
+        # Results computed while the index changed belong to neither generation
+        if self.index.generation == generation:
+            self.query_cache.put(key, generation, results)
+
+    def facet_counts(self, filters: Optional[dict] = None) -> dict[str, dict[str, int]]:
+        """Live documents per value of every facet, among those matching `filters`."""
+        filters = normalize_filters(filters)
+        counts: dict[str, dict[str, int]] = {}
+        for seg in self.index.segments:
+            live = ~seg.deleted & seg.facets.mask(filters)
+            for facet, values in seg.facets.counts(live).items():
+                facet_counts = counts.setdefault(facet, {})
+                for value, count in values.items():
+                    if count:
+                        facet_counts[value] = facet_counts.get(value, 0) + count
+        return counts
+
+    def cache_stats(self) -> dict:
+        """Hit rate and size counters of the query cache."""
+        return self.query_cache.stats()
+
+    @property
+    def _hybrid(self) -> bool:
+        return self.embedder is not None and self.dense_weight > 0
+
+    def _fused(
+        self, term_ids, weights, query_vector, n_results: int, min_score: float, excluded: Optional[dict] = None
+    ) -> list[dict]:
+        """Hybrid search: fuse sparse and ANN candidates (see retrieval/ann.py)."""
+        depth = n_results * HYBRID_DEPTH
+        sparse = []
+        if self.dense_weight < 1 and len(term_ids):
+            sparse = top_k(self.index.segments, term_ids, weights, depth, 0.0, self.ranker, excluded)
+        dense = top_k_dense(self.index.segments, query_vector, depth, settings.ann_nprobe, excluded)
+        hits = fuse(sparse, dense, query_vector, self.dense_weight, n_results, min_score)
+        return [self._result(seg.documents[row], score) for score, seg, row in hits]
+
+    @staticmethod
+    def _result(doc: dict, score: float) -> dict:
+        # Indexes written before passages existed hold whole documents
+        return {
+            "content": doc["content"],
+            "metadata": doc["metadata"],
+            "score": round(score, 3),
+            "parent_id": doc.get("parent_id", doc["id"]),
+            "section": doc.get("section"),
+            "start": doc.get("start", 0),
+            "end": doc.get("end", len(doc["content"]))
+        }
 
     def clear(self) -> None:
         """Clear all documents from the store."""
-        self.documents = []
-        self.tfidf_matrix = None
-        self.vectorizer = TfidfVectorizer(
-            max_features=10000,
-            ngram_range=(1, 2),
-            min_df=1,
-            max_df=0.99,
-            token_pattern=r'(?u)\b\w+\b',
-            lowercase=True,
-            strip_accents=None
-        )
-        # Remove persisted file
+        self.index.clear()
+        (self.persist_dir / DICTIONARY_FILE).unlink(missing_ok=True)
+        self._configure_analyzer(self._requested_analyzer)
+        self._configure_embedder(self._requested_embedder)
+        # Remove legacy persisted file
         index_file = self.persist_dir / "index.pkl"
         if index_file.exists():
             index_file.unlink()
         print("Store cleared.")
 
     def count(self) -> int:
-        """Return number of documents."""
-        return len(self.documents)
+        """Return number of indexed passages."""
+        return self.index.count()
+
+    def keys(self) -> list[str]:
+        """Return the keys (URLs) of all live documents."""
+        return list(self.index.keys())
 
 
 def load_scraped_data(data_dir: str = "./data") -> list[dict]:
@@ -234,20 +453,29 @@ def load_scraped_data(data_dir: str = "./data") -> list[dict]:
                         "title": proc.get("title", ""),
                         "url": proc.get("url", ""),
                         "source": "dichvucong",
-                        "procedure_type": "public_service"
+                        "procedure_type": "public_service",
+                        "field": proc.get("field", "")
                     })
 
     print(f"Loaded {len(documents)} documents total")
     return documents
 
 
-def build_index(data_dir: str = "./data", persist_dir: str = "./data/vector_store") -> VectorStore:
+def build_index(
+    data_dir: str = "./data",
+    persist_dir: str = "./data/vector_store",
+    rebuild: bool = False
+) -> VectorStore:
     """
-    Build vector index from scraped data.
+    Build or incrementally update the vector index from scraped data.
+
+    Only new and changed pages are indexed; pages missing from the latest
+    scrape are deleted.
 
     Args:
         data_dir: Directory containing scraped JSON files
         persist_dir: Directory for index persistence
+        rebuild: Drop the existing index and start fresh
 
     Returns:
         Initialized VectorStore
@@ -259,17 +487,20 @@ def build_index(data_dir: str = "./data", persist_dir: str = "./data/vector_stor
         print("No documents found. Run scrapers first.")
         return None
 
-    # Initialize store and add documents
+    # Initialize store and sync documents
     store = VectorStore(persist_dir=persist_dir)
-    store.clear()  # Start fresh
+    if rebuild:
+        store.clear()  # Start fresh
+    store.train_analyzer(documents)
     store.add_documents(documents)
 
+    current = {document_key(doc) for doc in documents}
+    store.delete_documents([key for key in store.keys() if key not in current])
+
     return store
 
 
 if __name__ == "__main__":
-    import sys
-
     if len(sys.argv) > 1 and sys.argv[1] == "search":
         # Search mode
         query = " ".join(sys.argv[2:]) if len(sys.argv) > 2 else "thủ tục đăng ký khai sinh"
@@ -277,9 +508,15 @@ if __name__ == "__main__":
         results = store.search(query)
         print(f"\nSearch results for: {query}\n")
         for r in results:
-            print(f"[{r['score']}] {r['metadata'].get('title', 'No title')[:60]}")
+            print(f"[{r['score']}] {r['metadata'].get('title', 'No title')[:60]} ({r['section'] or 'full text'})")
             print(f"    {r['content'][:200]}...")
             print()
+    elif len(sys.argv) > 1 and sys.argv[1] == "compact":
+        # Merge all segments
+        VectorStore().compact()
+    elif len(sys.argv) > 1 and sys.argv[1] == "convert":
+        # Convert a legacy index.pkl (done automatically on load as well)
+        VectorStore()
     else:
         # Build index mode
-        build_index()
+        build_index(rebuild=len(sys.argv) > 1 and sys.argv[1] == "rebuild")
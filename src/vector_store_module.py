@@ -0,0 +1,19 @@
+"""
+Import of src/vector-store.py, whose file name is not a valid module name.
+
+Shared by the API server, api/batch.py and the benchmark scripts, which all
+put src/ on sys.path first.
+"""
+
+import importlib.util
+from functools import cache
+from pathlib import Path
+
+
+@cache
+def load_vector_store_module():
+    """Import src/vector-store.py, once per process; later calls return the same module."""
+    spec = importlib.util.spec_from_file_location("vector_store", Path(__file__).parent / "vector-store.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -6,9 +6,12 @@
  *
  * Or configure manually:
  * <script>
- *   window.DIENSANH_CHATBOT_CONFIG = { apiUrl: 'https://your-api.com' };
+ *   window.DIENSANH_CHATBOT_CONFIG = { apiUrl: 'https://your-api.com', stream: true };
  * </script>
  * <script src="chatbot-embed.js"></script>
+ *
+ * Answers are streamed token by token from /chat/stream (Server-Sent Events);
+ * set stream: false (or data-stream="false") to wait for the full answer.
  */
 
 (function() {
@@ -18,6 +21,10 @@
     const config = window.DIENSANH_CHATBOT_CONFIG || {};
     const scriptTag = document.currentScript;
     const API_URL = config.apiUrl || scriptTag?.dataset?.api || 'http://localhost:8000';
+    const STREAM = (config.stream ?? scriptTag?.dataset?.stream !== 'false') && !!window.ReadableStream;
+
+    // Follow-up questions are answered in the context of this conversation
+    let conversationId = null;
 
     // Styles
     const styles = `
@@ -307,18 +314,23 @@
             messages.scrollTop = messages.scrollHeight;
 
             try {
-                const res = await fetch(`${API_URL}/chat`, {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ message: text, include_sources: false })
-                });
-
-                typing.remove();
-
-                if (!res.ok) throw new Error('API error');
-
-                const data = await res.json();
-                addMsg(data.response, 'bot');
+                if (STREAM) {
+                    await streamReply(text, typing);
+                } else {
+                    const res = await fetch(`${API_URL}/chat`, {
+                        method: 'POST',
+                        headers: { 'Content-Type': 'application/json' },
+                        body: JSON.stringify({ message: text, include_sources: false, conversation_id: conversationId })
+                    });
+
+                    typing.remove();
+
+                    if (!res.ok) throw new Error('API error');
+
+                    const data = await res.json();
+                    conversationId = data.conversation_id;
+                    addMsg(data.response, 'bot');
+                }
             } catch (e) {
                 typing.remove();
                 addMsg('Xin lỗi, đã xảy ra lỗi. Vui lòng thử lại.', 'error');
@@ -327,12 +339,57 @@
             sendBtn.disabled = false;
         }
 
+        // Stream the answer from /chat/stream, growing one bot message per token
+        async function streamReply(text, typing) {
+            const res = await fetch(`${API_URL}/chat/stream`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ message: text, include_sources: false, conversation_id: conversationId })
+            });
+            if (!res.ok || !res.body) throw new Error('API error');
+
+            const reader = res.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let msg = null;
+
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+
+                // Events are separated by a blank line
+                let end;
+                while ((end = buffer.indexOf('\n\n')) >= 0) {
+                    const block = buffer.slice(0, end);
+                    buffer = buffer.slice(end + 2);
+                    const event = (block.match(/^event: (.*)$/m) || [])[1];
+                    const data = JSON.parse((block.match(/^data: (.*)$/m) || [])[1] || 'null');
+
+                    if (event === 'token') {
+                        if (!msg) {
+                            typing.remove();
+                            msg = addMsg('', 'bot');
+                        }
+                        msg.textContent += data.content;
+                        messages.scrollTop = messages.scrollHeight;
+                    } else if (event === 'done') {
+                        conversationId = data.conversation_id;
+                    } else if (event === 'error') {
+                        throw new Error(data.detail);
+                    }
+                }
+            }
+            if (!msg) throw new Error('Empty answer');
+        }
+
         function addMsg(text, type) {
             const msg = document.createElement('div');
             msg.className = `ds-msg ${type}`;
             msg.textContent = text;
             messages.appendChild(msg);
             messages.scrollTop = messages.scrollHeight;
+            return msg;
         }
 
         sendBtn.addEventListener('click', send);
@@ -0,0 +1,30 @@
+"""Regression tests for the on-disk embedding cache (retrieval/embeddings.py)."""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from retrieval.embeddings import EmbeddingCache
+
+
+def test_repeated_keys_in_one_batch_keep_rows_aligned(tmp_path):
+    cache = EmbeddingCache(tmp_path)
+    cache.put(["aa", "aa"], np.array([[1.0, 0.0], [1.0, 0.0]]))
+    cache.put(["bb"], np.array([[0.0, 1.0]]))
+
+    assert len(cache) == 2
+    assert cache.get(["aa"])[0].tolist() == [1.0, 0.0]
+    assert cache.get(["bb"])[0].tolist() == [0.0, 1.0]
+
+
+def test_reopened_cache_matches_written_rows(tmp_path):
+    cache = EmbeddingCache(tmp_path)
+    cache.put(["aa", "bb", "aa"], np.array([[1.0, 0.0], [0.0, 1.0], [1.0, 0.0]]))
+    cache.put(["cc", "bb"], np.array([[0.5, 0.5], [0.0, 1.0]]))
+
+    reopened = EmbeddingCache(tmp_path)
+    for key in ("aa", "bb", "cc"):
+        assert reopened.get([key])[0].tolist() == cache.get([key])[0].tolist()